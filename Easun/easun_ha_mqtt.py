@@ -4,6 +4,8 @@ EASUN to Home Assistant MQTT integration
 Sends data with Home Assistant auto-discovery
 """
 
+import os
+import sys
 import serial
 import time
 import struct
@@ -11,8 +13,22 @@ import json
 import logging
 import paho.mqtt.client as mqtt
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpp_archive import STATUS_FLAGS, SampleArchive
+from mpp_rollup import RollupEngine, WindowAggregator
+from mpp_energy import EnergyIntegrator, ENERGY_SENSORS
+from mpp_sqlite import SQLiteHistorian
+from mpp_shm import SharedSample
+from mpp_discovery import DeviceTracker
+from mpp_capture import CaptureWriter
+from mpp_linkhealth import LinkHealth
+from mpp_breaker import CircuitBreaker
+from mpp_logging import setup as setup_logging
+from mpp_transport import BUDGET_FACTOR, DecodeError, ResponseTimeout, TransportError, expected_time, parse_response
+
+# Logging is configured in main() (setup_logging)
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -22,6 +38,18 @@ MQTT_USER = "mppclient"
 MQTT_PASS = "supersecret"
 MQTT_TOPIC_PREFIX = "easun"
 DEVICE_ID = "easun_shm2_7k"
+ARCHIVE_DIR = "easun_archive"  # Compact QPIGS history, None to disable
+ENERGY_STATE = "easun_energy_state.json"  # Persisted kWh counters
+HISTORY_DB = "easun_history.db"  # Local SQLite history, None to disable
+SHM_PATH = "/dev/shm/easun_solar"  # Latest sample for local dashboards, None to disable
+SERIAL_PORT = "/dev/ttyUSB0"  # Initial port, followed across USB reconnects
+CAPTURE_PATH = None  # Raw request/response frames for offline replay (mpp_capture.py), e.g. "easun_frames.cap"
+PROM_PATH = None  # Link-health metrics for node_exporter, e.g. "/var/lib/node_exporter/easun.prom"
+LOG_PATH = None  # Batched, rate-limited log file for SD cards, e.g. "/var/log/easun-ha.log" (None = stdout)
+LOG_LEVEL = "INFO"  # "WARNING" keeps the file quiet; INFO stays in the in-memory ring (kill -USR1 dumps it)
+BREAKER_THRESHOLD = 3  # Failed reads in a row before the inverter is only probed on backoff (5 s .. 5 min)
+SAMPLE_INTERVAL = 5  # Read the inverter every N seconds
+PUBLISH_WINDOW = 60  # Publish per-window mean/min/max every N seconds (0 = every sample)
 
 def calculate_crc(data):
     """Calculate CRC16-XMODEM checksum"""
@@ -36,8 +64,32 @@ def calculate_crc(data):
             crc &= 0xFFFF
     return crc
 
-def read_easun_data(port='/dev/ttyUSB0', timeout=3.0):
-    """Read data from EASUN inverter - using working code from live monitor"""
+def link_error(response):
+    """The reply's link error (timeout, short, CRC, NAK) or None"""
+    if not response:
+        return ResponseTimeout("No response")
+    try:
+        parse_response(response)
+    except TransportError as e:
+        return e
+    return None
+
+def record_link_health(health, port, response, started, budget=None):
+    """Count the reply as OK, timeout, short, CRC error or NAK (the parser below ignores CRC)"""
+    health.record(port, 'QPIGS', (time.monotonic_ns() - started) / 1e9, link_error(response), budget=budget)
+
+def read_error(error):
+    """Failed read: the message plus the exception, whose kind tells the breaker if the link is alive"""
+    return {"error": str(error), "exception": error}
+
+def read_easun_data(port='/dev/ttyUSB0', timeout=None, capture=None, health=None):
+    """Read data from EASUN inverter - using working code from live monitor
+
+    timeout defaults to the QPIGS budget (BUDGET_FACTOR x expected transfer time).
+    The read ends at the closing CR, so a healthy reply never waits the full timeout.
+    """
+    timeout = timeout or BUDGET_FACTOR * expected_time('QPIGS')
+    started = time.monotonic_ns()
     try:
         ser = serial.Serial(port, 2400, timeout=timeout)
         ser.dtr = True
@@ -45,11 +97,15 @@ def read_easun_data(port='/dev/ttyUSB0', timeout=3.0):
         
         # Send QPIGS command (hex format that works)
         cmd = bytes.fromhex('5150494753b7a90d')
+        started = time.monotonic_ns()
         ser.write(cmd)
-        time.sleep(0.3)
         
-        response = ser.read(300)
+        response = ser.read_until(b'\r', 300)
         ser.close()
+        if capture:
+            capture.record(cmd, response, started, time.monotonic_ns() - started)
+        if health:
+            record_link_health(health, port, response, started, timeout)
         
         if response:
             response_text = response.decode('utf-8', errors='ignore')
@@ -58,7 +114,7 @@ def read_easun_data(port='/dev/ttyUSB0', timeout=3.0):
             import re
             match = re.search(r'\(([0-9\.\s]+)', response_text)
             if not match:
-                return {"error": "No valid response pattern"}
+                return read_error(link_error(response) or DecodeError("No valid response pattern"))
                 
             values = match.group(1).strip().split()
             
@@ -79,18 +135,28 @@ def read_easun_data(port='/dev/ttyUSB0', timeout=3.0):
                     "pv_input_current": int(values[12]),
                     "pv_input_voltage": float(values[13]),
                     "battery_voltage_scc": float(values[14]),
-                    "battery_discharge_current": int(values[15])
+                    "battery_discharge_current": int(values[15]),
+                    "device_status": values[16],
                 }
+                # Status bits b7..b0 as is_* flags (same order as mpp-solar and the live monitor)
+                result.update({flag: int(bit) for flag, bit in zip(STATUS_FLAGS, values[16])})
                 
                 # Use real PV power from values[19] (like live monitor)
                 result["pv_input_power"] = int(values[19]) if len(values) > 19 and values[19].isdigit() else 0
                 return result
+            return read_error(DecodeError(f"QPIGS: {len(values)} values, expected 21"))
                 
-        return {"error": "No valid response"}
+        return read_error(link_error(response))
     
+    except (ValueError, IndexError) as e:
+        # The inverter replied, only with a garbled value - the link is alive
+        logger.error("Decode error: %s", e)
+        return read_error(DecodeError(f"QPIGS: invalid value ({e})"))
     except Exception as e:
-        logger.error(f"Communication error: {e}")
-        return {"error": str(e)}
+        logger.error("Communication error: %s", e)
+        if health and isinstance(e, OSError):
+            health.record(port, 'QPIGS', (time.monotonic_ns() - started) / 1e9, e, budget=timeout)
+        return read_error(e)
 
 def setup_ha_discovery(client):
     """Setup Home Assistant auto-discovery"""
@@ -122,6 +188,7 @@ def setup_ha_discovery(client):
             "name": config["name"],
             "unique_id": f"{DEVICE_ID}_{sensor_id}",
             "state_topic": state_topic,
+            "json_attributes_topic": f"{MQTT_TOPIC_PREFIX}/sensor/{sensor_id}/attributes",
             "unit_of_measurement": config["unit"],
             "icon": config["icon"],
             "device": {
@@ -133,19 +200,86 @@ def setup_ha_discovery(client):
         }
         
         client.publish(discovery_topic, json.dumps(discovery_payload), retain=True)
-        logger.info(f"Published discovery for {sensor_id}")
+        logger.info("Published discovery for %s", sensor_id)
+    
+    # Energy counters - HA stores counters instead of integrating power history
+    for sensor_id, name, icon in ENERGY_SENSORS:
+        discovery_payload = {
+            "name": name,
+            "unique_id": f"{DEVICE_ID}_{sensor_id}",
+            "state_topic": f"{MQTT_TOPIC_PREFIX}/sensor/{sensor_id}/state",
+            "unit_of_measurement": "kWh",
+            "device_class": "energy",
+            "state_class": "total_increasing",
+            "icon": icon,
+            "device": {
+                "identifiers": [DEVICE_ID],
+                "name": "EASUN SHM II 7K",
+                "model": "SHM II 7K",
+                "manufacturer": "EASUN"
+            }
+        }
+        client.publish(f"homeassistant/sensor/{DEVICE_ID}_{sensor_id}/config",
+                       json.dumps(discovery_payload), retain=True)
+    
+    # Link breaker state (closed / open / half_open) as a diagnostic entity
+    discovery_payload = {
+        "name": "Link Breaker",
+        "unique_id": f"{DEVICE_ID}_link_breaker",
+        "state_topic": f"{MQTT_TOPIC_PREFIX}/sensor/link_breaker/state",
+        "json_attributes_topic": f"{MQTT_TOPIC_PREFIX}/sensor/link_breaker/attributes",
+        "entity_category": "diagnostic",
+        "icon": "mdi:electric-switch",
+        "device": {
+            "identifiers": [DEVICE_ID],
+            "name": "EASUN SHM II 7K",
+            "model": "SHM II 7K",
+            "manufacturer": "EASUN"
+        }
+    }
+    client.publish(f"homeassistant/sensor/{DEVICE_ID}_link_breaker/config",
+                   json.dumps(discovery_payload), retain=True)
+
+def publish_breaker(client, breaker):
+    """Publish the link breaker state (retained, so HA sees it after a restart)"""
+    status = breaker.status()
+    client.publish(f"{MQTT_TOPIC_PREFIX}/sensor/link_breaker/state", status['state'], retain=True)
+    client.publish(f"{MQTT_TOPIC_PREFIX}/sensor/link_breaker/attributes", json.dumps(status), retain=True)
 
-def publish_data(client, data):
-    """Publish sensor data to MQTT"""
+def publish_data(client, data, window=None):
+    """Publish sensor data to MQTT (with min/max attributes for aggregated windows)"""
     for sensor_id, value in data.items():
         if not sensor_id.startswith('error'):
             topic = f"{MQTT_TOPIC_PREFIX}/sensor/{sensor_id}/state"
             client.publish(topic, str(value), retain=True)
     
-    logger.info(f"Published data: PV={data.get('pv_input_power', 0):.1f}W, Battery={data.get('battery_voltage', 0):.1f}V ({data.get('battery_capacity', 0)}%)")
+    if window:
+        for sensor_id in window['min']:
+            attributes = {
+                "min": window['min'][sensor_id],
+                "max": window['max'][sensor_id],
+                "samples": window['count'],
+            }
+            client.publish(f"{MQTT_TOPIC_PREFIX}/sensor/{sensor_id}/attributes", json.dumps(attributes))
+    
+    logger.info("Published data: PV=%.1fW, Battery=%.1fV (%s%%)", data.get('pv_input_power', 0),
+                data.get('battery_voltage', 0), data.get('battery_capacity', 0))
 
 def main():
     """Main function"""
+    setup_logging(LOG_PATH, LOG_LEVEL, fmt='%(asctime)s - %(levelname)s - %(message)s')
+    archive = SampleArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+    rollups = RollupEngine(ARCHIVE_DIR) if ARCHIVE_DIR else None
+    energy = EnergyIntegrator(ENERGY_STATE)
+    historian = SQLiteHistorian(HISTORY_DB) if HISTORY_DB else None
+    shared = SharedSample(SHM_PATH) if SHM_PATH else None
+    # Re-resolve the USB serial adapter when it re-enumerates (ttyUSB0 -> ttyUSB1)
+    tracker = DeviceTracker(SERIAL_PORT).start()
+    capture = CaptureWriter(CAPTURE_PATH) if CAPTURE_PATH else None
+    health = LinkHealth()
+    aggregator = WindowAggregator(PUBLISH_WINDOW, last_prefixes=('is_', 'energy_')) if PUBLISH_WINDOW else None
+    client = None
+    
     try:
         # Setup MQTT client
         client = mqtt.Client()
@@ -155,23 +289,79 @@ def main():
         # Setup Home Assistant discovery
         setup_ha_discovery(client)
         
+        # Inverter off or cable unplugged: skip reads instead of timing out every cycle
+        def breaker_changed(breaker, old, new):
+            if new == 'open':
+                logger.warning("Inverter not responding (%s), next probe in %.0f s", breaker.last_error, breaker.delay)
+            elif new == 'closed':
+                logger.info("Inverter responding again")
+            publish_breaker(client, breaker)
+        
+        breaker = CircuitBreaker(DEVICE_ID, threshold=BREAKER_THRESHOLD, on_change=breaker_changed)
+        publish_breaker(client, breaker)
+        
         # Main loop
         while True:
-            data = read_easun_data()
+            if not breaker.allow():
+                time.sleep(SAMPLE_INTERVAL)
+                continue
+            data = read_easun_data(tracker.path, capture=capture, health=health)
+            if 'error' in data:
+                breaker.failure(data['exception'])
+            else:
+                breaker.success()
+            client.publish(f"{MQTT_TOPIC_PREFIX}/link_health", json.dumps(health.summary()))
+            if PROM_PATH:
+                try:
+                    health.write_prometheus(PROM_PATH, prefix='easun_link')
+                except OSError as e:
+                    logger.warning("Metrics write error %s: %s", PROM_PATH, e)
             
             if 'error' not in data:
-                publish_data(client, data)
-                print(f"✓ Data sent: PV={data['pv_input_power']:.1f}W, Battery={data['battery_voltage']:.1f}V ({data['battery_capacity']}%)")
+                if historian:
+                    historian.add('QPIGS', data)
+                if shared:
+                    shared.write(data)
+                energy.update(data)
+                data.update(energy.sensor_values())
+                if aggregator:
+                    window = aggregator.add(data, time.time())
+                    if window:
+                        publish_data(client, window['values'], window)
+                else:
+                    publish_data(client, data)
+                if archive:
+                    now = time.time()
+                    archive.append(data, now)
+                    rollups.add(data, now)
+                logger.info("✓ Data read: PV=%.1fW, Battery=%.1fV (%s%%)", data['pv_input_power'],
+                            data['battery_voltage'], data['battery_capacity'])
             else:
-                logger.error(f"Read error: {data['error']}")
+                logger.error("Read error: %s", data['error'])
             
-            time.sleep(30)  # Send every 30 seconds
+            time.sleep(SAMPLE_INTERVAL)
             
     except KeyboardInterrupt:
         logger.info("Stopping...")
-        client.disconnect()
     except Exception as e:
-        logger.error(f"Main error: {e}")
+        logger.error("Main error: %s", e)
+    finally:
+        # Also runs on SIGTERM (SystemExit from mpp_logging), not only on Ctrl+C
+        tracker.stop()
+        window = aggregator.close() if aggregator else None
+        if window and client:
+            publish_data(client, window['values'], window)
+        if archive:
+            archive.close()
+        if rollups:
+            rollups.close()
+        energy.save()
+        if historian:
+            historian.close()
+        if capture:
+            capture.close()
+        if client:
+            client.disconnect()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
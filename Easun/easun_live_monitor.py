@@ -1,15 +1,33 @@
 #!/usr/bin/env python3
 """
 EASUN SHM II 7K - Live Monitor
-Real-time display with 15s refresh interval
+Real-time display with adaptive refresh interval
 """
 
 import serial
+import sys
 import time
 import re
 import os
 from datetime import datetime
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpp_scheduler import IntervalScheduler
+from mpp_adaptive import AdaptiveSampler
+from mpp_archive import FIELD_ALIASES
+from mpp_shm import SharedSampleReader
+
+# Sampling configuration
+BASE_INTERVAL = 5        # Normal refresh interval (s)
+MIN_INTERVAL = 1         # Fastest rate the 2400 baud link sustains (s)
+IDLE_INTERVAL = 60       # Night mode refresh interval (s)
+BATTERY_CUTOFF = 44.0    # Battery cut-off voltage (V)
+LOAD_JUMP = 300          # Load change that triggers fast sampling (W)
+SHM_PATH = '/dev/shm/easun_solar'  # Latest sample written by easun_ha_mqtt.py
+SHM_MAX_AGE = 15         # Older shared samples are ignored and the port is read (s)
+
 def clear_screen():
     """Clear terminal screen"""
     os.system('clear' if os.name == 'posix' else 'cls')
@@ -84,7 +102,7 @@ def get_pv_power_bar(power_watts, max_power=2700):
     empty = "░" * (20 - bars)
     return f"[{filled}{empty}] {percentage:.1f}%"
 
-def display_data(data, timestamp):
+def display_data(data, timestamp, sampler=None):
     """Display formatted data - simplified version"""
     clear_screen()
     
@@ -92,6 +110,8 @@ def display_data(data, timestamp):
     print("║                    EASUN SHM II 7K - Live Monitor            ║")
     print("╚═══════════════════════════════════════════════════════════════╝")
     print(f"Last update: {timestamp}")
+    if sampler:
+        print(f"Refresh: {sampler.interval:.0f}s ({sampler.reason})")
     print()
     
     if not data:
@@ -170,20 +190,49 @@ def read_easun_data():
         print(f"Communication error: {e}")
         return None
 
+def read_shared_data(reader):
+    """Latest sample from shared memory if a poller keeps it fresh, else None"""
+    sample = reader.read()
+    if sample is None or sample['age'] > SHM_MAX_AGE:
+        return None
+    # Shared samples use mpp-solar names, the display uses the EASUN ones
+    data = dict(sample)
+    data.update({alias: sample[name] for alias, name in FIELD_ALIASES.items() if name in sample})
+    return data
+
 def main():
     """Main monitoring loop"""
     print("Starting EASUN Live Monitor...")
-    print("Refresh interval: 5 seconds")
+    print(f"Refresh interval: {BASE_INTERVAL}s (adaptive {MIN_INTERVAL}-{IDLE_INTERVAL}s)")
     time.sleep(2)
     
+    scheduler = IntervalScheduler()
+    sampler = AdaptiveSampler(
+        scheduler, 'qpigs', BASE_INTERVAL,
+        min_interval=MIN_INTERVAL,
+        idle_interval=IDLE_INTERVAL,
+        pv_field='pv_charging_power',
+        battery_cutoff=BATTERY_CUTOFF,
+        load_jump=LOAD_JUMP,
+    )
+    
+    shared = SharedSampleReader(SHM_PATH)
+    
+    def refresh():
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Reading the port while easun_ha_mqtt.py polls it would collide on the link
+        data = read_shared_data(shared) or read_easun_data()
+        if data:
+            # Status flag changes play the role of QPIWS warnings here
+            if data.get('device_status'):
+                sampler.observe_warnings(data['device_status'])
+            sampler.observe(data)
+        display_data(data, timestamp, sampler)
+    
+    scheduler.add_section('qpigs', BASE_INTERVAL, refresh)
+    
     try:
-        while True:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            data = read_easun_data()
-            display_data(data, timestamp)
-            
-            # Wait 5 seconds
-            time.sleep(5)
+        scheduler.run()
             
     except KeyboardInterrupt:
         clear_screen()
@@ -4,17 +4,29 @@ EASUN SHM II 7K Data Reader
 Reads and parses data from the inverter
 """
 
+import os
+import sys
 import serial
 import time
 import struct
 import json
 from datetime import datetime
 
+# Shared modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpp_archive import SampleArchive
+from mpp_capture import CaptureWriter
+
+ARCHIVE_DIR = os.getenv('EASUN_ARCHIVE_DIR', 'easun_archive')
+CAPTURE_PATH = os.getenv('EASUN_CAPTURE')  # Raw request/response frames for mpp_capture.py replay
+
 class EasunReader:
-    def __init__(self, port='/dev/ttyUSB0', baud=2400):
+    def __init__(self, port='/dev/ttyUSB0', baud=2400, capture=None):
         self.port_name = port
         self.baud_rate = baud
         self.timeout = 2.0
+        self.capture = capture
         
     def calculate_crc(self, data):
         """Calculate CRC16-XMODEM checksum"""
@@ -41,6 +53,7 @@ class EasunReader:
         port.reset_output_buffer()
         
         # Send command
+        started = time.monotonic_ns()
         port.write(message)
         port.flush()
         
@@ -56,6 +69,8 @@ class EasunReader:
                     break
             time.sleep(0.05)
         
+        if self.capture:
+            self.capture.record(message, response, started, time.monotonic_ns() - started)
         return response
     
     def parse_qpigs(self, response):
@@ -151,7 +166,7 @@ class EasunReader:
         return None
 
 def main():
-    reader = EasunReader()
+    reader = EasunReader(capture=CaptureWriter(CAPTURE_PATH) if CAPTURE_PATH else None)
     
     print("EASUN SHM II 7K Data Reader")
     print("=" * 60)
@@ -179,6 +194,11 @@ def main():
         with open('easun_data.json', 'w') as f:
             json.dump(data, f, indent=2)
         print("\nData saved to easun_data.json")
+        
+        # Append to compact history archive
+        with SampleArchive(ARCHIVE_DIR) as archive:
+            archive.append(data)
+        print(f"Sample appended to {ARCHIVE_DIR}/")
     else:
         print("Failed to read data from inverter")
 
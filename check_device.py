@@ -3,37 +3,33 @@
 Kontrola zařízení a návod na oprávnění
 """
 import os
-import subprocess
+
+from mpp_discovery import enumerate_devices
 
 print("🔌 MPP Solar - Kontrola připojení")
 print("=" * 70)
 
-# Najdeme USB zařízení
+# Najdeme USB zařízení podle VID:PID v sysfs
 print("\n📱 USB zařízení:")
-result = subprocess.run(['lsusb'], capture_output=True, text=True)
-for line in result.stdout.splitlines():
-    if 'Cypress' in line or '0665:5161' in line:
-        print(f"✅ NALEZEN MĚNIČ: {line}")
+devices = enumerate_devices()
+for device in devices:
+    serial = f" sn {device['serial']}" if device['serial'] else ''
+    print(f"✅ NALEZEN: {device['path']} - {device['vid']}:{device['pid']}{serial} {device['description']}")
 
-# Zkontrolujeme hidraw zařízení
-print("\n📁 HID zařízení:")
-hidraw_devices = []
-for i in range(5):
-    device = f'/dev/hidraw{i}'
-    if os.path.exists(device):
-        stat = os.stat(device)
-        perms = oct(stat.st_mode)[-3:]
-        print(f"   {device} - oprávnění: {perms}")
-        hidraw_devices.append(device)
+# Zkontrolujeme oprávnění
+print("\n📁 Oprávnění:")
+for device in devices:
+    if os.path.exists(device['path']):
+        perms = oct(os.stat(device['path']).st_mode)[-3:]
+        access = "čtení/zápis OK" if os.access(device['path'], os.R_OK | os.W_OK) else "bez přístupu"
+        print(f"   {device['path']} - oprávnění: {perms} ({access})")
 
-# Najdeme správné zařízení
+# Měnič s USB HID má přednost před USB-RS232 adaptérem
 print("\n🔍 Hledám měnič...")
-device_found = None
-for device in hidraw_devices:
-    if device == '/dev/hidraw2':  # Podle dokumentace
-        device_found = device
-        print(f"✅ Pravděpodobný měnič: {device}")
-        break
+candidates = sorted(devices, key=lambda d: d['class'] != 'hidraw')
+device_found = candidates[0]['path'] if candidates else None
+if device_found:
+    print(f"✅ Pravděpodobný měnič: {device_found}")
 
 if device_found:
     print(f"\n⚙️ Instrukce pro zprovoznění:")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Adaptivní vzorkování podle stavu měniče
+V noci (bez PV a se stabilní zátěží) zpomalí, při změnách zrychlí
+"""
+
+
+class AdaptiveSampler:
+    """Upravuje interval sekce plánovače podle posledních vzorků
+
+    - PV výkon nulový a zátěž stabilní -> postupně až na idle_interval
+    - změna varování, baterie u cutoff napětí nebo skok zátěže
+      -> okamžitě min_interval (maximum linky)
+    - po odeznění se interval vrací zpět k base_interval (násobí se decay)
+    """
+
+    def __init__(self, scheduler, section, base_interval, min_interval=1.0, idle_interval=60.0,
+                 pv_field='pv_input_power', load_field='ac_output_active_power',
+                 battery_field='battery_voltage', battery_cutoff=None, battery_margin=1.0,
+                 load_jump=300, load_stable=50, fast_hold=5, idle_after=3, decay=2.0):
+        self.scheduler = scheduler
+        self.section = section
+        self.base_interval = float(base_interval)
+        self.min_interval = float(min_interval)
+        self.idle_interval = float(idle_interval)
+        self.pv_field = pv_field
+        self.load_field = load_field
+        self.battery_field = battery_field
+        self.battery_cutoff = battery_cutoff
+        self.battery_margin = battery_margin
+        self.load_jump = load_jump
+        self.load_stable = load_stable
+        self.fast_hold = fast_hold
+        self.idle_after = idle_after
+        self.decay = decay
+
+        self.interval = self.base_interval
+        self.reason = 'base'
+        self._last_load = None
+        self._last_warnings = None
+        self._fast_left = 0
+        self._stable_count = 0
+
+    def trigger(self, reason):
+        """Okamžitě přepne na maximální rychlost"""
+        self._fast_left = self.fast_hold
+        self._stable_count = 0
+        self._apply(self.min_interval, reason)
+
+    def observe_warnings(self, warnings):
+        """Zpracuje stav varování (QPIWS) - při změně zrychlí"""
+        if self._last_warnings is not None and warnings != self._last_warnings:
+            self.trigger('warnings')
+        self._last_warnings = warnings
+
+    def observe(self, sample):
+        """Zpracuje vzorek a nastaví další interval; vrací interval"""
+        if not sample:
+            return self.interval
+
+        load = sample.get(self.load_field)
+        load_delta = abs(load - self._last_load) if load is not None and self._last_load is not None else 0
+        if load is not None:
+            self._last_load = load
+
+        battery = sample.get(self.battery_field)
+        if (self.battery_cutoff is not None and battery
+                and battery <= self.battery_cutoff + self.battery_margin):
+            self.trigger('battery_low')
+            return self.interval
+
+        if load_delta >= self.load_jump:
+            self.trigger('load_jump')
+            return self.interval
+
+        if self._fast_left > 0:
+            self._fast_left -= 1
+            return self.interval
+
+        pv_power = sample.get(self.pv_field) or 0
+        if pv_power <= 0 and load_delta <= self.load_stable:
+            self._stable_count += 1
+        else:
+            self._stable_count = 0
+
+        if self._stable_count >= self.idle_after:
+            # Noc - zpomalujeme postupně až na idle_interval
+            self._apply(min(self.idle_interval, max(self.interval, self.base_interval) * self.decay), 'idle')
+        elif self.interval < self.base_interval:
+            # Doznívání po zrychlení
+            self._apply(min(self.base_interval, self.interval * self.decay), 'decay')
+        elif self.interval > self.base_interval:
+            # Ráno nebo změna zátěže - zpět na základní interval
+            self._apply(self.base_interval, 'base')
+
+        return self.interval
+
+    def _apply(self, interval, reason):
+        self.reason = reason
+        if interval != self.interval:
+            self.interval = interval
+            self.scheduler.set_interval(self.section, interval)
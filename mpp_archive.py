@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Kompaktní binární archiv vzorků QPIGS
+Denní segmenty s pevnou délkou záznamu, čtení přes mmap bez parsování
+"""
+
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+MAGIC = b'MPPA'
+VERSION = 1
+HEADER = struct.Struct('<4sHHH6x')
+
+# Pole záznamu QPIGS (názvy podle mpp-solar) - pořadí se nesmí měnit
+QPIGS_FIELDS = [
+    ('timestamp', 'd'),
+    ('ac_input_voltage', 'f'),
+    ('ac_input_frequency', 'f'),
+    ('ac_output_voltage', 'f'),
+    ('ac_output_frequency', 'f'),
+    ('ac_output_apparent_power', 'h'),
+    ('ac_output_active_power', 'h'),
+    ('ac_output_load', 'h'),
+    ('bus_voltage', 'h'),
+    ('battery_voltage', 'f'),
+    ('battery_charging_current', 'h'),
+    ('battery_capacity', 'h'),
+    ('inverter_heat_sink_temperature', 'h'),
+    ('pv_input_current_for_battery', 'f'),
+    ('pv_input_voltage', 'f'),
+    ('battery_voltage_from_scc', 'f'),
+    ('battery_discharge_current', 'h'),
+    ('pv_input_power', 'h'),
+    ('device_status', 'H'),
+]
+
+# Názvy polí z EASUN skriptů -> názvy archivu
+FIELD_ALIASES = {
+    'grid_voltage': 'ac_input_voltage',
+    'grid_frequency': 'ac_input_frequency',
+    'output_load_percent': 'ac_output_load',
+    'battery_charge_current': 'battery_charging_current',
+    'inverter_temperature': 'inverter_heat_sink_temperature',
+    'inverter_temp': 'inverter_heat_sink_temperature',
+    'inverter_heat_sink_temp': 'inverter_heat_sink_temperature',
+    'pv_input_current': 'pv_input_current_for_battery',
+    'pv_current': 'pv_input_current_for_battery',
+    'pv_voltage': 'pv_input_voltage',
+    'battery_voltage_scc': 'battery_voltage_from_scc',
+    'battery_scc_voltage': 'battery_voltage_from_scc',
+    'pv_charging_power': 'pv_input_power',
+}
+
+# Stavové bity QPIGS (b7..b0) tak, jak je vrací mpp-solar
+STATUS_FLAGS = [
+    'is_sbu_priority_version_added',
+    'is_configuration_changed',
+    'is_scc_firmware_updated',
+    'is_load_on',
+    'is_battery_voltage_to_steady_while_charging',
+    'is_charging_on',
+    'is_scc_charging_on',
+    'is_ac_charging_on',
+]
+
+FIELD_NAMES = [name for name, _ in QPIGS_FIELDS]
+RECORD = struct.Struct('<' + ''.join(fmt for _, fmt in QPIGS_FIELDS))
+SEGMENT_SECONDS = 86400
+
+# Offset a formát každého pole v rámci záznamu (pro čtení jednoho sloupce)
+FIELD_LAYOUT = {}
+_offset = 0
+for _name, _fmt in QPIGS_FIELDS:
+    FIELD_LAYOUT[_name] = (_offset, struct.Struct('<' + _fmt))
+    _offset += struct.calcsize('<' + _fmt)
+
+_NP_TYPES = {'d': '<f8', 'f': '<f4', 'h': '<i2', 'H': '<u2'}
+RECORD_DTYPE = None
+_np = False
+
+
+def _numpy():
+    """numpy nebo None - načte se až při prvním čtení segmentu
+
+    Zapisovatelé (pollery, NDJSON výstup) numpy nepotřebují a jeho import
+    by jim na Raspberry Pi prodloužil start o desetinky sekundy.
+    """
+    global _np, RECORD_DTYPE
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        if numpy is not None:
+            RECORD_DTYPE = numpy.dtype([(name, _NP_TYPES[fmt]) for name, fmt in QPIGS_FIELDS])
+        _np = numpy
+    return _np
+
+
+def segment_name(timestamp):
+    """Název denního segmentu (den v UTC)"""
+    day = datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y%m%d')
+    return f"qpigs_{day}.bin"
+
+
+def status_bits(sample):
+    """Stavové bity jako číslo - z is_* polí nebo z řetězce device_status"""
+    status = sample.get('device_status')
+    if isinstance(status, str) and status.isdigit():
+        return int(status[:16], 2)
+    if isinstance(status, int):
+        return status
+
+    bits = 0
+    for flag in STATUS_FLAGS:
+        bits = (bits << 1) | (1 if sample.get(flag) else 0)
+    return bits
+
+
+def _clamp_short(value, fmt):
+    low, high = (-32768, 32767) if fmt == 'h' else (0, 65535)
+    return max(low, min(high, int(round(value))))
+
+
+def normalize_sample(sample):
+    """Sjednotí názvy polí EASUN/mpp-solar na názvy archivu"""
+    normalized = {}
+    for key, value in sample.items():
+        normalized[FIELD_ALIASES.get(key, key)] = value
+    return normalized
+
+
+def pack_sample(sample, timestamp=None):
+    """Zabalí vzorek do záznamu pevné délky"""
+    sample = normalize_sample(sample)
+    values = []
+    for name, fmt in QPIGS_FIELDS:
+        if name == 'timestamp':
+            values.append(float(timestamp if timestamp is not None else time.time()))
+        elif name == 'device_status':
+            values.append(status_bits(sample) & 0xFFFF)
+        else:
+            value = sample.get(name) or 0
+            if isinstance(value, str):
+                value = float(value.replace('!', '') or 0)
+            values.append(float(value) if fmt == 'f' else _clamp_short(value, fmt))
+    return RECORD.pack(*values)
+
+
+class SampleArchive:
+    """Zapisovač archivu - jeden soubor na den, pouze připojování"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._name = None
+        self._file = None
+
+    def append(self, sample, timestamp=None):
+        """Připojí vzorek (dict z QPIGS) na konec denního segmentu"""
+        if timestamp is None:
+            timestamp = time.time()
+
+        name = segment_name(timestamp)
+        if name != self._name:
+            self._open(name)
+
+        self._file.write(pack_sample(sample, timestamp))
+
+    def _open(self, name):
+        self.close()
+        path = os.path.join(self.directory, name)
+        self._file = open(path, 'ab', buffering=0)
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(QPIGS_FIELDS)))
+        self._name = name
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+            self._name = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _FieldSequence:
+    """Sekvence jednoho pole čtená přímo z mmap (pro bisect bez numpy)"""
+
+    def __init__(self, segment, name):
+        self._buffer = segment._mmap
+        self._count = segment.count
+        self._offset, self._struct = FIELD_LAYOUT[name]
+        self._offset += HEADER.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return self._struct.unpack_from(self._buffer, self._offset + i * RECORD.size)[0]
+
+
+class Segment:
+    """Jeden denní segment namapovaný do paměti"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path}: soubor je příliš krátký")
+
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path}: neznámý formát archivu")
+
+        # Nedopsaný poslední záznam ignorujeme
+        self.count = (size - HEADER.size) // RECORD.size
+        self._records = None
+        self._np = _numpy()
+
+    def __len__(self):
+        return self.count
+
+    def records(self):
+        """Pole záznamů (numpy) nebo memoryview s pevnou délkou záznamu"""
+        if self._records is None:
+            end = HEADER.size + self.count * RECORD.size
+            if self._np is not None:
+                self._records = self._np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=self.count,
+                                              offset=HEADER.size)
+            else:
+                self._records = memoryview(self._mmap)[HEADER.size:end]
+        return self._records
+
+    def column(self, name, lo=0, hi=None):
+        """Sloupec jako pohled bez kopírování (s numpy) nebo seznam hodnot
+
+        Čte se jen požadované pole v rozsahu záznamů [lo, hi).
+        """
+        hi = self.count if hi is None else hi
+        if self._np is not None:
+            return self.records()[name][lo:hi]
+        values = _FieldSequence(self, name)
+        return [values[i] for i in range(lo, hi)]
+
+    def search(self, start=None, end=None):
+        """Binární vyhledání rozsahu záznamů s časem v intervalu [start, end)"""
+        if self._np is not None:
+            timestamps = self.records()['timestamp']
+            lo = int(self._np.searchsorted(timestamps, start, 'left')) if start is not None else 0
+            hi = int(self._np.searchsorted(timestamps, end, 'left')) if end is not None else self.count
+            return lo, hi
+
+        timestamps = _FieldSequence(self, 'timestamp')
+        lo = bisect.bisect_left(timestamps, start) if start is not None else 0
+        hi = bisect.bisect_left(timestamps, end, lo) if end is not None else self.count
+        return lo, hi
+
+    def aggregate(self, name, lo=0, hi=None):
+        """count/min/max/sum/last pole v rozsahu [lo, hi) bez vytváření sloupce"""
+        hi = self.count if hi is None else hi
+        if hi <= lo:
+            return {'count': 0, 'min': None, 'max': None, 'sum': 0.0, 'last': None}
+
+        if self._np is not None:
+            values = self.records()[name][lo:hi]
+            return {'count': hi - lo, 'min': float(values.min()), 'max': float(values.max()),
+                    'sum': float(values.sum(dtype='f8')), 'last': float(values[-1])}
+
+        values = _FieldSequence(self, name)
+        low = high = last = values[lo]
+        total = 0.0
+        for i in range(lo, hi):
+            last = values[i]
+            total += last
+            if last < low:
+                low = last
+            elif last > high:
+                high = last
+        return {'count': hi - lo, 'min': low, 'max': high, 'sum': total, 'last': last}
+
+    def columns(self, names=None):
+        """Více sloupců najednou - bez numpy jediný průchod daty"""
+        names = names or FIELD_NAMES
+        if self._np is not None:
+            records = self.records()
+            return {name: records[name] for name in names}
+
+        indexes = [FIELD_NAMES.index(name) for name in names]
+        result = {name: [] for name in names}
+        appenders = [result[name].append for name in names]
+        for values in RECORD.iter_unpack(self.records()):
+            for index, append in zip(indexes, appenders):
+                append(values[index])
+        return result
+
+    def row(self, i):
+        """Jeden záznam jako dict"""
+        offset = HEADER.size + i * RECORD.size
+        return dict(zip(FIELD_NAMES, RECORD.unpack_from(self._mmap, offset)))
+
+    def close(self):
+        self._records = None
+        if getattr(self, '_mmap', None) is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Pohledy numpy ještě drží buffer - uvolní ho garbage collector
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_segments(directory, start=None, end=None):
+    """Seřazený seznam segmentů v adresáři, volitelně jen pro dny v [start, end)"""
+    if not os.path.isdir(directory):
+        return []
+
+    first = segment_name(start) if start is not None else None
+    last = segment_name(end - 1e-6) if end is not None else None
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith('qpigs_') and name.endswith('.bin')
+                  and (first is None or name >= first) and (last is None or name <= last))
+
+
+def benchmark(directory, samples=17280):
+    """Měří cenu zápisu a čtení celého dne (17280 vzorků = 5 s interval)"""
+    import json
+    import shutil
+
+    sample = {
+        'ac_input_voltage': 230.1, 'ac_input_frequency': 50.0, 'ac_output_voltage': 229.9,
+        'ac_output_frequency': 50.0, 'ac_output_apparent_power': 345, 'ac_output_active_power': 327,
+        'ac_output_load': 6, 'bus_voltage': 391, 'battery_voltage': 53.0, 'battery_charging_current': 3,
+        'battery_capacity': 58, 'inverter_heat_sink_temperature': 47, 'pv_input_current_for_battery': 3.0,
+        'pv_input_voltage': 237.2, 'battery_voltage_from_scc': 53.1, 'battery_discharge_current': 0,
+        'pv_input_power': 711, 'is_load_on': 1, 'is_scc_charging_on': 1, 'is_charging_on': 1,
+    }
+    json_size = len(json.dumps({'timestamp': datetime.now().isoformat(), 'status': sample}, indent=2))
+
+    shutil.rmtree(directory, ignore_errors=True)
+    start_ts = datetime(2025, 6, 24, tzinfo=timezone.utc).timestamp()
+
+    started = time.perf_counter()
+    with SampleArchive(directory) as archive:
+        for i in range(samples):
+            archive.append(sample, start_ts + i * 5)
+    append_time = time.perf_counter() - started
+
+    path = list_segments(directory)[0]
+    started = time.perf_counter()
+    with Segment(path) as segment:
+        voltages = segment.column('battery_voltage')
+        total = sum(voltages) if _numpy() is None else float(voltages.sum())
+    scan_time = time.perf_counter() - started
+
+    print(f"Vzorků:            {samples}")
+    print(f"Velikost záznamu:  {RECORD.size} B (JSON snapshot ~{json_size} B)")
+    print(f"Velikost segmentu: {os.path.getsize(path)} B")
+    print(f"Zápis:             {append_time / samples * 1e6:.1f} µs/vzorek")
+    print(f"Čtení celého dne:  {scan_time * 1000:.1f} ms (numpy: {'ano' if _numpy() is not None else 'ne'})")
+    print(f"Kontrolní součet:  {total:.1f}")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        benchmark(sys.argv[2] if len(sys.argv) > 2 else '/tmp/mpp_archive_bench')
+    else:
+        print("Použití: python3 mpp_archive.py --bench [adresář]")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Jistič (circuit breaker) pro nedostupný měnič
+Vypnutý měnič nebo odpojené USB nepálí celý cyklus timeouty a opakováními
+
+Po `threshold` chybách linky za sebou se jistič rozpojí: příkazy na zařízení
+okamžitě končí chybou BreakerOpen a jen jednou za čas se pošle levný dotaz
+(QPI). Pokud neodpoví, další pokus přijde za dvojnásobnou dobu (až
+`max_delay`), pokud odpoví, jistič se sepne a příkazy jdou normálně. NAK
+a chyba dekódování znamenají, že měnič odpovídá - jistič nerozpojí.
+
+Stavy: closed (normální provoz), open (příkazy se přeskakují), half_open
+(právě běží zkušební dotaz).
+
+Příklad:
+    python3 mpp_breaker.py /dev/hidraw2 --interval 2
+"""
+
+import argparse
+import threading
+import time
+
+from mpp_linkhealth import error_kind
+from mpp_transport import TransportError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+PROBE_COMMAND = 'QPI'
+# Měnič odpověděl, jen ne tak, jak jsme čekali - linka žije
+ALIVE_KINDS = ('nak', 'decode')
+
+
+class BreakerOpen(TransportError):
+    """Příkaz přeskočen - jistič zařízení je rozpojený"""
+    kind = 'open'
+
+
+class CircuitBreaker:
+    """Jistič jednoho zařízení (bezpečné pro vlákna)
+
+    on_change(breaker, old, new) se volá při každé změně stavu.
+    """
+
+    def __init__(self, device, threshold=3, base_delay=5.0, max_delay=300.0,
+                 probe_command=PROBE_COMMAND, on_change=None):
+        self.device = device
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.probe_command = probe_command
+        self.on_change = on_change
+        self.state = CLOSED
+        self.failures = 0
+        self.delay = base_delay
+        self.next_probe = 0.0
+        self.since = time.time()
+        self.last_error = None
+        self.counts = {'trips': 0, 'skipped': 0, 'probes': 0}
+        # on_change se volá pod zámkem a smí číst status()
+        self._lock = threading.RLock()
+
+    def _set_state(self, state):
+        old, self.state = self.state, state
+        if old != state:
+            self.since = time.time()
+            if self.on_change:
+                self.on_change(self, old, state)
+
+    def allow(self):
+        """True = příkaz smí jít na linku (v half_open jako zkušební dotaz)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self.next_probe:
+                self.counts['probes'] += 1
+                self._set_state(HALF_OPEN)
+                return True
+            self.counts['skipped'] += 1
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.delay = self.base_delay
+            self._set_state(CLOSED)
+
+    def failure(self, error):
+        """Výsledek s chybou; NAK a chyba dekódování se berou jako živá linka"""
+        if error_kind(error) in ALIVE_KINDS:
+            self.success()
+            return
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == HALF_OPEN:
+                # Zkušební dotaz neprošel - čekat dvakrát déle
+                self.delay = min(self.delay * 2, self.max_delay)
+            elif self.state == CLOSED and self.failures >= self.threshold:
+                self.counts['trips'] += 1
+            else:
+                return
+            self.next_probe = time.monotonic() + self.delay
+            self._set_state(OPEN)
+
+    def call(self, runner, port, command):
+        """runner(port, command) přes jistič; v half_open nejdřív levný zkušební dotaz
+
+        BreakerOpen jen pro příkaz přeskočený bez komunikace; neúspěšný
+        zkušební dotaz vyhodí svou skutečnou chybu (pro statistiky linky).
+        """
+        if not self.allow():
+            raise BreakerOpen(f"{self.device}: jistič rozpojený, další pokus za {self.retry_in():.0f} s")
+        if self.state == HALF_OPEN and command != self.probe_command:
+            try:
+                runner(port, self.probe_command)
+            except Exception as e:
+                self.failure(e)
+                raise
+            self.success()
+        try:
+            result = runner(port, command)
+        except Exception as e:
+            self.failure(e)
+            raise
+        self.success()
+        return result
+
+    def retry_in(self):
+        """Sekundy do dalšího zkušebního dotazu (0 mimo stav open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.next_probe - time.monotonic())
+
+    def status(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'retry_in': round(self.retry_in(), 1),
+                'delay': self.delay,
+                'since': round(self.since, 3),
+                'last_error': self.last_error,
+                **self.counts,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_on_change = None
+
+
+def set_on_change(callback):
+    """Callback změny stavu pro jističe z get_breaker (on_change(breaker, old, new))"""
+    global _on_change
+    _on_change = callback
+    for breaker in _breakers.values():
+        breaker.on_change = callback
+
+
+def get_breaker(device):
+    """Sdílený jistič zařízení (jeden na cestu)"""
+    with _breakers_lock:
+        breaker = _breakers.get(device)
+        if breaker is None:
+            breaker = _breakers[device] = CircuitBreaker(device, on_change=_on_change)
+        return breaker
+
+
+def guarded(runner):
+    """Runner pro CommandQueue, který jde přes jistič zařízení"""
+    def run(port, command):
+        return get_breaker(port).call(runner, port, command)
+    return run
+
+
+def main():
+    from mpp_transport import transport_runner
+
+    parser = argparse.ArgumentParser(description='Dotazování přes jistič (ukázka chování při výpadku)')
+    parser.add_argument('port', nargs='?', default='/dev/hidraw2')
+    parser.add_argument('--command', default='QPIGS')
+    parser.add_argument('--interval', type=float, default=2.0)
+    parser.add_argument('--threshold', type=int, default=3)
+    args = parser.parse_args()
+
+    def changed(breaker, old, new):
+        print(f"{breaker.device}: {old} -> {new}" + (f" ({breaker.last_error})" if new == OPEN else ''))
+
+    breaker = CircuitBreaker(args.port, threshold=args.threshold, on_change=changed)
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                breaker.call(transport_runner, args.port, args.command)
+                print(f"{args.command} OK za {time.monotonic() - started:.2f} s")
+            except BreakerOpen as e:
+                print(f"přeskočeno: {e}")
+            except (OSError, TransportError) as e:
+                print(f"{args.command}: {e}")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print(f"\n{breaker.status()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Záznam surových rámců komunikace se střídačem a jejich přehrání
+Produkční provoz lze přehrát offline přes dekódování a všechny výstupy
+
+Soubor: hlavička MAGIC + verze, pak záznamy za sebou. Každý záznam je jeden
+dotaz a odpověď: monotonní čas odeslání (ns), čas hodin (s), odezva (µs),
+délky rámců a samotné bajty. Prázdná odpověď = chyba komunikace (timeout).
+
+Příklady:
+    python3 mpp_follow.py --follow 5 --capture provoz.cap
+    python3 mpp_capture.py show provoz.cap
+    python3 mpp_capture.py replay provoz.cap --speed 0 --shm /dev/shm/mpp_replay
+"""
+
+import argparse
+import json
+import signal
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from mpp_transport import ResponseTimeout, TransportError, build_command, decode, parse_response
+
+MAGIC = b'MPPC'
+VERSION = 1
+HEADER = struct.Struct('<4sH')
+FRAME = struct.Struct('<QdIHH')
+
+Frame = namedtuple('Frame', 'monotonic_ns wall latency_us request response')
+
+
+def frame_command(request):
+    """Název příkazu z rámce dotazu (bez CRC a CR)"""
+    return request.rstrip(b'\r')[:-2].decode('ascii', errors='replace')
+
+
+class CaptureWriter:
+    """Připisuje dotazy a odpovědi do záznamového souboru (bezpečné pro vlákna)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+            self._file.flush()
+
+    def record(self, request, response, started_ns, latency_ns, wall=None):
+        """Uloží jeden dotaz/odpověď; started_ns je time.monotonic_ns() odeslání"""
+        wall = time.time() if wall is None else wall
+        latency_us = min(latency_ns // 1000, 0xFFFFFFFF)
+        with self._lock:
+            self._file.write(FRAME.pack(started_ns, wall, latency_us, len(request), len(response))
+                             + request + response)
+            # Po každém záznamu na disk - při pádu procesu nepřijdeme o poslední rámce
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_capture(path):
+    """Generátor Frame ze záznamového souboru"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[0] != MAGIC:
+            raise ValueError(f"{path}: není záznam rámců MPP")
+        while True:
+            head = f.read(FRAME.size)
+            if len(head) < FRAME.size:
+                return  # konec souboru (případně useknutý poslední záznam)
+            monotonic_ns, wall, latency_us, request_len, response_len = FRAME.unpack(head)
+            request = f.read(request_len)
+            response = f.read(response_len)
+            if len(response) < response_len:
+                return
+            yield Frame(monotonic_ns, wall, latency_us, request, response)
+
+
+class ReplayPort:
+    """Náhrada PI30Port, která vrací odpovědi ze záznamu
+
+    speed=1.0 přehrává v původním čase (mezery mezi dotazy i odezva),
+    speed=10 desetkrát rychleji, speed=0 bez čekání. Dotaz, který
+    neodpovídá dalšímu rámci záznamu, přeskočí na nejbližší stejný dotaz.
+    """
+
+    def __init__(self, capture_path, speed=0.0):
+        self.path = capture_path
+        self.speed = speed
+        self.frames = list(read_capture(capture_path))
+        self.position = 0
+        self._origin = None
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def set_path(self, path):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def _wait(self, frame):
+        if not self.speed:
+            return
+        if self._origin is None:
+            self._origin = (time.monotonic_ns(), frame.monotonic_ns)
+        started, captured = self._origin
+        due = started + (frame.monotonic_ns - captured + frame.latency_us * 1000) / self.speed
+        delay = (due - time.monotonic_ns()) / 1e9
+        if delay > 0:
+            time.sleep(delay)
+
+    def next_frame(self, request=None):
+        """Další rámec (s request jen stejný dotaz); TransportError na konci záznamu"""
+        while self.position < len(self.frames):
+            frame = self.frames[self.position]
+            self.position += 1
+            if request is None or frame.request == request:
+                self._wait(frame)
+                return frame
+        raise TransportError("Konec záznamu")
+
+    def exchange(self, frame):
+        captured = self.next_frame(frame)
+        if not captured.response:
+            raise ResponseTimeout("Timeout (zaznamenáno)")
+        return captured.response
+
+    def query(self, command):
+        return decode(command, parse_response(self.exchange(build_command(command))))
+
+
+class ReplayOutputs:
+    """Výstupy přehrávání - stejné jako v pollerech (NDJSON, sdílená paměť, SQLite, archiv)"""
+
+    def __init__(self, out=None, shm_path=None, history_db=None, archive_dir=None):
+        self.out = out
+        self.shared = None
+        self.historian = None
+        self.archive = None
+        if shm_path:
+            from mpp_shm import SharedSample
+            self.shared = SharedSample(shm_path)
+        if history_db:
+            from mpp_sqlite import SQLiteHistorian
+            self.historian = SQLiteHistorian(history_db)
+        if archive_dir:
+            from mpp_archive import SampleArchive
+            self.archive = SampleArchive(archive_dir)
+
+    def emit(self, command, record, timestamp):
+        if self.out:
+            self.out.write(json.dumps(record, separators=(',', ':')) + '\n')
+        if 'error' in record:
+            return
+        data = {k: v for k, v in record.items() if k not in ('command', 'ts')}
+        if self.shared and command == 'QPIGS':
+            self.shared.write(data, timestamp=timestamp)
+        elif self.shared and command == 'QPIWS':
+            self.shared.write(warnings=data, timestamp=timestamp)
+        if self.historian:
+            self.historian.add(command, data, timestamp)
+        if self.archive and command == 'QPIGS':
+            self.archive.append(data, timestamp)
+
+    def close(self):
+        if self.out:
+            self.out.flush()
+        if self.shared:
+            self.shared.close()
+        if self.historian:
+            self.historian.close()
+        if self.archive:
+            self.archive.close()
+
+
+def replay(port, outputs):
+    """Přehraje všechny rámce přes dekódování a výstupy; vrací statistiku"""
+    stats = {'frames': 0, 'decoded': 0, 'errors': 0}
+    started = time.perf_counter()
+    while True:
+        try:
+            frame = port.next_frame()
+        except TransportError:
+            break
+        command = frame_command(frame.request)
+        record = {'command': command, 'ts': round(frame.wall, 3)}
+        try:
+            if not frame.response:
+                raise ResponseTimeout("Timeout (zaznamenáno)")
+            record.update(decode(command, parse_response(frame.response)))
+            stats['decoded'] += 1
+        except (TransportError, ValueError, IndexError) as e:
+            record['error'] = str(e)
+            stats['errors'] += 1
+        stats['frames'] += 1
+        outputs.emit(command, record, frame.wall)
+
+    stats['elapsed'] = time.perf_counter() - started
+    stats['frames_per_s'] = stats['frames'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    return stats
+
+
+def show(path):
+    """Vypíše rámce záznamu (čas, příkaz, odezva, velikost)"""
+    for frame in read_capture(path):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(frame.wall))
+        response = f"{len(frame.response)} B" if frame.response else 'bez odpovědi'
+        print(f"{stamp} {frame_command(frame.request):<8} {frame.latency_us / 1000:>8.1f}ms  "
+              f"{response}  {frame.response[:48]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Záznam surových rámců MPP Solar / EASUN')
+    sub = parser.add_subparsers(dest='action', required=True)
+    show_parser = sub.add_parser('show', help='Vypsat rámce záznamu')
+    show_parser.add_argument('file')
+    replay_parser = sub.add_parser('replay', help='Přehrát záznam přes dekódování a výstupy')
+    replay_parser.add_argument('file')
+    replay_parser.add_argument('--speed', type=float, default=0.0,
+                               help='1 = původní čas, 10 = 10x rychleji, 0 = bez čekání (výchozí)')
+    replay_parser.add_argument('--quiet', action='store_true', help='Bez NDJSON na stdout')
+    replay_parser.add_argument('--shm', help='Zapisovat do sdílené paměti (cesta pod /dev/shm)')
+    replay_parser.add_argument('--history-db', help='Zapisovat do SQLite historie')
+    replay_parser.add_argument('--archive', help='Zapisovat do binárního archivu QPIGS')
+    args = parser.parse_args()
+
+    if args.action == 'show':
+        show(args.file)
+        return
+
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    port = ReplayPort(args.file, args.speed)
+    outputs = ReplayOutputs(None if args.quiet else sys.stdout, args.shm, args.history_db, args.archive)
+    try:
+        stats = replay(port, outputs)
+    finally:
+        outputs.close()
+    print(f"{stats['frames']} rámců ({stats['decoded']} dekódováno, {stats['errors']} chyb) "
+          f"za {stats['elapsed']:.3f} s = {stats['frames_per_s']:.0f} rámců/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
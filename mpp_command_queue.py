@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Prioritní fronta příkazů pro MPP Solar
+Nastavovací příkazy (POP02, PCP03...) předbíhají pravidelné dotazování
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Prioritní třídy - nižší číslo = vyšší priorita
+PRIORITY_CONTROL = -1    # Řízení fronty (přepnutí portu) - před všemi příkazy
+PRIORITY_SETTER = 0      # Interaktivní / nastavovací příkazy
+PRIORITY_REALTIME = 1    # Aktuální stav (QPIGS, QPIWS)
+PRIORITY_BACKGROUND = 2  # Nastavení a energie (QPIRI, QET...)
+
+PRIORITY_NAMES = {
+    PRIORITY_SETTER: 'setter',
+    PRIORITY_REALTIME: 'realtime',
+    PRIORITY_BACKGROUND: 'background',
+}
+
+REALTIME_COMMANDS = ('QPIGS', 'QPIGS2', 'QPIWS', 'QMOD')
+
+
+def command_priority(command):
+    """Určí prioritní třídu podle názvu příkazu"""
+    name = command.strip().upper()
+    if not name.startswith('Q'):
+        # PI30 nastavovací příkazy nezačínají Q (POP, PCP, PBCV, PE/PD...)
+        return PRIORITY_SETTER
+    if name in REALTIME_COMMANDS:
+        return PRIORITY_REALTIME
+    return PRIORITY_BACKGROUND
+
+
+RUNNER_TIMEOUT = 10  # Timeout jednoho spuštění mpp-solar (s)
+
+
+class QueueStopped(RuntimeError):
+    """Fronta byla zastavena dřív, než se příkaz vykonal"""
+
+
+def mpp_solar_runner(port, command, timeout=RUNNER_TIMEOUT):
+    """Spustí mpp-solar příkaz a vrátí data bez metadat"""
+    cmd = ['mpp-solar', '-p', port, '-c', command, '-o', 'json']
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"mpp-solar skončil s kódem {result.returncode}")
+
+    data = json.loads(result.stdout)
+    return {k: v for k, v in data.items() if not k.startswith('_')}
+
+
+class CommandRequest:
+    """Jeden příkaz čekající ve frontě"""
+
+    def __init__(self, command, priority, callback=None, action=None):
+        self.command = command
+        self.priority = priority
+        self.callback = callback
+        self.action = action  # Řídicí požadavek: action() místo příkazu na port
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    @property
+    def wait_time(self):
+        """Doba čekání ve frontě (s)"""
+        if self.started is None:
+            return time.monotonic() - self.submitted
+        return self.started - self.submitted
+
+    @property
+    def run_time(self):
+        """Doba vykonání příkazu (s)"""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def wait(self, timeout=None):
+        """Počká na dokončení a vrátí výsledek (None při chybě i po timeoutu - viz done())"""
+        self._done.wait(timeout)
+        return self.result
+
+    def done(self):
+        return self._done.is_set()
+
+
+class CommandQueue:
+    """Plánovač příkazů pro jeden port
+
+    Příkazy se vykonávají sekvenčně jedním vláknem. Po každém dokončeném
+    příkazu se vybírá čekající příkaz s nejvyšší prioritou, takže nastavovací
+    příkaz čeká nejvýše na dokončení právě běžícího příkazu.
+    """
+
+    def __init__(self, port, runner=None, budget=None):
+        self.port = port
+        self.runner = runner or mpp_solar_runner
+        # Nejdelší doba jednoho příkazu v runneru (s) - pro timeout čekání na výsledek
+        self.budget = budget or (lambda command: RUNNER_TIMEOUT)
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._stats = {
+            name: {'count': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'wait_last': 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def start(self):
+        """Spustí obslužné vlákno"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._worker, name=f"mpp-queue-{self.port}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Zastaví obslužné vlákno; čekající příkazy skončí chybou QueueStopped"""
+        with self._cond:
+            self._running = False
+            pending = [request for _, _, request in self._heap]
+            self._heap.clear()
+            self._cond.notify_all()
+        for request in pending:
+            request.error = QueueStopped(f"Fronta {self.port} zastavena")
+            request._done.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, command, priority=None, callback=None):
+        """Zařadí příkaz do fronty a vrátí CommandRequest
+
+        callback(request) se zavolá z obslužného vlákna po dokončení.
+        """
+        if priority is None:
+            priority = command_priority(command)
+
+        request = CommandRequest(command, priority, callback)
+        with self._cond:
+            heapq.heappush(self._heap, (priority, next(self._counter), request))
+            self._cond.notify()
+
+        if not self._running:
+            self.start()
+        return request
+
+    def move(self, port, cleanup=None):
+        """Přepne frontu na novou cestu k zařízení (po přepojení USB)
+
+        Přepnutí i cleanup(stará cesta) - typicky zavření starého portu - běží
+        v obslužném vlákně mezi dvěma příkazy, takže se port nezavře jinému
+        vláknu uprostřed výměny. Vrací CommandRequest.
+        """
+        def switch():
+            old, self.port = self.port, port
+            if cleanup:
+                cleanup(old)
+            return port
+
+        # Hned přeregistrovat - get_queue(nová cesta) nesmí založit druhé vlákno pro stejné zařízení
+        with _queues_lock:
+            for key in [key for key, queue in _queues.items() if queue is self]:
+                del _queues[key]
+            _queues[port] = self
+
+        request = CommandRequest(f"move {port}", PRIORITY_CONTROL, action=switch)
+        with self._cond:
+            heapq.heappush(self._heap, (PRIORITY_CONTROL, next(self._counter), request))
+            self._cond.notify()
+
+        if not self._running:
+            self.start()
+        return request
+
+    def run(self, command, priority=None, timeout=None):
+        """Zařadí příkaz a počká na výsledek"""
+        return self.submit(command, priority).wait(timeout)
+
+    def wait_timeout(self, command):
+        """Jak dlouho čekat na příkaz zařazený teď: čekající před ním, právě běžící a on sám"""
+        with self._cond:
+            ahead = len(self._heap)
+        return (ahead + 2) * self.budget(command)
+
+    def pending(self):
+        """Počet čekajících příkazů"""
+        with self._cond:
+            return len(self._heap)
+
+    def stats(self):
+        """Statistiky čekání ve frontě podle prioritní třídy"""
+        with self._cond:
+            report = {}
+            for name, values in self._stats.items():
+                count = values['count']
+                report[name] = {
+                    'count': count,
+                    'wait_avg': round(values['wait_total'] / count, 3) if count else 0.0,
+                    'wait_max': round(values['wait_max'], 3),
+                    'wait_last': round(values['wait_last'], 3),
+                }
+            report['pending'] = len(self._heap)
+            return report
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _, _, request = heapq.heappop(self._heap)
+
+            request.started = time.monotonic()
+            try:
+                if request.action:
+                    request.result = request.action()
+                else:
+                    request.result = self.runner(self.port, request.command)
+            except Exception as e:
+                request.error = e
+            request.finished = time.monotonic()
+            if request.action is None:
+                self._record(request)
+            request._done.set()
+
+            if request.callback:
+                try:
+                    request.callback(request)
+                except Exception as e:
+                    logger.error("Chyba v callbacku příkazu %s: %s", request.command, e)
+
+    def _record(self, request):
+        wait = request.wait_time
+        with self._cond:
+            values = self._stats[PRIORITY_NAMES.get(request.priority, 'background')]
+            values['count'] += 1
+            values['wait_total'] += wait
+            values['wait_last'] = wait
+            values['wait_max'] = max(values['wait_max'], wait)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(port, runner=None, budget=None):
+    """Vrátí sdílenou frontu pro daný port (jedna fronta na port)"""
+    with _queues_lock:
+        queue = _queues.get(port)
+        if queue is None:
+            queue = CommandQueue(port, runner, budget)
+            _queues[port] = queue
+        return queue
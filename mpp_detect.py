@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Detekce protokolu měniče s uloženým výsledkem
+Při dalším startu stačí jeden potvrzovací dotaz místo zkoušení všech protokolů
+"""
+
+import json
+import os
+import sys
+import time
+
+from mpp_discovery import usb_identity
+from mpp_transport import PI30Port, TransportError, build_command, parse_response
+
+# (protokol, identifikační příkaz, začátek odpovědi) v pořadí zkoušení
+PROBES = [
+    ('PI30', 'QPI', 'PI3'),
+    ('PI18', '^P005PI', '^D00518'),
+    ('PI17', '^P003PI', '^D00517'),
+]
+
+DEFAULT_CACHE = os.path.expanduser('~/.cache/mpp_solar/protocols.json')
+
+
+class ProtocolCache:
+    """Výsledky detekce v JSON souboru, klíč = port + USB identita"""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def key(port, identity):
+        return f"{port}|{identity or 'unknown'}"
+
+    def get(self, port, identity):
+        return self.entries.get(self.key(port, identity))
+
+    def put(self, port, identity, protocol):
+        self.entries[self.key(port, identity)] = {'protocol': protocol, 'detected': time.time()}
+        self.save()
+
+    def forget(self, port, identity):
+        if self.entries.pop(self.key(port, identity), None) is not None:
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def probe(device, protocol):
+    """Ověří jedním dotazem, že zařízení mluví daným protokolem"""
+    for name, command, expected in PROBES:
+        if name == protocol:
+            try:
+                text = parse_response(device.exchange(build_command(command)))
+            except (OSError, TransportError):
+                return False
+            return text.startswith(expected)
+    raise ValueError(f"Neznámý protokol: {protocol}")
+
+
+def detect_protocol(device, cache=None, verbose=False):
+    """Protokol zařízení - z cache s jedním potvrzením, jinak plnou detekcí
+
+    Vrací (protokol nebo None, počet dotazů na zařízení).
+    """
+    cache = cache if cache is not None else ProtocolCache()
+    identity = usb_identity(device.path)
+    queries = 0
+
+    cached = cache.get(device.path, identity)
+    if cached:
+        queries += 1
+        if probe(device, cached['protocol']):
+            return cached['protocol'], queries
+        if verbose:
+            print(f"Uložený protokol {cached['protocol']} nesouhlasí, detekuji znovu")
+        cache.forget(device.path, identity)
+
+    for protocol, _, _ in PROBES:
+        if cached and protocol == cached['protocol']:
+            continue
+        queries += 1
+        if probe(device, protocol):
+            cache.put(device.path, identity, protocol)
+            return protocol, queries
+    return None, queries
+
+
+if __name__ == "__main__":
+    port = sys.argv[1] if len(sys.argv) > 1 else '/dev/hidraw2'
+    started = time.perf_counter()
+    with PI30Port(port, timeout=1.5) as device:
+        protocol, queries = detect_protocol(device, verbose=True)
+    elapsed = time.perf_counter() - started
+    print(f"{port}: {protocol or 'nerozpoznán'} ({queries} dotazů, {elapsed:.2f} s, USB {usb_identity(port)})")
+    sys.exit(0 if protocol else 1)
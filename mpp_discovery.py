@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Vyhledání měničů přes sysfs a sledování připojení/odpojení USB
+Bez lsusb a bez pevně zadaného /dev/hidraw2
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Známá USB zařízení: (VID, PID) -> popis
+KNOWN_DEVICES = {
+    ('0665', '5161'): 'MPP Solar / Voltronic USB HID',
+    ('1a86', '7523'): 'CH340 USB-RS232',
+    ('067b', '2303'): 'PL2303 USB-RS232',
+}
+
+# (třída sysfs, začátek názvu zařízení)
+DEVICE_CLASSES = [('hidraw', 'hidraw'), ('tty', 'ttyUSB'), ('tty', 'ttyACM')]
+
+NETLINK_KOBJECT_UEVENT = 15
+
+
+def _read_sysfs(path):
+    try:
+        with open(path, encoding='ascii', errors='replace') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _usb_device_dir(device_link):
+    """Adresář USB zařízení (s idVendor) nad rozhraním hidraw/tty"""
+    if not os.path.exists(device_link):
+        return None
+    path = os.path.realpath(device_link)
+    while path != '/' and not os.path.exists(os.path.join(path, 'idVendor')):
+        path = os.path.dirname(path)
+    return None if path == '/' else path
+
+
+def _device_class(name):
+    for device_class, prefix in DEVICE_CLASSES:
+        if name.startswith(prefix):
+            return device_class
+    return None
+
+
+def _natural_key(name):
+    digits = ''.join(c for c in name if c.isdigit())
+    return name.rstrip('0123456789'), int(digits or 0)
+
+
+def enumerate_devices(ids=KNOWN_DEVICES):
+    """Seznam USB měničů/adaptérů: dict path, class, vid, pid, serial, description
+
+    ids=None vrátí všechna USB hidraw/tty zařízení.
+    """
+    devices = []
+    for device_class, prefix in DEVICE_CLASSES:
+        base = f'/sys/class/{device_class}'
+        try:
+            names = sorted((n for n in os.listdir(base) if n.startswith(prefix)), key=_natural_key)
+        except OSError:
+            continue
+        for name in names:
+            usb = _usb_device_dir(f'{base}/{name}/device')
+            if usb is None:
+                continue
+            vid = _read_sysfs(os.path.join(usb, 'idVendor'))
+            pid = _read_sysfs(os.path.join(usb, 'idProduct'))
+            if ids is not None and (vid, pid) not in ids:
+                continue
+            devices.append({
+                'path': f'/dev/{name}',
+                'class': device_class,
+                'vid': vid,
+                'pid': pid,
+                'serial': _read_sysfs(os.path.join(usb, 'serial')) or '',
+                'description': (ids or KNOWN_DEVICES).get((vid, pid), _read_sysfs(os.path.join(usb, 'product'))),
+            })
+    return devices
+
+
+def usb_identity(port):
+    """'vid:pid:serial' USB zařízení za portem (sysfs), nebo None"""
+    name = os.path.basename(os.path.realpath(port))
+    device_class = _device_class(name)
+    usb = _usb_device_dir(f'/sys/class/{device_class}/{name}/device') if device_class else None
+    if usb is None:
+        return None
+    vid = _read_sysfs(os.path.join(usb, 'idVendor'))
+    pid = _read_sysfs(os.path.join(usb, 'idProduct'))
+    serial = _read_sysfs(os.path.join(usb, 'serial')) or ''
+    return f"{vid}:{pid}:{serial}"
+
+
+class HotplugWatcher:
+    """Volá callback(action, subsystem, devname) při uevent hidraw/tty
+
+    Používá netlink (NETLINK_KOBJECT_UEVENT) - událost přijde hned, jak
+    jádro zařízení přidá nebo odebere. Kde netlink není, porovnává seznam
+    zařízení v sysfs každých poll_interval sekund.
+    """
+
+    def __init__(self, callback, subsystems=('hidraw', 'tty'), poll_interval=1.0):
+        self.callback = callback
+        self.subsystems = subsystems
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='mpp-hotplug', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+            sock.bind((0, 1))  # skupina 1 = události jádra
+        except (AttributeError, OSError):
+            return self._poll()
+
+        with sock:
+            sock.settimeout(0.5)
+            while not self._stop.is_set():
+                try:
+                    message = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                except OSError:
+                    return self._poll()
+                event = parse_uevent(message)
+                if event and event.get('SUBSYSTEM') in self.subsystems:
+                    self.callback(event.get('ACTION'), event['SUBSYSTEM'], event.get('DEVNAME'))
+
+    def _poll(self):
+        previous = {d['path'] for d in enumerate_devices(None)}
+        while not self._stop.wait(self.poll_interval):
+            current = {d['path'] for d in enumerate_devices(None)}
+            for path in current - previous:
+                self.callback('add', None, os.path.basename(path))
+            for path in previous - current:
+                self.callback('remove', None, os.path.basename(path))
+            previous = current
+
+
+def parse_uevent(message):
+    """Zpráva jádra 'akce@cesta\\0KLÍČ=hodnota\\0...' -> dict (None pro jiné zprávy)"""
+    parts = message.split(b'\0')
+    if not parts or b'@' not in parts[0]:
+        return None
+    event = {}
+    for part in parts[1:]:
+        key, sep, value = part.partition(b'=')
+        if sep:
+            event[key.decode(errors='replace')] = value.decode(errors='replace')
+    return event
+
+
+class DeviceTracker:
+    """Drží aktuální cestu k měniči a po přepojení USB ji znovu najde
+
+    Zařízení se hledá podle USB identity (VID:PID:serial) zjištěné při startu,
+    pak podle stejné třídy (hidraw/tty) a známých VID:PID. Při změně cesty
+    se zavolá on_change(stará, nová) - z vlákna sledování USB, ne z vlákna,
+    které s portem komunikuje.
+    """
+
+    def __init__(self, path, on_change=None, ids=KNOWN_DEVICES):
+        self.path = path
+        self.identity = usb_identity(path)
+        self.device_class = _device_class(os.path.basename(os.path.realpath(path)))
+        self.ids = ids
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._watcher = HotplugWatcher(self._event)
+
+    def start(self):
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        self._watcher.stop()
+
+    def _event(self, action, subsystem, devname):
+        if action in ('add', 'remove'):
+            self.resolve()
+
+    def resolve(self):
+        """Znovu najde zařízení; vrací aktuální cestu"""
+        with self._lock:
+            devices = enumerate_devices(self.ids)
+            candidates = [d for d in devices if f"{d['vid']}:{d['pid']}:{d['serial']}" == self.identity]
+            if any(d['path'] == self.path for d in (candidates or devices)):
+                return self.path
+            if not candidates and self.identity is None:
+                # Bez USB identity (port zadaný ručně) bereme první zařízení stejné třídy
+                candidates = [d for d in devices if d['class'] == self.device_class]
+            if not candidates:
+                return self.path
+
+            old, new = self.path, candidates[0]['path']
+            if new == old:
+                return old
+            self.path = new
+            self.identity = f"{candidates[0]['vid']}:{candidates[0]['pid']}:{candidates[0]['serial']}"
+
+        logger.warning("🔌 Zařízení přepojeno: %s -> %s", old, new)
+        if self.on_change:
+            self.on_change(old, new)
+        return new
+
+
+if __name__ == "__main__":
+    show_all = '--all' in sys.argv
+    devices = enumerate_devices(None if show_all else KNOWN_DEVICES)
+    if not devices:
+        print("Žádný známý měnič ani USB-RS232 adaptér nenalezen (--all vypíše všechna USB zařízení)")
+    for device in devices:
+        serial = f" sn {device['serial']}" if device['serial'] else ''
+        print(f"{device['path']:<14} {device['vid']}:{device['pid']}{serial}  {device['description']}")
+
+    if '--watch' in sys.argv:
+        print("Sleduji připojení/odpojení (Ctrl+C ukončí)...")
+        HotplugWatcher(lambda action, subsystem, name: print(f"{action:<7} {subsystem or '-':<7} {name}")).start()
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
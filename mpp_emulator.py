@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Emulátor měniče PI30/PI18 na pseudoterminálu (os.openpty)
+Pro testy a měření transportů bez připojeného měniče
+
+Odpovědi jdou rychlostí skutečné linky (2400 Bd = 10 bitů na bajt, ~4,2 ms),
+před odpovědí uplyne doba příjmu dotazu a nastavitelná prodleva měniče.
+Volitelně vkládá chyby: šum, useknutou odpověď, chybné CRC, (NAK
+a '!' v napětí baterie (chyba firmwaru EASUN, CRC přitom sedí).
+
+Příklady:
+    python3 mpp_emulator.py --link /tmp/ttyMPP0           # pak mpp_follow.py -p /tmp/ttyMPP0
+    python3 mpp_emulator.py --link /tmp/ttyMPP0 --noise 0.05 --nak 0.02 --glitch 0.1
+    python3 mpp_emulator.py --bench 10
+"""
+
+import argparse
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+from mpp_transport import _crc_bytes
+
+# Chyby, které umí emulátor vložit (pravděpodobnost na odpověď)
+FAULTS = ('noise', 'truncate', 'bad_crc', 'nak', 'glitch')
+
+QPIRI = ('230.0 30.4 230.0 50.0 30.4 7000 7000 48.0 46.0 42.0 56.4 54.0 '
+         '2 030 060 0 2 3 9 01 0 0 54.0 0 1')
+
+
+def frame(text):
+    """Text odpovědi s CRC a CR"""
+    payload = text.encode('ascii')
+    return payload + _crc_bytes(payload) + b'\r'
+
+
+class InverterState:
+    """Hodnoty měniče, které se mezi dotazy mírně mění"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.battery_voltage = 52.5
+        self.pv_power = 1800
+        self.load = 400
+
+    def step(self):
+        self.battery_voltage = min(57.0, max(46.0, self.battery_voltage + self.rng.uniform(-0.05, 0.05)))
+        self.pv_power = min(7000, max(0, self.pv_power + self.rng.randint(-50, 50)))
+        self.load = min(7000, max(0, self.load + self.rng.randint(-20, 20)))
+
+    def qpigs(self, glitch=False):
+        self.step()
+        battery = f"{self.battery_voltage:05.2f}" + ('!' if glitch else '')
+        pv_voltage = 350.0 if self.pv_power else 0.0
+        pv_current = self.pv_power // 350
+        return (f"(230.0 50.0 230.0 50.0 {self.load + 60:04d} {self.load:04d} "
+                f"{self.load * 100 // 7000:03d} 380 {battery} 010 085 0040 {pv_current:04d} "
+                f"{pv_voltage:05.1f} {self.battery_voltage - 0.1:05.2f} 00000 00010110 00 00 "
+                f"{self.pv_power:05d} 010")
+
+
+class Emulator:
+    """Jeden emulovaný měnič; klient otevře self.port (nebo link)
+
+    faults: dict název -> pravděpodobnost (0..1), viz FAULTS.
+    """
+
+    def __init__(self, protocol='PI30', baud=2400, turnaround=0.05, faults=None,
+                 link=None, seed=None):
+        if protocol not in ('PI30', 'PI18'):
+            raise ValueError(f"Nepodporovaný protokol: {protocol}")
+        unknown = set(faults or {}) - set(FAULTS)
+        if unknown:
+            raise ValueError(f"Neznámé chyby: {', '.join(sorted(unknown))}")
+        self.protocol = protocol
+        self.baud = baud
+        self.byte_time = 10.0 / baud  # start + 8 datových + stop bit
+        self.turnaround = turnaround
+        self.faults = dict(faults or {})
+        self.rng = random.Random(seed)
+        self.state = InverterState(self.rng)
+        self.link = link
+        self.stats = {'requests': 0, 'responses': 0, **{name: 0 for name in FAULTS}}
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        if link:
+            if os.path.lexists(link):
+                os.unlink(link)
+            os.symlink(self.port, link)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'mpp-emulator-{self.port}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        buffer = b''
+        while not self._stop.is_set():
+            if not select.select([self._master], [], [], 0.2)[0]:
+                continue
+            try:
+                chunk = os.read(self._master, 256)
+            except OSError:
+                return
+            # HID klient posílá 8bajtové reporty doplněné nulami
+            buffer += chunk.replace(b'\0', b'')
+            while b'\r' in buffer:
+                request, buffer = buffer.split(b'\r', 1)
+                self._handle(request + b'\r')
+
+    def _roll(self, fault):
+        return self.rng.random() < self.faults.get(fault, 0)
+
+    def respond(self, request):
+        """Text odpovědi na dotaz bez CRC (None = poškozený dotaz)"""
+        payload, crc = request[:-3], request[-3:-1]
+        if len(request) < 4 or crc != _crc_bytes(payload):
+            return None  # měnič na poškozený dotaz neodpoví
+        command = payload.decode('ascii', errors='replace')
+
+        if self.protocol == 'PI18':
+            if command == '^P005PI':
+                return '^D00518'
+            if command == '^P005GS':
+                return ('^D1060000,000,2300,500,0400,0460,009,525,000,000,010,085,040,000,'
+                        '1800,0000,3500,0000,000,000,0,1,1,1,1,2,0')
+            return '^0'
+
+        glitch = command == 'QPIGS' and self._roll('glitch')
+        if glitch:
+            self.stats['glitch'] += 1
+        responses = {
+            'QPI': lambda: '(PI30',
+            'QPIGS': lambda: self.state.qpigs(glitch),
+            'QPIWS': lambda: '(' + '0' * 32,
+            'QMOD': lambda: '(B',
+            'QPIRI': lambda: '(' + QPIRI,
+        }
+        return responses.get(command, lambda: '(NAK')()
+
+    def _handle(self, request):
+        self.stats['requests'] += 1
+        # Dotaz na lince trvá len * byte_time, pak měnič chvíli zpracovává
+        due = time.monotonic() + len(request) * self.byte_time + self.turnaround
+        text = self.respond(request)
+        if text is None:
+            return
+
+        if self._roll('nak'):
+            self.stats['nak'] += 1
+            text = '(NAK' if self.protocol == 'PI30' else '^0'
+        response = bytearray(frame(text))
+        if self._roll('bad_crc'):
+            self.stats['bad_crc'] += 1
+            response[-2] ^= 0x01
+        if self._roll('noise'):
+            self.stats['noise'] += 1
+            response[self.rng.randrange(1, len(response) - 1)] = self.rng.randrange(0x80, 0x100)
+        if self._roll('truncate'):
+            self.stats['truncate'] += 1
+            response = response[:self.rng.randrange(1, len(response) - 1)]
+
+        self._send(bytes(response), due)
+        self.stats['responses'] += 1
+
+    def _send(self, data, start):
+        """Vysílá po bajtech v rozvrhu linky (bez kumulace chyb sleep)"""
+        for i in range(len(data)):
+            delay = start + i * self.byte_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                os.write(self._master, data[i:i + 1])
+            except OSError:
+                return
+
+
+def benchmark(count=10, **options):
+    """Odezva PI30Port proti emulátoru (QPIGS)
+
+    S link obsahujícím 'hidraw' se komunikuje jako s USB HID (8bajtové reporty).
+    """
+    from mpp_transport import PI30Port, TransportError
+
+    with Emulator(**options) as emulator:
+        device = PI30Port(emulator.link or emulator.port, timeout=2.0)
+        latencies, errors = [], 0
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                device.query('QPIGS')
+                latencies.append(time.perf_counter() - started)
+            except (OSError, TransportError):
+                errors += 1
+        device.close()
+    if latencies:
+        latencies.sort()
+        print(f"QPIGS: {len(latencies)} OK, {errors} chyb, medián {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"max {latencies[-1] * 1000:.0f} ms")
+    else:
+        print(f"QPIGS: žádná platná odpověď ({errors} chyb)")
+    print(f"Emulátor: {emulator.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Emulátor měniče PI30/PI18 na pseudoterminálu')
+    parser.add_argument('--protocol', default='PI30', choices=('PI30', 'PI18'))
+    parser.add_argument('--baud', type=int, default=2400, help='Rychlost linky pro časování bajtů')
+    parser.add_argument('--turnaround', type=float, default=0.05, help='Prodleva měniče před odpovědí (s)')
+    parser.add_argument('--link', help='Symlink na pseudoterminál (např. /tmp/ttyMPP0)')
+    parser.add_argument('--seed', type=int, help='Seed náhodných chyb (opakovatelný test)')
+    for fault in FAULTS:
+        parser.add_argument(f"--{fault.replace('_', '-')}", type=float, default=0.0, metavar='P',
+                            help=f'Pravděpodobnost chyby {fault} (0..1)')
+    parser.add_argument('--bench', type=int, metavar='N', help='Změřit N dotazů QPIGS přes PI30Port')
+    args = parser.parse_args()
+
+    options = dict(protocol=args.protocol, baud=args.baud, turnaround=args.turnaround, seed=args.seed,
+                   link=args.link,
+                   faults={fault: getattr(args, fault) for fault in FAULTS if getattr(args, fault)})
+    if args.bench:
+        benchmark(args.bench, **options)
+        return
+
+    with Emulator(**options) as emulator:
+        print(f"Emulátor {args.protocol} na {args.link or emulator.port} (Ctrl+C ukončí)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        print(f"\n{emulator.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Průběžná integrace výkonu na energii (Wh)
+Lichoběžníkové pravidlo, stav se ukládá a přežije restart
+"""
+
+import json
+import os
+import time
+
+from mpp_archive import normalize_sample
+
+# Čítače: (název, zdroj výkonu, znaménko) - kladný battery_power = vybíjení
+COUNTERS = [
+    ('pv_yield', 'pv', 1),
+    ('battery_charge', 'battery', -1),
+    ('battery_discharge', 'battery', 1),
+    ('ac_output', 'ac', 1),
+]
+
+# Konfigurace senzorů pro Home Assistant (total_increasing)
+ENERGY_SENSORS = [
+    ('energy_pv_yield', 'PV Energy', 'mdi:solar-power'),
+    ('energy_battery_charge', 'Battery Charge Energy', 'mdi:battery-plus'),
+    ('energy_battery_discharge', 'Battery Discharge Energy', 'mdi:battery-minus'),
+    ('energy_ac_output', 'AC Output Energy', 'mdi:power-plug'),
+]
+
+
+def powers_from_sample(sample):
+    """Výkony PV, baterie a AC výstupu z dat mpp-solar nebo EASUN (W)"""
+    sample = normalize_sample(sample)
+
+    pv = sample.get('pv_input_power')
+    if pv is None:
+        pv = sample.get('pv_input_voltage', 0) * sample.get('pv_input_current_for_battery', 0)
+
+    battery = sample.get('battery_power')
+    if battery is None:
+        battery = sample.get('battery_voltage', 0) * (
+            sample.get('battery_discharge_current', 0) - sample.get('battery_charging_current', 0))
+
+    return {
+        'pv': float(pv or 0),
+        'battery': float(battery or 0),
+        'ac': float(sample.get('ac_output_active_power', 0) or 0),
+    }
+
+
+def split_trapezoid(p0, p1, dt):
+    """Plocha lichoběžníku rozdělená na kladnou a zápornou část (W·s)"""
+    if p0 >= 0 and p1 >= 0:
+        return (p0 + p1) / 2 * dt, 0.0
+    if p0 <= 0 and p1 <= 0:
+        return 0.0, -(p0 + p1) / 2 * dt
+
+    # Průchod nulou - rozdělíme v místě změny znaménka
+    t_zero = dt * p0 / (p0 - p1)
+    first = p0 / 2 * t_zero
+    second = p1 / 2 * (dt - t_zero)
+    positive = first if first > 0 else second
+    negative = -(second if first > 0 else first)
+    return positive, negative
+
+
+class EnergyIntegrator:
+    """Monotónně rostoucí čítače energie (Wh)
+
+    Mezi dvěma vzorky se integruje lichoběžníkovým pravidlem. Pokud je mezera
+    delší než max_gap (výpadek komunikace, restart), úsek se neintegruje -
+    energii neodhadujeme z dat, která nemáme.
+    """
+
+    def __init__(self, state_path, max_gap=300, save_every=12):
+        self.state_path = state_path
+        self.max_gap = max_gap
+        self.save_every = save_every
+        self.counters = {name: 0.0 for name, _, _ in COUNTERS}
+        self.last_time = None
+        self.last_powers = None
+        self.gaps = 0
+        self._unsaved = 0
+        self._load()
+
+    def update(self, sample, timestamp=None):
+        """Přidá vzorek a vrátí aktuální čítače (Wh)"""
+        if timestamp is None:
+            timestamp = time.time()
+        powers = powers_from_sample(sample)
+
+        if self.last_time is not None:
+            dt = timestamp - self.last_time
+            if 0 < dt <= self.max_gap:
+                for name, source, sign in COUNTERS:
+                    positive, negative = split_trapezoid(self.last_powers[source], powers[source], dt)
+                    energy = positive if sign > 0 else negative
+                    self.counters[name] += energy / 3600
+            elif dt > self.max_gap:
+                self.gaps += 1
+
+        if self.last_time is None or timestamp > self.last_time:
+            self.last_time = timestamp
+            self.last_powers = powers
+
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+        return dict(self.counters)
+
+    def sensor_values(self):
+        """Hodnoty pro senzory energy_* v kWh"""
+        return {f"energy_{name}": round(value / 1000, 4) for name, value in self.counters.items()}
+
+    def save(self):
+        state = {
+            'counters': self.counters,
+            'last_time': self.last_time,
+            'last_powers': self.last_powers,
+        }
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+        self._unsaved = 0
+
+    def _load(self):
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        for name, value in state.get('counters', {}).items():
+            if name in self.counters:
+                self.counters[name] = float(value)
+        self.last_time = state.get('last_time')
+        self.last_powers = state.get('last_powers')
+        if self.last_powers is None:
+            self.last_time = None
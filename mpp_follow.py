@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Průběžný výstup MPP Solar jako NDJSON (jeden JSON na řádek)
+Port zůstává otevřený, vzorky v pevném rozvrhu bez driftu
+
+Příklady:
+    python3 mpp_follow.py --follow 5 | jq .battery_voltage
+    python3 mpp_follow.py -p /dev/ttyUSB0 -c QPIGS,QPIWS --follow 10 >> log.ndjson
+    python3 mpp_follow.py --follow 5 --capture provoz.cap   # + surové rámce pro mpp_capture.py
+    python3 mpp_follow.py --follow 2 --count 30 --profile > /dev/null   # doby fází na stderr
+"""
+
+import argparse
+import json
+import signal
+import sys
+import time
+
+from mpp_detect import detect_protocol
+from mpp_discovery import DeviceTracker
+from mpp_profile import span
+from mpp_transport import PI30Port, TransportError
+
+
+def follow(device, commands, interval, count=None, out=sys.stdout, profiler=None):
+    """Zapisuje výsledky příkazů na out v rozvrhu start + k * interval
+
+    Když čtení přeteče přes další termín, zmeškané termíny se přeskočí
+    (žádné dohánění dávkou vzorků). S profiler se měří i zápis výstupu.
+    """
+    deadline = time.monotonic()
+    emitted = 0
+    while count is None or emitted < count:
+        for command in commands:
+            record = {'command': command, 'ts': round(time.time(), 3)}
+            try:
+                record.update(device.query(command))
+            except (OSError, TransportError) as e:
+                # Včetně poškozeného rámce s platným CRC (DecodeError) - smyčka běží dál
+                record['error'] = str(e)
+            with span(profiler, command, 'output'):
+                out.write(json.dumps(record, separators=(',', ':')) + '\n')
+                out.flush()
+        emitted += 1
+
+        deadline += interval
+        now = time.monotonic()
+        if now > deadline:
+            deadline += (now - deadline) // interval * interval + interval
+        time.sleep(max(0.0, deadline - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='NDJSON výstup MPP Solar / EASUN')
+    parser.add_argument('-p', '--port', default='/dev/hidraw2', help='Port (hidraw nebo ttyUSB)')
+    parser.add_argument('-c', '--commands', default='QPIGS', help='Příkazy oddělené čárkou')
+    parser.add_argument('--follow', type=float, metavar='INTERVAL',
+                        help='Číst opakovaně po INTERVAL sekundách (bez něj jeden vzorek)')
+    parser.add_argument('--count', type=int, help='Počet vzorků, pak skončit')
+    parser.add_argument('--baud', type=int, default=2400, help='Rychlost sériového portu')
+    parser.add_argument('--capture', metavar='FILE', help='Zaznamenat surové rámce (mpp_capture.py)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Měřit doby fází (odeslání, odezva, příjem, CRC, dekódování, výstup) a na konci je vypsat na stderr')
+    args = parser.parse_args()
+
+    commands = [c.strip().upper() for c in args.commands.split(',') if c.strip()]
+    if args.follow is not None and args.follow <= 0:
+        parser.error('--follow musí být kladný interval')
+
+    # Zavřená roura (head, jq -n...) ukončí proces tiše jako u ostatních unixových nástrojů
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+    capture = None
+    if args.capture:
+        from mpp_capture import CaptureWriter
+        capture = CaptureWriter(args.capture)
+
+    profiler = None
+    if args.profile:
+        from mpp_profile import StageProfiler
+        profiler = StageProfiler()
+
+    with PI30Port(args.port, baud=args.baud, capture=capture, profiler=profiler) as device:
+        protocol, _ = detect_protocol(device)
+        if protocol != 'PI30':
+            sys.exit(f"{args.port}: protokol {protocol or 'nerozpoznán'} - mpp_follow umí jen PI30")
+        if args.follow is not None:
+            # Po přepojení USB pokračujeme na nové cestě zařízení
+            DeviceTracker(args.port, on_change=lambda old, new: device.set_path(new)).start()
+        try:
+            follow(device, commands, args.follow or 1, 1 if args.follow is None else args.count,
+                   profiler=profiler)
+        except KeyboardInterrupt:
+            pass
+        if profiler:
+            print(profiler.format_table(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
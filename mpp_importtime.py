@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Hlídání doby startu krátce běžících skriptů (python -X importtime)
+
+Krátce běžící nástroje se spouštějí opakovaně (cron, command_line senzory,
+roury), takže každý zbytečný import se platí při každém spuštění.
+Pro každý vstupní modul změří dobu importu a ověří, že nenačítá moduly,
+které potřebuje jen dlouho běžící publisher (numpy, sqlite3, http.server...).
+
+Použití:
+    python3 mpp_importtime.py              # tabulka + kontrola, exit 1 při regresi
+    python3 mpp_importtime.py --runs 10 --budget-ms 60
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# Vstupní modul -> moduly, které při startu načíst nesmí
+HEAVY = ('numpy', 'sqlite3', 'paho', 'http.server', 'http.client', 'socketserver', 'email')
+ENTRY_POINTS = {
+    'mpp_follow': HEAVY + ('subprocess', 'serial'),
+    'mpp_transport': HEAVY + ('subprocess', 'serial'),
+    'mpp_probe': HEAVY + ('subprocess', 'serial'),
+    'mpp_shm': HEAVY + ('subprocess',),
+    'mpp_snapshot': HEAVY + ('subprocess',),
+    'quick_monitor': HEAVY + ('subprocess',),
+    'show_current_data': HEAVY + ('subprocess',),
+}
+
+
+def import_profile(module):
+    """(kumulativní doba importu modulu v µs, množina načtených modulů)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    cumulative = None
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumul, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        loaded.add(name)
+        if name == module:
+            cumulative = int(cumul)
+    return cumulative, loaded
+
+
+def wall_time(code, runs):
+    """Nejkratší doba běhu interpretu s daným kódem (s)"""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Doba startu a zakázané importy')
+    parser.add_argument('--runs', type=int, default=5, help='Počet opakování (bere se minimum)')
+    parser.add_argument('--budget-ms', type=float, help='Maximální doba importu modulu (ms)')
+    parser.add_argument('modules', nargs='*', help='Jen vybrané vstupní moduly')
+    args = parser.parse_args()
+
+    modules = args.modules or list(ENTRY_POINTS)
+    baseline = wall_time('pass', args.runs)
+    print(f"Prázdný interpret: {baseline * 1000:.1f} ms")
+    print(f"{'Modul':<20} {'import':>9} {'start':>9}  Zakázané importy")
+
+    failed = False
+    for module in modules:
+        profiles = [import_profile(module) for _ in range(args.runs)]
+        import_us = min(cumulative for cumulative, _ in profiles)
+        loaded = profiles[0][1]
+        forbidden = sorted(heavy for heavy in ENTRY_POINTS.get(module, HEAVY)
+                           if any(name == heavy or name.startswith(heavy + '.') for name in loaded))
+        start = wall_time(f'import {module}', args.runs)
+
+        over_budget = args.budget_ms is not None and import_us / 1000 > args.budget_ms
+        failed |= bool(forbidden) or over_budget
+        print(f"{module:<20} {import_us / 1000:>7.1f}ms {start * 1000:>7.1f}ms  "
+              f"{', '.join(forbidden) or '-'}{'  (nad limit)' if over_budget else ''}")
+
+    if failed:
+        print("\n❌ Regrese doby startu")
+        sys.exit(1)
+    print("\n✅ Bez zakázaných importů")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Stav linky k měniči: počty chyb, opakování a odezva po zařízeních a příkazech
+Zhoršující se USB kabel nebo přetížený port je vidět dřív, než začnou chybět vzorky
+
+Chyby se počítají podle druhu (TransportError.kind): timeout, short (neúplná
+odpověď), crc, nak, decode, io (chyba portu), open (přeskočeno rozpojeným
+jističem) a error (ostatní i neznámé druhy). Odezva se
+drží jako klouzavý histogram posledních 512 dotazů, chybovost z posledních
+100 výsledků. Export jako JSON (MQTT) nebo textový soubor pro Prometheus
+(node_exporter --collector.textfile.directory).
+"""
+
+import os
+import sys
+import threading
+from collections import deque
+
+from mpp_profile import RollingHistogram
+
+KINDS = ('timeout', 'short', 'crc', 'nak', 'decode', 'io', 'open', 'error')
+RECENT = 100
+OVERRUN = 0.05  # Tolerance plánovače (s), teprve nad ní je dotaz přes rozpočet
+
+
+def error_kind(error):
+    """Druh chyby pro počítadla"""
+    kind = getattr(error, 'kind', None)
+    if kind:
+        return kind if kind in KINDS else 'error'
+    # subprocess načítá jen runner mpp-solar - bez něj TimeoutExpired nastat nemůže
+    subprocess = sys.modules.get('subprocess')
+    if isinstance(error, TimeoutError) or (subprocess and isinstance(error, subprocess.TimeoutExpired)):
+        return 'timeout'
+    if isinstance(error, OSError):
+        return 'io'
+    return 'error'
+
+
+class CommandHealth:
+    """Počítadla a odezva jednoho příkazu na jednom zařízení"""
+
+    def __init__(self):
+        self.counts = {'requests': 0, 'ok': 0, 'retries': 0, 'over_budget': 0, **{kind: 0 for kind in KINDS}}
+        self.latency = RollingHistogram()
+        self.spent = RollingHistogram()
+        self.budget = None
+        self.recent = deque(maxlen=RECENT)
+
+    def summary(self):
+        latency = self.latency.summary()
+        result = {
+            **self.counts,
+            'error_rate': round(self.recent.count(False) / len(self.recent), 3) if self.recent else 0.0,
+            'latency_ms': {key[:-3]: value for key, value in latency.items() if key.endswith('_ms')},
+        }
+        if self.budget is not None:
+            spent = self.spent.summary()
+            result['budget_ms'] = round(self.budget * 1000, 1)
+            result['spent_ms'] = {key[:-3]: value for key, value in spent.items() if key.endswith('_ms')}
+        return result
+
+
+class LinkHealth:
+    """Stav linky pro všechna zařízení (bezpečné pro vlákna)"""
+
+    def __init__(self):
+        self._commands = {}
+        self._reconnects = {}
+        self._lock = threading.Lock()
+
+    def _get(self, device, command):
+        key = (device, command)
+        health = self._commands.get(key)
+        if health is None:
+            health = self._commands[key] = CommandHealth()
+        return health
+
+    def record(self, device, command, latency, error=None, budget=None):
+        """Výsledek jednoho dotazu; latency v sekundách (i u chyby), budget = rozpočet příkazu (s)"""
+        with self._lock:
+            health = self._get(device, command)
+            health.counts['requests'] += 1
+            health.recent.append(error is None)
+            if budget is not None:
+                health.budget = budget
+                health.spent.add(int(latency * 1e9))
+                if latency > budget + OVERRUN:
+                    health.counts['over_budget'] += 1
+            if error is None:
+                health.counts['ok'] += 1
+                health.latency.add(int(latency * 1e9))
+            else:
+                health.counts[error_kind(error)] += 1
+
+    def record_retry(self, device, command):
+        with self._lock:
+            self._get(device, command).counts['retries'] += 1
+
+    def record_reconnect(self, device):
+        with self._lock:
+            self._reconnects[device] = self._reconnects.get(device, 0) + 1
+
+    def summary(self):
+        """{zařízení: {'reconnects': n, 'commands': {příkaz: počítadla, error_rate, latency_ms}}}"""
+        with self._lock:
+            result = {}
+            for (device, command), health in self._commands.items():
+                entry = result.setdefault(device, {'reconnects': self._reconnects.get(device, 0), 'commands': {}})
+                entry['commands'][command] = health.summary()
+            for device, reconnects in self._reconnects.items():
+                result.setdefault(device, {'reconnects': reconnects, 'commands': {}})
+            return result
+
+    def prometheus(self, prefix='mpp_link'):
+        """Metriky v textovém formátu Prometheus"""
+        summary = self.summary()
+        lines = [
+            f'# HELP {prefix}_requests_total Dotazy na měnič',
+            f'# TYPE {prefix}_requests_total counter',
+            f'# HELP {prefix}_errors_total Neúspěšné dotazy podle druhu chyby',
+            f'# TYPE {prefix}_errors_total counter',
+            f'# HELP {prefix}_retries_total Opakované pokusy',
+            f'# TYPE {prefix}_retries_total counter',
+            f'# HELP {prefix}_error_ratio Chybovost posledních {RECENT} dotazů',
+            f'# TYPE {prefix}_error_ratio gauge',
+            f'# HELP {prefix}_latency_seconds Odezva úspěšných dotazů',
+            f'# TYPE {prefix}_latency_seconds summary',
+            f'# HELP {prefix}_reconnects_total Nová otevření portu po chybě',
+            f'# TYPE {prefix}_reconnects_total counter',
+            f'# HELP {prefix}_budget_seconds Časový rozpočet příkazu včetně opakování',
+            f'# TYPE {prefix}_budget_seconds gauge',
+            f'# HELP {prefix}_spent_seconds Čas spotřebovaný z rozpočtu (úspěch i chyba)',
+            f'# TYPE {prefix}_spent_seconds summary',
+            f'# HELP {prefix}_over_budget_total Dotazy, které překročily rozpočet',
+            f'# TYPE {prefix}_over_budget_total counter',
+        ]
+        for device, entry in summary.items():
+            lines.append(f'{prefix}_reconnects_total{{device="{device}"}} {entry["reconnects"]}')
+            for command, health in entry['commands'].items():
+                labels = f'device="{device}",command="{command}"'
+                lines.append(f'{prefix}_requests_total{{{labels}}} {health["requests"]}')
+                lines.append(f'{prefix}_retries_total{{{labels}}} {health["retries"]}')
+                lines.append(f'{prefix}_over_budget_total{{{labels}}} {health["over_budget"]}')
+                lines.append(f'{prefix}_error_ratio{{{labels}}} {health["error_rate"]}')
+                for kind in KINDS:
+                    lines.append(f'{prefix}_errors_total{{{labels},kind="{kind}"}} {health[kind]}')
+                for key, quantile in (('p50', '0.5'), ('p90', '0.9'), ('p99', '0.99')):
+                    if key in health['latency_ms']:
+                        lines.append(f'{prefix}_latency_seconds{{{labels},quantile="{quantile}"}} '
+                                     f'{health["latency_ms"][key] / 1000:.6f}')
+                    if key in health.get('spent_ms', {}):
+                        lines.append(f'{prefix}_spent_seconds{{{labels},quantile="{quantile}"}} '
+                                     f'{health["spent_ms"][key] / 1000:.6f}')
+                if 'budget_ms' in health:
+                    lines.append(f'{prefix}_budget_seconds{{{labels}}} {health["budget_ms"] / 1000:.3f}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='mpp_link'):
+        """Zapíše metriky atomicky (node_exporter nikdy nečte napůl zapsaný soubor)"""
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(self.prometheus(prefix))
+        os.replace(path + '.tmp', path)
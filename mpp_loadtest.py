@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Zátěžový test: N emulovaných měničů x M výstupů v jednom procesu
+Kolik zařízení a výstupů zvládne jeden poller na daném stroji
+
+Pro každou kombinaci N a M spustí emulátory (mpp_emulator.py, v samostatném
+procesu, aby jejich CPU nezkreslovalo měření), pro každé zařízení jedno
+vlákno s PI30Port v pevném rozvrhu a každý vzorek pošle do M výstupů.
+Měří dosažené vzorky/s, rozptyl periody na zařízení, CPU, RSS a zpoždění
+výstupů. Výsledek (--json) je křivka škálování pro porovnání mezi verzemi.
+
+Výstupy v pořadí přidávání: mqtt (lokální náhradní broker, MQTT 3.1.1 QoS 0),
+sqlite (SQLiteHistorian), prom (textový soubor pro node_exporter),
+udp (JSON datagramy), shm (SharedSample).
+
+Příklady:
+    python3 mpp_loadtest.py --devices 1,4,16 --outputs 1,5 --duration 20
+    python3 mpp_loadtest.py --devices 1,2,4,8,16,32 --json loadtest.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+from mpp_emulator import Emulator
+from mpp_memory import process_memory
+from mpp_transport import PI30Port, TransportError
+
+OUTPUTS = ('mqtt', 'sqlite', 'prom', 'udp', 'shm')
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# --- Emulátory v samostatném procesu -------------------------------------
+
+def _emulator_process(links, options, ready, stop):
+    emulators = [Emulator(link=link, seed=i, **options).start() for i, link in enumerate(links)]
+    ready.set()
+    stop.wait()
+    for emulator in emulators:
+        emulator.stop()
+
+
+# --- Náhradní MQTT broker a klient (jen CONNECT/CONNACK a PUBLISH QoS 0) ---
+
+def _mqtt_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def _mqtt_packet(packet_type, body):
+    return bytes([packet_type]) + _mqtt_length(len(body)) + body
+
+
+def _mqtt_string(text):
+    data = text.encode()
+    return struct.pack('>H', len(data)) + data
+
+
+class StandInBroker:
+    """Přijme spojení, potvrdí CONNECT a u každého PUBLISH změří zpoždění"""
+
+    def __init__(self, lags):
+        self.lags = lags
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, name='mpp-loadtest-broker', daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _read(stream, size):
+        data = stream.read(size)
+        if len(data) < size:
+            raise EOFError
+        return data
+
+    def _serve(self, conn):
+        stream = conn.makefile('rb')
+        try:
+            while True:
+                header = self._read(stream, 1)[0]
+                length, shift = 0, 0
+                while True:
+                    byte = self._read(stream, 1)[0]
+                    length |= (byte & 0x7F) << shift
+                    shift += 7
+                    if not byte & 0x80:
+                        break
+                body = self._read(stream, length)
+                if header >> 4 == 1:  # CONNECT
+                    conn.sendall(b'\x20\x02\x00\x00')
+                elif header >> 4 == 3:  # PUBLISH QoS 0
+                    topic_length = struct.unpack('>H', body[:2])[0]
+                    payload = json.loads(body[2 + topic_length:])
+                    self.lags.append(time.monotonic() - payload['_sampled'])
+        except (EOFError, OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+class MQTTOutput:
+    def __init__(self, directory, lags):
+        self.broker = StandInBroker(lags)
+        self.sock = socket.create_connection(('127.0.0.1', self.broker.port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        variable = _mqtt_string('MQTT') + bytes([4, 0x02]) + struct.pack('>H', 60)
+        self.sock.sendall(_mqtt_packet(0x10, variable + _mqtt_string('mpp-loadtest')))
+        self.sock.recv(4)
+        self._lock = threading.Lock()
+
+    def emit(self, device, data, sampled):
+        payload = json.dumps({**data, '_sampled': sampled}).encode()
+        packet = _mqtt_packet(0x30, _mqtt_string(f'mpp_solar/{device}/state') + payload)
+        with self._lock:
+            self.sock.sendall(packet)
+
+    def close(self):
+        self.sock.close()
+        self.broker.close()
+
+
+# --- Ostatní výstupy -------------------------------------------------------
+
+class SQLiteOutput:
+    def __init__(self, directory, lags):
+        from mpp_sqlite import SQLiteHistorian
+        self.historian = SQLiteHistorian(os.path.join(directory, 'history.db'))
+        self.lags = lags
+        self._lock = threading.Lock()
+
+    def emit(self, device, data, sampled):
+        with self._lock:
+            self.historian.add('QPIGS', data)
+        self.lags.append(time.monotonic() - sampled)
+
+    def close(self):
+        self.historian.close()
+
+
+class PromOutput:
+    """Textový soubor pro node_exporter - celý se přepíše a atomicky nahradí"""
+
+    FIELDS = ('battery_voltage', 'battery_capacity', 'pv_input_power', 'ac_output_active_power')
+
+    def __init__(self, directory, lags):
+        self.path = os.path.join(directory, 'mpp_solar.prom')
+        self.lags = lags
+        self.latest = {}
+        self._lock = threading.Lock()
+
+    def emit(self, device, data, sampled):
+        with self._lock:
+            self.latest[device] = data
+            lines = []
+            for field in self.FIELDS:
+                lines.append(f'# TYPE mpp_solar_{field} gauge')
+                lines += [f'mpp_solar_{field}{{device="{name}"}} {values.get(field, 0)}'
+                          for name, values in self.latest.items()]
+            with open(self.path + '.tmp', 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+        self.lags.append(time.monotonic() - sampled)
+
+    def close(self):
+        pass
+
+
+class UDPOutput:
+    def __init__(self, directory, lags):
+        self.lags = lags
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.address = self.receiver.getsockname()
+        threading.Thread(target=self._receive, name='mpp-loadtest-udp', daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                payload = json.loads(self.receiver.recv(65536))
+            except (OSError, ValueError):
+                return
+            self.lags.append(time.monotonic() - payload['_sampled'])
+
+    def emit(self, device, data, sampled):
+        self.sock.sendto(json.dumps({'device': device, **data, '_sampled': sampled}).encode(), self.address)
+
+    def close(self):
+        self.sock.close()
+        self.receiver.close()
+
+
+class SHMOutput:
+    def __init__(self, directory, lags):
+        from mpp_shm import SharedSample
+        self.factory = SharedSample
+        self.directory = directory
+        self.lags = lags
+        self.shared = {}
+
+    def emit(self, device, data, sampled):
+        if device not in self.shared:
+            self.shared[device] = self.factory(os.path.join(self.directory, f'{device}.shm'))
+        self.shared[device].write(data)
+        self.lags.append(time.monotonic() - sampled)
+
+    def close(self):
+        for shared in self.shared.values():
+            shared.close()
+
+
+OUTPUT_CLASSES = {'mqtt': MQTTOutput, 'sqlite': SQLiteOutput, 'prom': PromOutput,
+                  'udp': UDPOutput, 'shm': SHMOutput}
+
+
+# --- Běh jedné kombinace ---------------------------------------------------
+
+def _poll(device, name, interval, outputs, stop, record):
+    """Vlákno jednoho zařízení - stejný rozvrh bez driftu jako mpp_follow"""
+    deadline = time.monotonic()
+    while not stop.is_set():
+        started = time.monotonic()
+        record['starts'].append(started)
+        try:
+            data = device.query('QPIGS')
+            sampled = time.monotonic()
+            record['samples'] += 1
+            for output in outputs:
+                output.emit(name, data, sampled)
+        except (OSError, TransportError):
+            record['errors'] += 1
+
+        deadline += interval
+        now = time.monotonic()
+        if now > deadline:
+            deadline += (now - deadline) // interval * interval + interval
+        stop.wait(max(0.0, deadline - time.monotonic()))
+
+
+def run(devices, outputs, duration=20.0, interval=1.0, turnaround=0.02, baud=2400, hid=True):
+    """Jeden běh N zařízení x M výstupů; vrací dict s výsledky"""
+    directory = tempfile.mkdtemp(prefix='mpp_loadtest_')
+    prefix = 'hidraw' if hid else 'ttyEMU'
+    links = [os.path.join(directory, f'{prefix}{i}') for i in range(devices)]
+
+    context = multiprocessing.get_context('fork')
+    ready, stop_emulators = context.Event(), context.Event()
+    emulators = context.Process(target=_emulator_process, daemon=True,
+                                args=(links, {'turnaround': turnaround, 'baud': baud}, ready, stop_emulators))
+    emulators.start()
+    ready.wait(10)
+
+    lags = {name: [] for name in OUTPUTS[:outputs]}
+    sinks = [OUTPUT_CLASSES[name](directory, lags[name]) for name in OUTPUTS[:outputs]]
+    stop = threading.Event()
+    records = [{'starts': [], 'samples': 0, 'errors': 0} for _ in links]
+    ports = [PI30Port(link, baud=baud, timeout=max(2.0, interval)) for link in links]
+
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.monotonic()
+    threads = [threading.Thread(target=_poll, args=(port, f'dev{i}', interval, sinks, stop, record),
+                                name=f'mpp-loadtest-dev{i}', daemon=True)
+               for i, (port, record) in enumerate(zip(ports, records))]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=5)
+    elapsed = time.monotonic() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    memory = process_memory() or {}
+
+    time.sleep(0.1)  # dobrat MQTT/UDP, které jsou ještě na cestě
+    for sink in sinks:
+        sink.close()
+    for port in ports:
+        port.close()
+    stop_emulators.set()
+    emulators.join(timeout=5)
+    shutil.rmtree(directory, ignore_errors=True)
+
+    jitter = []
+    rate = 0.0
+    for record in records:
+        starts = record['starts']
+        jitter += [abs(b - a - interval) for a, b in zip(starts, starts[1:])]
+        if len(starts) > 1:
+            # Dosažená frekvence zařízení z první a poslední periody (bez chyby o jeden vzorek)
+            rate += record['samples'] * (len(starts) - 1) / len(starts) / (starts[-1] - starts[0])
+    cpu = (cpu_after.ru_utime - cpu_before.ru_utime) + (cpu_after.ru_stime - cpu_before.ru_stime)
+    return {
+        'devices': devices,
+        'outputs': list(lags),
+        'samples_per_s': rate,
+        'expected_per_s': devices / interval,
+        'errors': sum(r['errors'] for r in records),
+        'jitter_p50_ms': (percentile(jitter, 0.5) or 0) * 1000,
+        'jitter_max_ms': max(jitter, default=0) * 1000,
+        'cpu_percent': cpu / elapsed * 100,
+        'rss_mb': memory.get('rss_kb', 0) / 1024,
+        'lag_p99_ms': {name: (percentile(values, 0.99) or 0) * 1000 for name, values in lags.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zátěžový test pollerů s emulovanými měniči')
+    parser.add_argument('--devices', default='1,4,16', help='Počty zařízení oddělené čárkou')
+    parser.add_argument('--outputs', default=f'1,{len(OUTPUTS)}',
+                        help=f'Počty výstupů (z {", ".join(OUTPUTS)}) oddělené čárkou')
+    parser.add_argument('--duration', type=float, default=20.0, help='Délka jednoho běhu (s)')
+    parser.add_argument('--interval', type=float, default=1.0, help='Perioda vzorkování zařízení (s)')
+    parser.add_argument('--turnaround', type=float, default=0.02, help='Prodleva emulátoru (s)')
+    parser.add_argument('--baud', type=int, default=2400, help='Rychlost emulované linky')
+    parser.add_argument('--serial', action='store_true', help='Sériové porty (pyserial) místo HID')
+    parser.add_argument('--json', metavar='FILE', help='Uložit výsledky (křivku škálování) do JSON')
+    args = parser.parse_args()
+
+    device_counts = [int(n) for n in args.devices.split(',') if n.strip()]
+    output_counts = [min(int(m), len(OUTPUTS)) for m in args.outputs.split(',') if m.strip()]
+
+    print(f"{'N':>4} {'M':>2} {'vzorky/s':>12} {'chyby':>6} {'jitter p50/max':>16} "
+          f"{'CPU':>6} {'RSS':>8}  Zpoždění výstupů p99")
+    results = []
+    for devices in device_counts:
+        for outputs in output_counts:
+            result = run(devices, outputs, args.duration, args.interval, args.turnaround,
+                         args.baud, hid=not args.serial)
+            results.append(result)
+            lag = ' '.join(f"{name}={ms:.1f}ms" for name, ms in result['lag_p99_ms'].items()) or '-'
+            print(f"{devices:>4} {outputs:>2} {result['samples_per_s']:>6.1f}/{result['expected_per_s']:<5.1f} "
+                  f"{result['errors']:>6} {result['jitter_p50_ms']:>7.1f}/{result['jitter_max_ms']:<7.1f}ms "
+                  f"{result['cpu_percent']:>5.1f}% {result['rss_mb']:>6.1f}MB  {lag}", flush=True)
+
+    if args.json:
+        report = {
+            'timestamp': time.time(),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'settings': {k: getattr(args, k) for k in ('duration', 'interval', 'turnaround', 'baud', 'serial')},
+            'results': results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nVýsledky uloženy do {args.json}")
+
+
+if __name__ == "__main__":
+    main()
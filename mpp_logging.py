@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Úsporné logování pro Raspberry Pi se SD kartou
+Méně zápisů na kartu a žádná práce pro zprávy, které se nikam nezapíší
+
+- Omezení četnosti: stejná zpráva (šablona, nebo extra={'key': ...}) projde
+  nejvýš `burst`krát za `period` s, počet potlačených se připíše k další.
+- Záznam letu: posledních `ring` zpráv od úrovně `ring_level` se drží
+  v paměti a vypíše se na SIGUSR1, při výstupu do souboru i při chybě (nejvýš
+  jednou za minutu), takže do souboru stačí WARNING a kontext chyby se
+  přesto neztratí. Na konzoli se při chybě nevypisuje (zahltil by ji).
+- Dávkový zápis: soubor se zapisuje po `flush_records` zprávách, po
+  `flush_interval` s (při další zprávě) nebo hned při chybě a při ukončení.
+
+Úroveň loggeru je nejnižší z úrovní výstupu a záznamu letu, takže volání
+pod ní (typicky debug) skončí v logger.isEnabledFor() bez vytvoření záznamu.
+Argumenty se předávají %-stylem (logger.info("PV %s W", pv)), f-string by
+se formátoval i pro zprávu, která se nikam nezapíše.
+
+Příklad:
+    setup('/var/log/mpp-solar.log', level='WARNING')
+    kill -USR1 <pid>    # vypíše záznam letu do logu
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+DUMP_INTERVAL = 60.0  # Automatický výpis záznamu letu při chybě nejvýš jednou za (s)
+MAX_KEYS = 1000       # Sledovaných klíčů omezení četnosti, pak se zapomenou staré
+
+
+def _level(level):
+    return level if isinstance(level, int) else logging.getLevelName(level.upper())
+
+
+class Formatter(logging.Formatter):
+    """Formátovač, který ke zprávě připíše počet potlačených opakování"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" (+{suppressed}× potlačeno)"
+        return text
+
+
+class RateLimitFilter(logging.Filter):
+    """Stejná zpráva nejvýš `burst`krát za `period` sekund"""
+
+    def __init__(self, burst=5, period=60.0):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'key', None) or (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or now - state[0] >= self.period:
+                if state is None and len(self._keys) >= MAX_KEYS:
+                    self._forget(now)
+                if state and state[2]:
+                    record.suppressed = state[2]
+                self._keys[key] = [now, 1, 0]  # začátek okna, prošlo, potlačeno
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+    def _forget(self, now):
+        for key in [key for key, state in self._keys.items() if now - state[0] >= self.period]:
+            del self._keys[key]
+
+
+class BatchedFileHandler(logging.FileHandler):
+    """Soubor zapisovaný po dávkách místo po každé zprávě"""
+
+    def __init__(self, path, flush_records=100, flush_interval=30.0, flush_level=logging.ERROR):
+        super().__init__(path, encoding='utf-8', delay=True)
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self._lines = []
+        self._first = None
+        self.writes = 0
+
+    def emit(self, record):
+        try:
+            self._lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        now = time.monotonic()
+        if self._first is None:
+            self._first = now
+        if (len(self._lines) >= self.flush_records or now - self._first >= self.flush_interval
+                or record.levelno >= self.flush_level):
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._lines:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write('\n'.join(self._lines) + '\n')
+                self.stream.flush()
+                self.writes += 1
+                self._lines.clear()
+            self._first = None
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class RingBufferHandler(logging.Handler):
+    """Posledních `capacity` zpráv v paměti, výpis do `target` při chybě nebo na požádání"""
+
+    def __init__(self, capacity=500, target=None, dump_level=logging.ERROR):
+        """dump_level=None = výpis jen na požádání (dump)"""
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self.target = target
+        self.dump_level = dump_level
+        self._last_dump = None
+
+    def emit(self, record):
+        if self.dump_level is not None and record.levelno >= self.dump_level:
+            now = time.monotonic()
+            if self._last_dump is None or now - self._last_dump >= DUMP_INTERVAL:
+                self._last_dump = now
+                # Samotnou chybu už zapsal výstupní handler - vypíše se jen kontext před ní
+                self.dump(record.levelname, clear=True)
+                return
+        self.records.append(record)
+
+    def dump(self, reason, clear=False):
+        """Vypíše záznam letu (obchází úroveň i omezení četnosti výstupu)"""
+        if self.target is None:
+            return
+        self.acquire()
+        try:
+            records, count = list(self.records), len(self.records)
+            if clear:
+                self.records.clear()  # další chyba vypíše jen novější kontext
+        finally:
+            self.release()
+        marker = {'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING'}
+        self.target.acquire()
+        try:
+            self.target.emit(logging.makeLogRecord(
+                {**marker, 'msg': f"--- záznam letu: {count} zpráv ({reason}) ---"}))
+            for record in records:
+                self.target.emit(record)
+            self.target.emit(logging.makeLogRecord({**marker, 'msg': '--- konec záznamu letu ---'}))
+            self.target.flush()
+        finally:
+            self.target.release()
+
+
+def setup(path=None, level='INFO', ring=500, ring_level='INFO', burst=5, period=60.0,
+          flush_records=100, flush_interval=30.0, fmt=FORMAT, datefmt=None):
+    """Nastaví kořenový logger; path=None = výstup na stdout bez dávkování
+
+    Vrací výstupní handler. SIGUSR1 vypíše záznam letu; při chybě se vypíše
+    sám jen s path. S path navíc SIGTERM ukončí program přes SystemExit, aby
+    se dopsala poslední dávka.
+    """
+    level, ring_level = _level(level), _level(ring_level)
+    if path:
+        # Formát nepoužívá vlákno ani proces - záznam je levnější
+        logging.logThreads = logging.logProcesses = logging.logMultiprocessing = False
+        output = BatchedFileHandler(path, flush_records, flush_interval)
+    else:
+        output = logging.StreamHandler(sys.stdout)
+    output.setLevel(level)
+    output.setFormatter(Formatter(fmt, datefmt))
+    if burst:
+        output.addFilter(RateLimitFilter(burst, period))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(output)
+    recorder = None
+    if ring:
+        recorder = RingBufferHandler(ring, output, logging.ERROR if path else None)
+        recorder.setLevel(ring_level)
+        root.addHandler(recorder)
+    root.setLevel(min(level, ring_level) if ring else level)
+
+    if threading.current_thread() is threading.main_thread():
+        if recorder:
+            signal.signal(signal.SIGUSR1, lambda signum, frame: recorder.dump('SIGUSR1'))
+        if path and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            def terminate(signum, frame):
+                raise SystemExit(0)  # finally bloky a logging.shutdown() dopíší dávku
+            signal.signal(signal.SIGTERM, terminate)
+    return output
+
+
+def main():
+    import tempfile
+
+    parser = argparse.ArgumentParser(description='Změří cenu logovacích volání a zápisy do souboru')
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/test.log"
+        output = setup(path, level='WARNING')
+        logger = logging.getLogger('mpp_solar')
+        for name, call in (('debug (vypnuto)', logger.debug), ('info (jen záznam letu)', logger.info),
+                           ('warning (omezeno)', logger.warning)):
+            started = time.perf_counter()
+            for i in range(args.count):
+                call("Dotaz %s: %d", 'QPIGS', i)
+            elapsed = time.perf_counter() - started
+            print(f"{name:<24} {elapsed / args.count * 1e9:>8.0f} ns/volání")
+        logging.shutdown()
+        with open(path, encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+        print(f"Soubor: {lines} řádků, {output.writes} zápisů")
+
+
+if __name__ == "__main__":
+    main()
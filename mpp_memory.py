@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Spotřeba paměti pollerů (RSS z /proc)
+Bez argumentů vypíše všechny běžící MPP/EASUN pollery a jejich RSS
+"""
+
+import os
+import sys
+
+# Procesy, které považujeme za pollery (podle příkazové řádky)
+POLLER_SCRIPTS = ('mpp_mqtt_publisher', 'mpp_solar_integration', 'mpp_follow',
+                  'easun_ha_mqtt', 'easun_live_monitor', 'mpp-solar')
+
+
+def process_memory(pid='self'):
+    """RSS a špička RSS procesu v kB, nebo None (mimo Linux / proces neexistuje)"""
+    try:
+        with open(f'/proc/{pid}/status', encoding='ascii', errors='replace') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    memory = {}
+    for line in lines:
+        key, _, value = line.partition(':')
+        if key in ('VmRSS', 'VmHWM'):
+            memory['rss_kb' if key == 'VmRSS' else 'peak_rss_kb'] = int(value.split()[0])
+    return memory or None
+
+
+def _cmdline(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().decode(errors='replace').rstrip('\0').split('\0')
+    except OSError:
+        return []
+
+
+def find_pollers():
+    """[(pid, příkazová řádka, paměť)] běžících pollerů"""
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit() or int(entry) == os.getpid():
+            continue
+        args = _cmdline(entry)
+        # Interpret a skript jsou na prvních místech (python3 -u skript.py ...)
+        if any(os.path.basename(arg).startswith(POLLER_SCRIPTS) for arg in args[:3]):
+            memory = process_memory(entry)
+            if memory:
+                found.append((int(entry), ' '.join(args), memory))
+    return sorted(found)
+
+
+def main():
+    pollers = find_pollers()
+    if not pollers:
+        print("Žádný poller neběží")
+        return
+
+    total = 0
+    print(f"{'PID':>7} {'RSS':>9} {'Špička':>9}  Příkaz")
+    for pid, cmdline, memory in pollers:
+        total += memory['rss_kb']
+        print(f"{pid:>7} {memory['rss_kb'] / 1024:>7.1f}MB {memory['peak_rss_kb'] / 1024:>7.1f}MB  {cmdline[:80]}")
+    print(f"{'Celkem':>7} {total / 1024:>7.1f}MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        for pid in sys.argv[1:]:
+            print(pid, process_memory(pid))
+    else:
+        main()
@@ -5,6 +5,7 @@ Publikuje data z MPP Solar PIP5048MG do MQTT pro HA autodiscovery
 """
 
 import json
+import logging
 import time
 import subprocess
 import os
@@ -21,17 +22,74 @@ except ImportError:
     subprocess.run([sys.executable, '-m', 'pip', 'install', '--user', 'paho-mqtt', '--break-system-packages'])
     import paho.mqtt.client as mqtt
 
+from mpp_command_queue import get_queue, mpp_solar_runner, PRIORITY_SETTER
+from mpp_scheduler import IntervalScheduler
+from mpp_adaptive import AdaptiveSampler
+from mpp_energy import EnergyIntegrator, ENERGY_SENSORS
+from mpp_rollup import WindowAggregator
+from mpp_snapshot import SnapshotCache, start_server, stop_server
+from mpp_shm import SharedSample
+from mpp_memory import process_memory
+from mpp_transport import (BUDGET_FACTOR, close_port, expected_time, get_port, set_capture, set_health,
+                           set_profiler, transport_runner)
+from mpp_profile import StageProfiler, span
+from mpp_linkhealth import LinkHealth
+from mpp_breaker import BreakerOpen, get_breaker, guarded, set_on_change
+from mpp_discovery import DeviceTracker, enumerate_devices
+from mpp_detect import detect_protocol
+from mpp_logging import setup as setup_logging
+
+COMMAND_TOPIC = 'mpp_solar/command/set'
+COMMAND_RESULT_TOPIC = 'mpp_solar/command/result'
+
+logger = logging.getLogger('mpp_solar')
+
 class MPPMQTTPublisher:
     def __init__(self, broker_host='localhost', broker_port=1883, 
-                 username=None, password=None, device_path='/dev/hidraw2'):
+                 username=None, password=None, device_path='/dev/hidraw2',
+                 energy_state='mpp_energy_state.json', window=60, history_db=None,
+                 snapshot_port=None, snapshot_socket=None, shm_path=None, low_memory=False,
+                 profile=False, prom_path=None):
         
         self.device_path = device_path
+        self.low_memory = low_memory
+        # Doby fází příkazů a výstupů; s přímým transportem i odeslání/odezva/příjem/CRC
+        self.profiler = StageProfiler() if profile else None
+        # Chyby a odezva linky; přímý transport je počítá sám i s druhem chyby
+        self.health = LinkHealth()
+        self.prom_path = prom_path
+        if low_memory:
+            # Pi Zero: bez SQLite a HTTP serveru, příkazy v tomto procesu
+            # místo spouštění celého mpp-solar (~30 MB) pro každý dotaz
+            history_db = snapshot_port = snapshot_socket = None
+            set_health(self.health)
+            if self.profiler:
+                set_profiler(self.profiler)
+        self.energy = EnergyIntegrator(energy_state)
+        self.aggregator = WindowAggregator(window, last_prefixes=('is_', 'energy_')) if window else None
+        self.historian = None
+        if history_db:
+            from mpp_sqlite import SQLiteHistorian  # sqlite3 jen když je historie zapnutá
+            self.historian = SQLiteHistorian(history_db)
+        self.shared = SharedSample(shm_path) if shm_path else None
+        # Nedostupný měnič: po několika chybách jen občasný QPI místo plných timeoutů
+        set_on_change(self._breaker_changed)
+        self.queue = get_queue(device_path, guarded(transport_runner if low_memory else mpp_solar_runner),
+                               self._command_budget if low_memory else None)
+        self.tracker = DeviceTracker(device_path, on_change=self._device_moved)
+        self.snapshots = SnapshotCache()
+        self.snapshot_servers = []
+        if snapshot_port or snapshot_socket:
+            self.snapshot_servers = start_server(self.snapshots, snapshot_port, unix_path=snapshot_socket)
+        self.scheduler = None
+        self.sampler = None
         self.client = mqtt.Client()
         self.connected = False
         
         # MQTT callback
         self.client.on_connect = self.on_connect
         self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
         
         # Autentifikace
         if username and password:
@@ -42,46 +100,85 @@ class MPPMQTTPublisher:
             self.client.connect(broker_host, broker_port, 60)
             self.client.loop_start()
         except Exception as e:
-            print(f"Chyba připojení k MQTT broker: {e}")
+            logger.error("Chyba připojení k MQTT broker: %s", e)
     
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self.connected = True
-            print(f"✓ Připojeno k MQTT broker")
+            logger.info("✓ Připojeno k MQTT broker")
+            self.client.subscribe(COMMAND_TOPIC)
             self.publish_autodiscovery()
         else:
-            print(f"✗ Chyba připojení k MQTT: {rc}")
+            logger.error("✗ Chyba připojení k MQTT: %s", rc)
     
     def on_disconnect(self, client, userdata, rc):
         self.connected = False
-        print("✗ Odpojeno od MQTT broker")
+        logger.warning("✗ Odpojeno od MQTT broker")
     
-    def get_mpp_data(self, command):
-        """Získá data z MPP Solar"""
-        try:
-            cmd = ['mpp-solar', '-p', self.device_path, '-c', command, '-o', 'json']
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-            
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                clean_data = {k: v for k, v in data.items() if not k.startswith('_')}
-                return clean_data
+    def on_message(self, client, userdata, msg):
+        """Nastavovací příkaz z MQTT - předbíhá pravidelné dotazování"""
+        command = msg.payload.decode('utf-8', errors='ignore').strip()
+        if not command:
+            return
+        
+        logger.info("→ Příkaz z MQTT: %s", command)
+        self.queue.submit(command, PRIORITY_SETTER, callback=self.publish_command_result)
+    
+    def publish_command_result(self, request):
+        """Publikuje výsledek nastavovacího příkazu včetně doby čekání ve frontě"""
+        payload = {
+            'command': request.command,
+            'success': request.error is None,
+            'result': request.result,
+            'error': str(request.error) if request.error else None,
+            'queue_wait': round(request.wait_time, 3),
+            'run_time': round(request.run_time, 3),
+        }
+        self.client.publish(COMMAND_RESULT_TOPIC, json.dumps(payload))
+        logger.info("← %s: %s (čekání %.2fs)", request.command,
+                    'OK' if request.error is None else request.error, request.wait_time)
+    
+    def get_mpp_data(self, command, priority=None):
+        """Získá data z MPP Solar přes prioritní frontu portu"""
+        timeout = self.queue.wait_timeout(command)
+        with span(self.profiler, command, 'command'):
+            request = self.queue.submit(command, priority)
+            request.wait(timeout)
+        if not request.done():
+            # Zaseknutý runner nesmí zablokovat vlákno sekce; výsledek přijde pozdě do fronty
+            logger.warning("Příkaz %s nedokončen do %.0f s", command, timeout)
+            if not self.low_memory:
+                self.health.record(self.device_path, command, timeout, TimeoutError(f"{command}: {timeout:.0f} s"))
             return None
-        except Exception as e:
-            print(f"Chyba při čtení {command}: {e}")
+        if isinstance(request.error, BreakerOpen):
+            # Přeskočeno bez komunikace, změnu stavu hlásí _breaker_changed; chyba
+            # zkušebního dotazu přijde jako skutečná chyba linky a zapíše se níže
+            return None
+        if not self.low_memory:
+            self.health.record(self.device_path, command, request.run_time or 0.0, request.error)
+        
+        if request.error:
+            logger.warning("Chyba při čtení %s: %s", command, request.error)
             return None
+        self.snapshots.update(command, request.result)
+        return request.result
+    
+    @staticmethod
+    def _command_budget(command):
+        """Rozpočet přímého příkazu včetně případného zkušebního QPI jističe"""
+        return BUDGET_FACTOR * (expected_time(command) + expected_time('QPI'))
     
     def publish_autodiscovery(self):
         """Publikuje auto-discovery konfiguraci pro Home Assistant"""
         if not self.connected:
             return
         
-        print("Publikuji HA autodiscovery konfiguraci...")
+        logger.info("Publikuji HA autodiscovery konfiguraci...")
         
         # Získáme vzorová data
         sample_data = self.get_mpp_data('QPIGS')
         if not sample_data:
-            print("Nelze získat vzorová data pro autodiscovery")
+            logger.warning("Nelze získat vzorová data pro autodiscovery")
             return
         
         device_info = {
@@ -115,6 +212,7 @@ class MPPMQTTPublisher:
                     "name": f"MPP Solar {name}",
                     "unique_id": f"mpp_solar_{sensor_key}",
                     "state_topic": f"mpp_solar/sensor/{sensor_key}",
+                    "json_attributes_topic": f"mpp_solar/attributes/{sensor_key}",
                     "unit_of_measurement": unit,
                     "icon": icon,
                     "device": device_info
@@ -126,6 +224,21 @@ class MPPMQTTPublisher:
                 config_topic = f"homeassistant/sensor/mpp_solar_{sensor_key}/config"
                 self.client.publish(config_topic, json.dumps(config), retain=True)
         
+        # Čítače energie - HA ukládá jen čítače, nepřepočítává z historie výkonu
+        for sensor_key, name, icon in ENERGY_SENSORS:
+            config = {
+                "name": f"MPP Solar {name}",
+                "unique_id": f"mpp_solar_{sensor_key}",
+                "state_topic": f"mpp_solar/sensor/{sensor_key}",
+                "unit_of_measurement": "kWh",
+                "device_class": "energy",
+                "state_class": "total_increasing",
+                "icon": icon,
+                "device": device_info
+            }
+            config_topic = f"homeassistant/sensor/mpp_solar_{sensor_key}/config"
+            self.client.publish(config_topic, json.dumps(config), retain=True)
+        
         # Binary senzory
         binary_sensors = [
             ('is_load_on', 'Load Status', 'mdi:power'),
@@ -149,32 +262,58 @@ class MPPMQTTPublisher:
                 config_topic = f"homeassistant/binary_sensor/mpp_solar_{sensor_key}/config"
                 self.client.publish(config_topic, json.dumps(config), retain=True)
         
-        print("✓ Autodiscovery konfigurace publikována")
+        # Stav linky - chybovost QPIGS, počítadla chyb a odezva jako atributy
+        config = {
+            "name": "MPP Solar Link Error Rate",
+            "unique_id": "mpp_solar_link_error_rate",
+            "state_topic": "mpp_solar/sensor/link_error_rate",
+            "json_attributes_topic": "mpp_solar/attributes/link_error_rate",
+            "unit_of_measurement": "%",
+            "entity_category": "diagnostic",
+            "icon": "mdi:usb",
+            "device": device_info
+        }
+        self.client.publish("homeassistant/sensor/mpp_solar_link_error_rate/config", json.dumps(config), retain=True)
+        
+        # Jistič linky - closed / open / half_open
+        config = {
+            "name": "MPP Solar Link Breaker",
+            "unique_id": "mpp_solar_link_breaker",
+            "state_topic": "mpp_solar/sensor/link_breaker",
+            "json_attributes_topic": "mpp_solar/attributes/link_breaker",
+            "entity_category": "diagnostic",
+            "icon": "mdi:electric-switch",
+            "device": device_info
+        }
+        self.client.publish("homeassistant/sensor/mpp_solar_link_breaker/config", json.dumps(config), retain=True)
+        
+        logger.info("✓ Autodiscovery konfigurace publikována")
     
     def publish_data(self):
         """Publikuje aktuální data"""
         if not self.connected:
-            print("✗ Není připojení k MQTT")
+            logger.warning("✗ Není připojení k MQTT")
             return False
         
         # Získáme všechna data
         status_data = self.get_mpp_data('QPIGS')
-        settings_data = self.get_mpp_data('QPIRI') 
         
         if not status_data:
-            print("✗ Nepodařilo se získat data")
+            logger.warning("✗ Nepodařilo se získat data")
             return False
         
-        # Publikujeme všechny hodnoty ze statusu
-        for key, value in status_data.items():
-            if isinstance(value, (int, float)):
-                topic = f"mpp_solar/sensor/{key}"
-                self.client.publish(topic, str(value))
-            elif isinstance(value, bool) or str(value) in ['0', '1']:
-                topic = f"mpp_solar/binary_sensor/{key}"
-                self.client.publish(topic, str(int(value)))
+        if self.sampler:
+            self.sampler.observe(status_data)
+        
+        if self.historian:
+            with span(self.profiler, 'QPIGS', 'sqlite'):
+                self.historian.add('QPIGS', status_data)
+        if self.shared:
+            with span(self.profiler, 'QPIGS', 'shm'):
+                self.shared.write(status_data)
         
         # Vypočítané hodnoty
+        values = dict(status_data)
         pv_voltage = status_data.get('pv_input_voltage', 0)
         pv_current = status_data.get('pv_input_current_for_battery', 0)
         pv_power_calc = round(pv_voltage * pv_current, 1)
@@ -184,40 +323,193 @@ class MPPMQTTPublisher:
         bat_discharge = status_data.get('battery_discharge_current', 0)
         bat_power = round(bat_voltage * (bat_discharge - bat_charge), 1)
         
-        # Publikujeme vypočítané hodnoty
-        self.client.publish("mpp_solar/sensor/pv_power_calculated", str(pv_power_calc))
-        self.client.publish("mpp_solar/sensor/battery_power", str(bat_power))
+        values['pv_power_calculated'] = pv_power_calc
+        values['battery_power'] = bat_power
         
         # Efektivita
         ac_power = status_data.get('ac_output_active_power', 0)
         if pv_power_calc > 0:
-            efficiency = round((ac_power / pv_power_calc) * 100, 1)
-            self.client.publish("mpp_solar/sensor/efficiency", str(efficiency))
+            values['efficiency'] = round((ac_power / pv_power_calc) * 100, 1)
+        
+        # Energie (Wh čítače integrované z výkonu) - vidí každý surový vzorek
+        self.energy.update(values)
+        values.update(self.energy.sensor_values())
+        
+        if not self.aggregator:
+            with span(self.profiler, 'QPIGS', 'mqtt'):
+                self._publish_values(values)
+            return True
+        
+        # Agregace do okna - do HA jde jedna hodnota za okno
+        window = self.aggregator.add(values, time.time())
+        if window:
+            with span(self.profiler, 'QPIGS', 'mqtt'):
+                self._publish_values(window['values'], window)
+        return True
+    
+    def _flush_window(self):
+        """Publikuje rozpracované okno agregace (při ukončení by se ztratilo)"""
+        window = self.aggregator.close() if self.aggregator else None
+        if window and self.connected:
+            self._publish_values(window['values'], window)
+    
+    def _publish_values(self, values, window=None):
+        """Publikuje hodnoty do stavových topiců (u okna i min/max jako atributy)"""
+        for key, value in values.items():
+            if key.startswith('energy_'):
+                self.client.publish(f"mpp_solar/sensor/{key}", str(value), retain=True)
+            elif isinstance(value, (int, float)):
+                topic = f"mpp_solar/sensor/{key}"
+                self.client.publish(topic, str(value))
+            elif isinstance(value, bool) or str(value) in ['0', '1']:
+                topic = f"mpp_solar/binary_sensor/{key}"
+                self.client.publish(topic, str(int(value)))
+        
+        if window:
+            for key in window['min']:
+                attributes = {
+                    'min': window['min'][key],
+                    'max': window['max'][key],
+                    'samples': window['count'],
+                    'window': self.aggregator.window,
+                }
+                self.client.publish(f"mpp_solar/attributes/{key}", json.dumps(attributes))
         
         # Timestamp
         self.client.publish("mpp_solar/sensor/last_update", datetime.now().isoformat())
+    
+    def publish_settings(self):
+        """Publikuje nastavení měniče (QPIRI) jako jeden JSON"""
+        if not self.connected:
+            return False
+        
+        settings_data = self.get_mpp_data('QPIRI')
+        if not settings_data:
+            return False
+        
+        self.client.publish("mpp_solar/settings", json.dumps(settings_data), retain=True)
+        if self.historian:
+            self.historian.add('QPIRI', settings_data)
+        
+        # Cutoff napětí baterie pro adaptivní vzorkování
+        if self.sampler and settings_data.get('battery_under_voltage'):
+            self.sampler.battery_cutoff = settings_data['battery_under_voltage']
+        return True
+    
+    def publish_warnings(self):
+        """Publikuje varování (QPIWS) - změna zrychlí vzorkování"""
+        if not self.connected:
+            return False
         
+        warnings_data = self.get_mpp_data('QPIWS')
+        if warnings_data is None:
+            return False
+        
+        self.client.publish("mpp_solar/warnings", json.dumps(warnings_data), retain=True)
+        if self.historian:
+            self.historian.add('QPIWS', warnings_data)
+        if self.shared:
+            self.shared.write(warnings=warnings_data)
+        if self.sampler:
+            self.sampler.observe_warnings(warnings_data)
         return True
     
-    def run_continuous(self, interval=30):
-        """Kontinuální publikování dat"""
+    def publish_scheduler_stats(self):
+        """Publikuje jitter a počty overrunů jednotlivých sekcí a paměť procesu"""
+        if self.connected and self.scheduler:
+            self.client.publish("mpp_solar/scheduler", json.dumps(self.scheduler.stats()))
+            memory = process_memory()
+            if memory:
+                memory.update(device=self.device_path, low_memory=self.low_memory)
+                self.client.publish("mpp_solar/process", json.dumps(memory), retain=True)
+            if self.profiler:
+                self.client.publish("mpp_solar/profile", json.dumps(self.profiler.summary()))
+    
+    def publish_link_health(self):
+        """Publikuje chyby a odezvu linky (MQTT) a zapíše metriky pro Prometheus"""
+        if self.prom_path:
+            try:
+                self.health.write_prometheus(self.prom_path)
+            except OSError as e:
+                logger.warning("Chyba zápisu metrik %s: %s", self.prom_path, e)
+        if not self.connected:
+            return
+        summary = self.health.summary()
+        self.client.publish("mpp_solar/link_health", json.dumps(summary))
+        qpigs = summary.get(self.device_path, {}).get('commands', {}).get('QPIGS')
+        if qpigs:
+            self.client.publish("mpp_solar/sensor/link_error_rate", str(round(qpigs['error_rate'] * 100, 1)))
+            self.client.publish("mpp_solar/attributes/link_error_rate", json.dumps(qpigs))
+        self.publish_breaker(get_breaker(self.device_path))
+    
+    def publish_breaker(self, breaker):
+        """Publikuje stav jističe zařízení (retain - HA ho vidí i po restartu)"""
+        if not self.connected or breaker.device != self.device_path:
+            return
+        status = breaker.status()
+        self.client.publish("mpp_solar/sensor/link_breaker", status['state'], retain=True)
+        self.client.publish("mpp_solar/attributes/link_breaker", json.dumps(status), retain=True)
+    
+    def _breaker_changed(self, breaker, old, new):
+        if new == 'open':
+            logger.warning("✗ %s: jistič rozpojen (%s), zkušební QPI za %.0f s",
+                           breaker.device, breaker.last_error, breaker.delay)
+        elif new == 'closed':
+            logger.info("✓ %s: měnič odpovídá, jistič sepnut", breaker.device)
+        self.publish_breaker(breaker)
+    
+    def _status_section(self):
+        if self.publish_data():
+            logger.info("✓ Data publikována")
+        else:
+            logger.warning("✗ Chyba publikování")
+        self.publish_scheduler_stats()
+        self.publish_link_health()
+    
+    def _device_moved(self, old_path, new_path):
+        """Měnič po přepojení USB dostal jiné číslo - další příkazy jdou na novou cestu
+
+        Volá se z vlákna sledování USB; port přepne a starý zavře až
+        obslužné vlákno fronty, které s ním právě může komunikovat.
+        """
+        self.device_path = new_path
+        self.queue.move(new_path, cleanup=close_port)
+    
+    def run_continuous(self, interval=30, settings_interval=300, warnings_interval=60,
+                       min_interval=2, idle_interval=60):
+        """Kontinuální publikování dat
+
+        Každá sekce má vlastní interval a plánuje se podle monotónních
+        termínů, takže doba komunikace s měničem neprodlužuje periodu.
+        Interval stavové sekce se adaptivně mění mezi min_interval
+        a idle_interval podle stavu měniče.
+        """
         print(f"🚀 MPP Solar MQTT Publisher spuštěn")
-        print(f"📊 Interval publikování: {interval} sekund")
+        print(f"📊 Interval publikování: {interval} sekund (nastavení: {settings_interval} s)")
         print(f"📡 Device: {self.device_path}")
         print("📋 Stiskněte Ctrl+C pro ukončení\n")
         
+        self.scheduler = IntervalScheduler()
+        self.scheduler.add_section('status', interval, self._status_section)
+        self.scheduler.add_section('settings', settings_interval, self.publish_settings)
+        self.scheduler.add_section('warnings', warnings_interval, self.publish_warnings)
+        self.sampler = AdaptiveSampler(self.scheduler, 'status', interval,
+                                       min_interval=min_interval, idle_interval=idle_interval)
+        
         try:
-            while True:
-                if self.publish_data():
-                    print(f"✓ {datetime.now().strftime('%H:%M:%S')} - Data publikována")
-                else:
-                    print(f"✗ {datetime.now().strftime('%H:%M:%S')} - Chyba publikování")
-                
-                time.sleep(interval)
+            self.tracker.start()
+            self.scheduler.run()
                 
         except KeyboardInterrupt:
-            print("\n🛑 MQTT Publisher ukončen")
+            logger.info("🛑 MQTT Publisher ukončen")
         finally:
+            self.tracker.stop()
+            self._flush_window()
+            self.energy.save()
+            if self.historian:
+                self.historian.close()
+            self.queue.stop()
+            stop_server(self.snapshot_servers)
             self.client.loop_stop()
             self.client.disconnect()
 
@@ -231,29 +523,68 @@ def main():
     USERNAME = None            # MQTT username (pokud je potřeba)
     PASSWORD = None            # MQTT password (pokud je potřeba)
     INTERVAL = 30              # Interval v sekundách
+    SETTINGS_INTERVAL = 300    # Interval pro nastavení (QPIRI)
+    WARNINGS_INTERVAL = 60     # Interval pro varování (QPIWS)
+    MIN_INTERVAL = 2           # Nejrychlejší vzorkování při změnách
+    IDLE_INTERVAL = 60         # Vzorkování v noci bez výroby
+    WINDOW = 60                # Okno agregace pro HA v sekundách (0 = každý vzorek)
+    HISTORY_DB = None          # Lokální historie v SQLite, např. 'mpp_history.db'
+    SNAPSHOT_PORT = 8765       # Lokální API s posledními vzorky (None = vypnuto)
+    SHM_PATH = '/dev/shm/mpp_solar'  # Poslední vzorek ve sdílené paměti (None = vypnuto)
+    DEVICE_PATH = None         # None = najít měnič podle USB VID:PID (jinak např. '/dev/hidraw2')
+    LOW_MEMORY = False         # Úsporný profil pro Pi Zero (přímá komunikace, bez SQLite a API)
+    CAPTURE_PATH = None        # Záznam surových rámců, např. 'mpp_frames.cap' (jen s LOW_MEMORY)
+    PROFILE = False            # Doby fází příkazů a výstupů do topicu mpp_solar/profile
+    PROM_PATH = None           # Metriky linky pro node_exporter, např. '/var/lib/node_exporter/mpp_solar.prom'
+    LOG_PATH = None            # Úsporný log pro SD kartu (dávky, omezení opakování), např. '/var/log/mpp-solar.log'
+    LOG_LEVEL = 'INFO'         # Do souboru stačí 'WARNING' - INFO zůstane v záznamu letu (kill -USR1)
+    
+    if LOG_PATH:
+        setup_logging(LOG_PATH, LOG_LEVEL)
+    else:
+        setup_logging(level=LOG_LEVEL, fmt='%(asctime)s %(message)s', datefmt='%H:%M:%S')
     
     print(f"MQTT Broker: {BROKER_HOST}:{BROKER_PORT}")
     print(f"Username: {USERNAME or 'None'}")
     print(f"Interval: {INTERVAL}s")
     
+    device_path = DEVICE_PATH or next(
+        (d['path'] for d in enumerate_devices() if d['class'] == 'hidraw'), '/dev/hidraw2')
+    print(f"Zařízení: {device_path}")
+    
     # Test připojení k MPP Solar
     print("\nTestuji připojení k MPP Solar...")
     try:
-        cmd = ['mpp-solar', '-p', '/dev/hidraw2', '-c', 'QPI', '-o', 'json']
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
+        if LOW_MEMORY:
+            if CAPTURE_PATH:
+                from mpp_capture import CaptureWriter
+                set_capture(CaptureWriter(CAPTURE_PATH))
+                print(f"Záznam rámců: {CAPTURE_PATH}")
+            # Uložený výsledek detekce stačí potvrdit jedním dotazem
+            protocol, _ = detect_protocol(get_port(device_path))
+            if protocol != 'PI30':
+                print(f"✗ MPP Solar nedostupný nebo nepodporovaný protokol ({protocol})")
+                return
+            print(f"✓ MPP Solar připojen (protokol: {protocol})")
+        else:
+            cmd = ['mpp-solar', '-p', device_path, '-c', 'QPI', '-o', 'json']
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            if result.returncode != 0:
+                print("✗ MPP Solar nedostupný")
+                return
             data = json.loads(result.stdout)
             protocol = data.get('protocol_id', 'Unknown')
             print(f"✓ MPP Solar připojen (protokol: {protocol})")
-        else:
-            print("✗ MPP Solar nedostupný")
-            return
     except Exception as e:
         print(f"✗ Chyba testu MPP Solar: {e}")
         return
     
     # Spustíme publisher
-    publisher = MPPMQTTPublisher(BROKER_HOST, BROKER_PORT, USERNAME, PASSWORD)
+    publisher = MPPMQTTPublisher(BROKER_HOST, BROKER_PORT, USERNAME, PASSWORD, device_path=device_path,
+                                 window=WINDOW,
+                                 history_db=HISTORY_DB, snapshot_port=SNAPSHOT_PORT,
+                                 shm_path=SHM_PATH, low_memory=LOW_MEMORY, profile=PROFILE,
+                                 prom_path=PROM_PATH)
     
     # Počkáme na připojení
     for i in range(5):
@@ -270,7 +601,8 @@ def main():
         return
     
     # Spustíme kontinuální publikování
-    publisher.run_continuous(INTERVAL)
+    publisher.run_continuous(INTERVAL, SETTINGS_INTERVAL, WARNINGS_INTERVAL,
+                             MIN_INTERVAL, IDLE_INTERVAL)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
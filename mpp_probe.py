@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Souběžné hledání portu a rychlosti měniče
+Každý port se zkouší ve vlastním vlákně, rychlosti na jednom portu postupně
+
+Celé hledání tak trvá zhruba jeden timeout (jeden dotaz na port a rychlost)
+místo součtu všech pokusů za sebou.
+
+Bez zadaných portů se zkoušejí jen známé měniče a USB-RS232 adaptéry
+(VID:PID z mpp_discovery). Slepé zkoušení všech hidraw/ttyUSB/ttyACM (--all)
+pošle QPI i klávesnicím, UPS, GPS a modemům - jen na vlastní žádost.
+
+Příklady:
+    python3 mpp_probe.py                       # známé měniče a adaptéry
+    python3 mpp_probe.py --all                 # všechny hidraw/ttyUSB/ttyACM
+    python3 mpp_probe.py /dev/ttyUSB0 --baud 2400,9600,19200 --command QPIGS
+"""
+
+import argparse
+import glob
+import queue
+import sys
+import threading
+import time
+
+from mpp_discovery import enumerate_devices
+from mpp_transport import PI30Port, TransportError, build_command, parse_response
+
+DEFAULT_BAUDS = (2400, 9600)
+FALLBACK_PATTERNS = ('/dev/hidraw*', '/dev/ttyUSB*', '/dev/ttyACM*')
+
+
+def candidate_ports(sweep=False):
+    """Známé měniče ze sysfs; sweep=True přidá i všechny ostatní hidraw/ttyUSB/ttyACM"""
+    ports = [d['path'] for d in enumerate_devices()]
+    if not sweep:
+        return ports
+    for pattern in FALLBACK_PATTERNS:
+        ports += [p for p in sorted(glob.glob(pattern)) if p not in ports]
+    return ports
+
+
+def probe_port(path, bauds=DEFAULT_BAUDS, command='QPI', timeout=1.0, stop=None):
+    """Zkouší rychlosti na jednom portu do první odpovědi s platným CRC
+
+    Vrací seznam pokusů: dict port, baud, ok, latency_ms, response, error.
+    hidraw rychlost nemá, zkouší se jen jednou (baud None).
+    """
+    attempts = []
+    frame = build_command(command)
+    for baud in ((None,) if 'hidraw' in path else bauds):
+        if stop is not None and stop.is_set():
+            break
+        attempt = {'port': path, 'baud': baud, 'ok': False, 'latency_ms': None,
+                   'response': None, 'error': None}
+        device = PI30Port(path, baud=baud or 2400, timeout=timeout)
+        started = time.perf_counter()
+        try:
+            attempt['response'] = parse_response(device.exchange(frame))
+            attempt['ok'] = True
+        except ImportError:
+            attempt['error'] = 'pyserial není nainstalován'
+        except (OSError, TransportError) as e:
+            attempt['error'] = str(e)
+        finally:
+            attempt['latency_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            device.close()
+        attempts.append(attempt)
+        if attempt['ok'] or attempt['error'] == 'pyserial není nainstalován':
+            break
+    return attempts
+
+
+def rank(attempts):
+    """Úspěšné pokusy podle odezvy, za nimi neúspěšné"""
+    return sorted(attempts, key=lambda a: (not a['ok'], a['latency_ms'] or 0))
+
+
+def probe_all(ports=None, bauds=DEFAULT_BAUDS, command='QPI', timeout=1.0, first=False):
+    """Otestuje všechny porty souběžně a vrátí seřazený seznam pokusů
+
+    first=True vrátí hned po první platné odpovědi; ostatní vlákna
+    dokončí rozběhnutý dotaz a další rychlosti už nezkoušejí.
+    """
+    ports = candidate_ports() if ports is None else ports
+    results = queue.Queue()
+    stop = threading.Event()
+
+    def worker(path):
+        results.put(probe_port(path, bauds, command, timeout, stop))
+
+    for path in ports:
+        threading.Thread(target=worker, args=(path,), name=f'mpp-probe-{path}', daemon=True).start()
+
+    attempts = []
+    for _ in ports:
+        port_attempts = results.get()
+        attempts += port_attempts
+        if first and any(a['ok'] for a in port_attempts):
+            stop.set()
+            break
+    return rank(attempts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Souběžné hledání portu a rychlosti měniče')
+    parser.add_argument('ports', nargs='*', help='Porty (bez nich známé měniče a adaptéry)')
+    parser.add_argument('--baud', default=','.join(map(str, DEFAULT_BAUDS)),
+                        help='Rychlosti sériového portu oddělené čárkou (v pořadí zkoušení)')
+    parser.add_argument('--command', default='QPI', help='Testovací příkaz (QPI, QPIGS)')
+    parser.add_argument('--timeout', type=float, default=1.0, help='Timeout jednoho dotazu (s)')
+    parser.add_argument('--first', action='store_true', help='Skončit po první platné odpovědi')
+    parser.add_argument('--all', action='store_true',
+                        help='Zkusit všechny hidraw/ttyUSB/ttyACM, i neznámá zařízení')
+    args = parser.parse_args()
+
+    ports = args.ports or candidate_ports(args.all)
+    if not ports:
+        sys.exit("Žádný známý měnič ani USB-RS232 adaptér nenalezen (--all zkusí všechny porty)")
+    bauds = [int(b) for b in args.baud.split(',') if b.strip()]
+
+    started = time.perf_counter()
+    attempts = probe_all(ports, bauds, args.command.upper(), args.timeout, args.first)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'Port':<14} {'Rychlost':>8} {'Odezva':>9}  Výsledek")
+    for attempt in attempts:
+        baud = attempt['baud'] or 'HID'
+        result = f"✅ {attempt['response'][:60]}" if attempt['ok'] else f"❌ {attempt['error']}"
+        print(f"{attempt['port']:<14} {baud:>8} {attempt['latency_ms']:>7.1f}ms  {result}")
+    print(f"\n{len(ports)} portů za {elapsed:.2f} s")
+
+    working = [a for a in attempts if a['ok']]
+    if not working:
+        sys.exit(1)
+    best = working[0]
+    baud = f" -b {best['baud']}" if best['baud'] else ''
+    print(f"Doporučeno: mpp-solar -p {best['port']} -P PI30{baud} -c QPIGS")
+
+
+if __name__ == "__main__":
+    main()
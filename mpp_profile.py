@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Doby jednotlivých fází komunikace a výstupů (perf_counter_ns)
+Rozliší, jestli pomalý cyklus způsobil měnič, transport nebo výstupy
+
+Fáze příkazu v PI30Port: open (jen když se port otevíral), write,
+first_byte (od odeslání po první bajt - odezva měniče), last_byte (příjem
+zbytku odpovědi po lince), crc, decode. Výstupy (json, sqlite, shm, mqtt...)
+měří volající přes span(). Pro každou dvojici příkaz/fáze se drží
+posledních `window` hodnot a z nich se počítají percentily.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+_NO_SPAN = nullcontext()
+
+
+class RollingHistogram:
+    """Posledních `window` dob jedné fáze v ns"""
+
+    def __init__(self, window=512):
+        self.values = deque(maxlen=window)
+        self.total = 0
+
+    def add(self, ns):
+        self.values.append(ns)
+        self.total += 1
+
+    def summary(self):
+        """count (celkem), n (v okně), mean/p50/p90/p99/max v ms"""
+        ordered = sorted(self.values)
+        n = len(ordered)
+        if not n:
+            return {'count': self.total, 'n': 0}
+
+        def pick(fraction):
+            return round(ordered[min(n - 1, int(fraction * n))] / 1e6, 3)
+
+        return {
+            'count': self.total,
+            'n': n,
+            'mean_ms': round(sum(ordered) / n / 1e6, 3),
+            'p50_ms': pick(0.5),
+            'p90_ms': pick(0.9),
+            'p99_ms': pick(0.99),
+            'max_ms': round(ordered[-1] / 1e6, 3),
+        }
+
+
+class StageProfiler:
+    """Klouzavé histogramy dob fází po příkazech (bezpečné pro vlákna)"""
+
+    def __init__(self, window=512):
+        self.window = window
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, command, stage, ns):
+        key = (command, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = RollingHistogram(self.window)
+            histogram.add(ns)
+
+    @contextmanager
+    def span(self, command, stage):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(command, stage, time.perf_counter_ns() - started)
+
+    def summary(self):
+        """{příkaz: {fáze: souhrn}} ve stejném pořadí, v jakém fáze přibyly"""
+        with self._lock:
+            items = [(key, histogram.summary()) for key, histogram in self._histograms.items()]
+        result = {}
+        for (command, stage), summary in items:
+            result.setdefault(command, {})[stage] = summary
+        return result
+
+    def format_table(self):
+        lines = [f"{'Příkaz':<8} {'Fáze':<12} {'počet':>7} {'průměr':>9} {'p50':>9} {'p99':>9} {'max':>9}"]
+        for command, stages in self.summary().items():
+            for stage, s in stages.items():
+                if not s['n']:
+                    continue
+                lines.append(f"{command:<8} {stage:<12} {s['count']:>7} {s['mean_ms']:>7.2f}ms "
+                             f"{s['p50_ms']:>7.2f}ms {s['p99_ms']:>7.2f}ms {s['max_ms']:>7.2f}ms")
+        return '\n'.join(lines)
+
+
+def span(profiler, command, stage):
+    """profiler.span(), nebo nic nedělající kontext, když profilování neběží"""
+    return _NO_SPAN if profiler is None else profiler.span(command, stage)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Dotazy nad archivem vzorků QPIGS
+Výběr časového rozsahu binárním vyhledáváním, čtení jen zvolených sloupců
+
+Příklady:
+    python3 mpp_query.py --from 2025-06-17 --to 2025-06-24 --daily 02:00-06:00 \\
+        --fields battery_voltage --agg min,max,mean
+    python3 mpp_query.py --from "2025-06-24 12:00" --to "2025-06-24 13:00" \\
+        --fields pv_input_power,battery_voltage
+    python3 mpp_query.py --from 2025-01-01 --to 2025-07-01 --fields pv_input_power --points 150
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from mpp_archive import FIELD_NAMES, Segment, list_segments
+from mpp_rollup import RESOLUTIONS, aggregate_rollups, covered_from, pick_resolution, read_rollups
+
+AGGREGATES = ('count', 'min', 'max', 'mean', 'last')
+
+
+def _segments(directory, start, end):
+    for path in list_segments(directory, start, end):
+        try:
+            segment = Segment(path)
+        except ValueError as e:
+            print(f"Přeskakuji segment: {e}", file=sys.stderr)
+            continue
+        yield segment
+
+
+def select(directory, start, end, fields):
+    """Vrátí sloupce zvolených polí pro vzorky v [start, end)
+
+    Výsledek je dict {pole: seznam hodnot} včetně 'timestamp'.
+    """
+    fields = ['timestamp'] + [f for f in fields if f != 'timestamp']
+    result = {field: [] for field in fields}
+
+    for segment in _segments(directory, start, end):
+        with segment:
+            lo, hi = segment.search(start, end)
+            if hi <= lo:
+                continue
+            for field in fields:
+                values = segment.column(field, lo, hi)
+                # numpy pohledy zkopírujeme - segment se hned zavírá
+                result[field].extend(values.tolist() if hasattr(values, 'tolist') else values)
+    return result
+
+
+def _empty_totals(fields):
+    return {field: {'count': 0, 'min': None, 'max': None, 'sum': 0.0, 'last': None} for field in fields}
+
+
+def _merge(totals, part):
+    """Přičte dílčí agregaci (v časovém pořadí - last je z novější části)"""
+    for field, values in part.items():
+        if not values['count']:
+            continue
+        total = totals[field]
+        total['count'] += values['count']
+        total['sum'] += values['sum']
+        total['last'] = values['last']
+        total['min'] = values['min'] if total['min'] is None else min(total['min'], values['min'])
+        total['max'] = values['max'] if total['max'] is None else max(total['max'], values['max'])
+
+
+def _aggregate_raw(directory, start, end, fields):
+    totals = _empty_totals(fields)
+    if end <= start:
+        return totals
+    for segment in _segments(directory, start, end):
+        with segment:
+            lo, hi = segment.search(start, end)
+            if hi <= lo:
+                continue
+            _merge(totals, {field: segment.aggregate(field, lo, hi) for field in fields})
+    return totals
+
+
+def _aggregate_mixed(directory, start, end, fields, resolutions):
+    """Uzavřené buckety agregací uvnitř rozsahu, okraje jemnějším rozlišením, zbytek surově
+
+    Bucket, který v souborech chybí (rozpracovaný, agregace neběžely), se
+    počítá ze surových vzorků, takže výsledek je stejný jako s 'raw'.
+    """
+    for index, (name, seconds, since) in enumerate(resolutions):
+        first = max(start, since)
+        first += -first % seconds
+        last = end - end % seconds
+        if first >= last:
+            continue
+        finer = resolutions[index + 1:]
+        totals = _aggregate_mixed(directory, start, first, fields, finer)
+        buckets = {bucket['start']: bucket for bucket in read_rollups(directory, name, first, last, fields)}
+        for bucket_start in range(int(first), int(last), seconds):
+            bucket = buckets.get(bucket_start)
+            if bucket is None:
+                _merge(totals, _aggregate_raw(directory, bucket_start, bucket_start + seconds, fields))
+                continue
+            _merge(totals, {field: {**values, 'sum': values['mean'] * values['count']}
+                            for field, values in bucket['fields'].items()})
+        _merge(totals, _aggregate_mixed(directory, last, end, fields, finer))
+        return totals
+    return _aggregate_raw(directory, start, end, fields)
+
+
+def aggregate(directory, start, end, fields, aggregates=AGGREGATES, resolution='auto'):
+    """Agregace min/max/mean/count/last přímo nad segmenty bez načtení sloupců
+
+    resolution='auto' vezme z uložených agregací (mpp_rollup) jen úplné
+    uzavřené buckety uvnitř rozsahu, okraje a chybějící buckety čte surově.
+    Buckety 1d jsou dny v UTC - místní dny (--daily) se skládají z hodin.
+    'raw' vždy čte surové vzorky, jiné rozlišení jen uložené agregace.
+    """
+    if resolution == 'auto':
+        resolutions = []
+        for name, seconds, _ in reversed(RESOLUTIONS):
+            since = covered_from(directory, name)
+            if since is not None:
+                resolutions.append((name, seconds, since))
+        return _finalize(_aggregate_mixed(directory, start, end, fields, resolutions), aggregates)
+    if resolution != 'raw':
+        return _finalize(aggregate_rollups(directory, start, end, fields, resolution), aggregates)
+    return _finalize(_aggregate_raw(directory, start, end, fields), aggregates)
+
+
+def _finalize(totals, aggregates):
+    result = {}
+    for field, total in totals.items():
+        values = {
+            'count': total['count'],
+            'min': total['min'],
+            'max': total['max'],
+            'mean': total['sum'] / total['count'] if total['count'] else None,
+            'last': total['last'],
+        }
+        result[field] = {name: values[name] for name in aggregates}
+    return result
+
+
+def daily_windows(start, end, window):
+    """Rozsahy 'HH:MM-HH:MM' v místním čase pro každý den mezi start a end"""
+    begin, finish = window.split('-')
+    begin = datetime.strptime(begin, '%H:%M').time()
+    finish = datetime.strptime(finish, '%H:%M').time()
+
+    day = datetime.fromtimestamp(start).date()
+    last_day = datetime.fromtimestamp(end).date()
+    while day <= last_day:
+        window_start = datetime.combine(day, begin)
+        window_end = datetime.combine(day, finish)
+        if window_end <= window_start:
+            # Okno přes půlnoc
+            window_end += timedelta(days=1)
+        ws, we = window_start.timestamp(), window_end.timestamp()
+        if we > start and ws < end:
+            yield max(ws, start), min(we, end)
+        day += timedelta(days=1)
+
+
+def parse_time(value):
+    """Čas ve formátu 'YYYY-MM-DD', 'YYYY-MM-DD HH:MM' nebo Unix timestamp"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            pass
+    return float(value)
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dotazy nad archivem MPP Solar / EASUN')
+    parser.add_argument('--dir', default='mpp_archive', help='Adresář archivu')
+    parser.add_argument('--from', dest='start', required=True, help='Začátek (místní čas)')
+    parser.add_argument('--to', dest='end', help='Konec (výchozí: nyní)')
+    parser.add_argument('--fields', default='battery_voltage', help='Pole oddělená čárkou')
+    parser.add_argument('--agg', help=f"Agregace oddělené čárkou ({','.join(AGGREGATES)})")
+    parser.add_argument('--daily', help="Denní okno 'HH:MM-HH:MM' (každý den zvlášť)")
+    parser.add_argument('--resolution', default='auto',
+                        choices=['auto', 'raw'] + [name for name, _, _ in RESOLUTIONS],
+                        help='Zdroj agregací: uložené agregace nebo surové vzorky')
+    parser.add_argument('--points', type=int,
+                        help='Časová řada z agregací s aspoň N body (pro grafy)')
+    parser.add_argument('--json', action='store_true', help='Výstup jako JSON')
+    args = parser.parse_args()
+
+    start = parse_time(args.start)
+    end = parse_time(args.end) if args.end else time.time()
+    fields = [f.strip() for f in args.fields.split(',') if f.strip()]
+
+    # Agregace obsahují i vypočítaná pole (battery_power...), surový archiv jen QPIGS
+    unknown = [f for f in fields if f not in FIELD_NAMES]
+    if unknown and not args.points and args.resolution in ('auto', 'raw'):
+        parser.error(f"Neznámá pole: {', '.join(unknown)} (dostupná: {', '.join(FIELD_NAMES)})")
+
+    ranges = list(daily_windows(start, end, args.daily)) if args.daily else [(start, end)]
+    started = time.perf_counter()
+
+    if args.points:
+        resolution = (args.resolution if args.resolution not in ('auto', 'raw')
+                      else pick_resolution(start, end, args.points))
+        buckets = list(read_rollups(args.dir, resolution, start, end, fields))
+
+        if args.json:
+            print(json.dumps(buckets))
+        else:
+            print(f"# rozlišení {resolution}, {len(buckets)} bodů")
+            print(','.join(['time'] + [f"{f}_{a}" for f in fields for a in ('min', 'mean', 'max')]))
+            for bucket in buckets:
+                values = []
+                for field in fields:
+                    stats = bucket['fields'].get(field)
+                    values += [f"{stats[a]:g}" if stats else '' for a in ('min', 'mean', 'max')]
+                print(','.join([_format_time(bucket['start'])] + values))
+    elif args.agg:
+        aggregates = [a.strip() for a in args.agg.split(',')]
+        bad = [a for a in aggregates if a not in AGGREGATES]
+        if bad:
+            parser.error(f"Neznámé agregace: {', '.join(bad)}")
+
+        results = [{'from': _format_time(ws), 'to': _format_time(we),
+                    'values': aggregate(args.dir, ws, we, fields, aggregates, args.resolution)}
+                   for ws, we in ranges]
+
+        if args.json:
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+        else:
+            for result in results:
+                print(f"{result['from']} - {result['to']}")
+                for field, values in result['values'].items():
+                    formatted = '  '.join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}"
+                                          for k, v in values.items())
+                    print(f"  {field:<32} {formatted}")
+    else:
+        rows = []
+        for ws, we in ranges:
+            columns = select(args.dir, ws, we, fields)
+            rows.extend(zip(*[columns[f] for f in ['timestamp'] + fields]))
+
+        if args.json:
+            print(json.dumps([dict(zip(['timestamp'] + fields, row)) for row in rows]))
+        else:
+            print(','.join(['time'] + fields))
+            for row in rows:
+                print(','.join([_format_time(row[0])] + [f"{v:g}" for v in row[1:]]))
+
+    print(f"Dotaz trval {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
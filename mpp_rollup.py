@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Průběžné agregace vzorků (1 min, 1 h, 1 den)
+Pro každé pole drží min/max/mean/last/count, každý vzorek je O(1)
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+from mpp_archive import normalize_sample
+
+# Rozlišení: (název, délka bucketu v sekundách, formát data v názvu souboru)
+RESOLUTIONS = [
+    ('1m', 60, '%Y%m%d'),
+    ('1h', 3600, '%Y%m'),
+    ('1d', 86400, '%Y'),
+]
+
+STATE_FILE = 'rollup_state.json'
+
+
+def _file_suffix(timestamp, date_format):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(date_format)
+
+
+def rollup_path(directory, resolution, timestamp):
+    """Soubor s uzavřenými buckety daného rozlišení (1m po dnech, 1h po měsících, 1d po letech)"""
+    for name, _, date_format in RESOLUTIONS:
+        if name == resolution:
+            return os.path.join(directory, f"rollup_{name}_{_file_suffix(timestamp, date_format)}.jsonl")
+    raise ValueError(f"Neznámé rozlišení: {resolution}")
+
+
+def numeric_fields(sample):
+    """Číselná pole vzorku (bez bool a textů)"""
+    return {k: v for k, v in sample.items()
+            if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+class Bucket:
+    """Agregace jednoho časového okna"""
+
+    __slots__ = ('start', 'stats')
+
+    def __init__(self, start, stats=None):
+        self.start = start
+        # pole -> [count, min, max, sum, last]
+        self.stats = stats or {}
+
+    def add(self, values):
+        stats = self.stats
+        for field, value in values.items():
+            entry = stats.get(field)
+            if entry is None:
+                stats[field] = [1, value, value, value, value]
+            else:
+                entry[0] += 1
+                if value < entry[1]:
+                    entry[1] = value
+                if value > entry[2]:
+                    entry[2] = value
+                entry[3] += value
+                entry[4] = value
+
+    def to_dict(self):
+        return {
+            'start': self.start,
+            'fields': {
+                field: {'count': c, 'min': lo, 'max': hi, 'mean': round(total / c, 4), 'last': last}
+                for field, (c, lo, hi, total, last) in self.stats.items()
+            },
+        }
+
+
+class RollupEngine:
+    """Průběžně plní buckety všech rozlišení a uzavřené buckety ukládá
+
+    Rozpracované buckety se při close() uloží do rollup_state.json
+    a po restartu se v nich pokračuje, pokud ještě neskončily. Stav se po
+    načtení smaže - po pádu (bez close) se stejné buckety neuloží podruhé.
+    """
+
+    def __init__(self, directory, fields=None):
+        self.directory = directory
+        self.fields = set(fields) if fields else None
+        os.makedirs(directory, exist_ok=True)
+        self.buckets = {name: None for name, _, _ in RESOLUTIONS}
+        self._load_state()
+
+    def add(self, sample, timestamp):
+        """Přidá vzorek (dict z QPIGS / read_easun_data)"""
+        values = numeric_fields(normalize_sample(sample))
+        if self.fields is not None:
+            values = {k: v for k, v in values.items() if k in self.fields}
+        if not values:
+            return
+
+        for name, seconds, _ in RESOLUTIONS:
+            start = timestamp - timestamp % seconds
+            bucket = self.buckets[name]
+            if bucket is None or bucket.start != start:
+                if bucket is not None:
+                    self._persist(name, bucket)
+                bucket = self.buckets[name] = Bucket(start)
+            bucket.add(values)
+
+    def current(self, resolution):
+        """Rozpracovaný bucket jako dict (nebo None)"""
+        bucket = self.buckets[resolution]
+        return bucket.to_dict() if bucket else None
+
+    def _persist(self, name, bucket):
+        with open(rollup_path(self.directory, name, bucket.start), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(bucket.to_dict(), separators=(',', ':')) + '\n')
+
+    def close(self):
+        """Uloží rozpracované buckety pro pokračování po restartu"""
+        state = {name: {'start': b.start, 'stats': b.stats}
+                 for name, b in self.buckets.items() if b is not None}
+        path = os.path.join(self.directory, STATE_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+    def _load_state(self):
+        path = os.path.join(self.directory, STATE_FILE)
+        try:
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        os.remove(path)
+        for name, bucket in state.items():
+            if name in self.buckets:
+                self.buckets[name] = Bucket(bucket['start'], bucket['stats'])
+
+
+def read_rollups(directory, resolution, start, end, fields=None):
+    """Uzavřené buckety daného rozlišení se začátkem v [start, end)
+
+    Bucket se stejným začátkem (starší zápis po pádu) se vrátí jen jednou.
+    """
+    paths = []
+    t = start - start % 86400
+    while t < end:
+        path = rollup_path(directory, resolution, t)
+        if path not in paths:
+            paths.append(path)
+        t += 86400
+
+    seen = set()
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    bucket = json.loads(line)
+                except ValueError:
+                    continue
+                if start <= bucket['start'] < end and bucket['start'] not in seen:
+                    seen.add(bucket['start'])
+                    if fields:
+                        bucket['fields'] = {k: v for k, v in bucket['fields'].items() if k in fields}
+                    yield bucket
+
+
+def covered_from(directory, resolution):
+    """Začátek prvního úplného bucketu rozlišení (None = žádné agregace)
+
+    Nejstarší uložený bucket mohl začít uprostřed (agregace se zapnuly
+    za běhu), proto se počítá až od následujícího.
+    """
+    seconds = dict((name, length) for name, length, _ in RESOLUTIONS)[resolution]
+    prefix = f"rollup_{resolution}_"
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.startswith(prefix) and n.endswith('.jsonl'))
+    except OSError:
+        return None
+    for name in names:
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            for line in f:
+                try:
+                    return json.loads(line)['start'] + seconds
+                except (ValueError, KeyError):
+                    continue
+    return None
+
+
+def pick_resolution(start, end, points=None):
+    """Nejhrubší rozlišení vhodné pro dotaz
+
+    Bez points: nejhrubší rozlišení, na jehož hranicích začátek i konec leží
+    (agregace celého rozsahu), jinak None.
+    S points: nejhrubší rozlišení, které dá aspoň points bucketů.
+    """
+    for name, seconds, _ in reversed(RESOLUTIONS):
+        if points is None:
+            if start % seconds == 0 and end % seconds == 0:
+                return name
+        elif (end - start) / seconds >= points:
+            return name
+    return None if points is None else RESOLUTIONS[0][0]
+
+
+def aggregate_rollups(directory, start, end, fields, resolution):
+    """Agregace rozsahu z uzavřených bucketů - stejný výstup jako mpp_query.aggregate"""
+    totals = {field: {'count': 0, 'min': None, 'max': None, 'sum': 0.0, 'last': None}
+              for field in fields}
+    for bucket in read_rollups(directory, resolution, start, end, fields):
+        for field, values in bucket['fields'].items():
+            total = totals[field]
+            total['count'] += values['count']
+            total['sum'] += values['mean'] * values['count']
+            total['last'] = values['last']
+            total['min'] = values['min'] if total['min'] is None else min(total['min'], values['min'])
+            total['max'] = values['max'] if total['max'] is None else max(total['max'], values['max'])
+    return totals
+
+
+class WindowAggregator:
+    """Agregace vzorků do oken pevné délky pro publikování
+
+    Okna jsou zarovnaná na násobky window (např. celé minuty). Okno se uzavře
+    prvním vzorkem z dalšího okna a add() pak vrátí jeho výsledek:
+    {'start', 'count', 'values' (mean nebo poslední hodnota), 'min', 'max'}.
+    Pole z last_prefixes (stavové příznaky) a nečíselná pole se nepočítají
+    jako průměr, ale předává se jejich poslední hodnota.
+    """
+
+    def __init__(self, window, last_prefixes=('is_',)):
+        self.window = window
+        self.last_prefixes = last_prefixes
+        self._bucket = None
+        self._last = {}
+
+    def add(self, sample, timestamp):
+        """Přidá vzorek, vrátí výsledek uzavřeného okna nebo None"""
+        start = timestamp - timestamp % self.window
+        closed = None
+        if self._bucket is not None and self._bucket.start != start:
+            closed = self.flush()
+
+        if self._bucket is None:
+            self._bucket = Bucket(start)
+
+        numeric = {}
+        for key, value in sample.items():
+            if key.startswith(self.last_prefixes) or key not in numeric_fields({key: value}):
+                self._last[key] = value
+            else:
+                numeric[key] = value
+        self._bucket.add(numeric)
+        return closed
+
+    def flush(self):
+        """Uzavře rozpracované okno a vrátí jeho výsledek"""
+        bucket = self._bucket
+        if bucket is None:
+            return None
+        self._bucket = None
+
+        result = {'start': bucket.start, 'count': 0, 'values': dict(self._last), 'min': {}, 'max': {}}
+        for field, (count, low, high, total, _) in bucket.stats.items():
+            result['count'] = max(result['count'], count)
+            result['values'][field] = round(total / count, 3)
+            result['min'][field] = low
+            result['max'][field] = high
+        self._last = {}
+        return result
+
+    def close(self):
+        """Při ukončení: výsledek posledního, neúplného okna (nebo None)"""
+        return self.flush()
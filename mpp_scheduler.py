@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Plánovač pravidelných úloh bez driftu
+Každá sekce má vlastní interval a běží podle monotónních termínů
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Section:
+    """Jedna pravidelně spouštěná sekce (např. QPIGS každých 5 s)"""
+
+    def __init__(self, name, interval, callback):
+        self.name = name
+        self.interval = float(interval)
+        self.callback = callback
+        self.deadline = None
+        self.running = False
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.jitter_last = 0.0
+        self.jitter_max = 0.0
+        self.jitter_total = 0.0
+        self.duration_last = 0.0
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'jitter_last': round(self.jitter_last, 4),
+            'jitter_max': round(self.jitter_max, 4),
+            'jitter_avg': round(self.jitter_total / self.runs, 4) if self.runs else 0.0,
+            'duration_last': round(self.duration_last, 3),
+        }
+
+
+class IntervalScheduler:
+    """Spouští sekce podle monotónních termínů
+
+    Další termín se počítá od předchozího termínu, ne od konce práce,
+    takže doba komunikace se nepřičítá k periodě. Pokud sekce nestihne
+    svůj termín (overrun), zmeškané běhy se přeskočí a pokračuje se
+    dalším termínem v původní mřížce.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.sections = {}
+        self._stop = threading.Event()
+
+    def add_section(self, name, interval, callback):
+        """Přidá sekci - callback se volá bez argumentů"""
+        if interval <= 0:
+            raise ValueError(f"Interval sekce {name} musí být kladný")
+        section = Section(name, interval, callback)
+        self.sections[name] = section
+        return section
+
+    def set_interval(self, name, interval):
+        """Změní interval sekce - nový interval platí od dalšího termínu"""
+        section = self.sections[name]
+        if interval <= 0:
+            raise ValueError(f"Interval sekce {name} musí být kladný")
+        if section.deadline is not None and not section.running:
+            # Termín už je naplánovaný se starým intervalem - přepočítáme ho
+            section.deadline += interval - section.interval
+        section.interval = float(interval)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """Statistiky všech sekcí (jitter, overruny)"""
+        return {name: section.stats() for name, section in self.sections.items()}
+
+    def run(self):
+        """Hlavní smyčka - běží do zavolání stop()"""
+        if not self.sections:
+            return
+
+        self._stop.clear()
+        start = self.clock()
+        for section in self.sections.values():
+            if section.deadline is None:
+                section.deadline = start
+
+        while not self._stop.is_set():
+            section = min(self.sections.values(), key=lambda s: s.deadline)
+
+            delay = section.deadline - self.clock()
+            if delay > 0 and self._stop.wait(delay):
+                break
+
+            self.run_section(section)
+
+    def run_section(self, section):
+        """Spustí jednu sekci a naplánuje její další termín"""
+        started = self.clock()
+        jitter = started - section.deadline
+        section.jitter_last = jitter
+        section.jitter_max = max(section.jitter_max, jitter)
+        section.jitter_total += jitter
+        section.runs += 1
+
+        section.running = True
+        try:
+            section.callback()
+        except Exception as e:
+            section.errors += 1
+            logger.error("Chyba v sekci %s: %s", section.name, e)
+        finally:
+            section.running = False
+
+        finished = self.clock()
+        section.duration_last = finished - started
+
+        section.deadline += section.interval
+        if finished > section.deadline:
+            # Overrun - přeskočíme zmeškané termíny
+            missed = int((finished - section.deadline) // section.interval) + 1
+            section.overruns += 1
+            section.skipped += missed
+            section.deadline += missed * section.interval
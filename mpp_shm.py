@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Poslední vzorek QPIGS/QPIWS ve sdílené paměti
+Soubor pevné délky pod /dev/shm chráněný sekvenčním čítačem (seqlock)
+
+Zapisovatel před zápisem nastaví lichý čítač a po zápisu sudý. Čtenář
+zkopíruje data a čtení zopakuje, pokud byl čítač lichý nebo se mezitím
+změnil - nikdy tak nevrátí napůl zapsaný vzorek. Čtení je jen přístup
+do namapované paměti, bez systémového volání.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import time
+
+from mpp_archive import FIELD_NAMES, RECORD, STATUS_FLAGS, pack_sample
+from mpp_transport import QPIWS_FLAGS
+
+MAGIC = b'MPPS'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+SEQ = struct.Struct('<Q')
+SEQ_OFFSET = HEADER.size
+DATA_OFFSET = SEQ_OFFSET + SEQ.size
+
+# Záznam QPIGS (stejný jako v archivu) + čas a bity QPIWS
+WARNINGS = struct.Struct('<dI')
+PAYLOAD = struct.Struct(RECORD.format + WARNINGS.format[1:])
+SIZE = DATA_OFFSET + PAYLOAD.size
+
+DEFAULT_PATH = '/dev/shm/mpp_solar'
+
+
+def warning_bits(warnings):
+    """Dict příznaků QPIWS -> 32bitové číslo (bit i = a_i)"""
+    bits = 0
+    for i, name in enumerate(QPIWS_FLAGS):
+        if name and warnings.get(name) not in (None, 0, '0', False):
+            bits |= 1 << i
+    return bits
+
+
+class SharedSample:
+    """Zapisovatel posledního vzorku (jeden proces - poller)"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self._mm = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        self._mm[:HEADER.size] = HEADER.pack(MAGIC, VERSION, PAYLOAD.size)
+        self._seq = SEQ.unpack_from(self._mm, SEQ_OFFSET)[0] & ~1
+        self._record = pack_sample({}, 0)
+        self._warnings = WARNINGS.pack(0, 0)
+
+    def write(self, sample=None, warnings=None, timestamp=None):
+        """Zapíše QPIGS vzorek a/nebo stav QPIWS (druhá část zůstane beze změny)"""
+        if timestamp is None:
+            timestamp = time.time()
+        if sample is not None:
+            self._record = pack_sample(sample, timestamp)
+        if warnings is not None:
+            self._warnings = WARNINGS.pack(timestamp, warning_bits(warnings))
+
+        mm = self._mm
+        SEQ.pack_into(mm, SEQ_OFFSET, self._seq + 1)
+        mm[DATA_OFFSET:SIZE] = self._record + self._warnings
+        self._seq += 2
+        SEQ.pack_into(mm, SEQ_OFFSET, self._seq)
+
+    def close(self):
+        self._mm.close()
+
+
+class SharedSampleReader:
+    """Čtenář posledního vzorku - soubor se namapuje při prvním čtení"""
+
+    def __init__(self, path=DEFAULT_PATH, retries=100):
+        self.path = path
+        self.retries = retries
+        self._mm = None
+
+    def _map(self):
+        try:
+            with open(self.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, version, size = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or size != PAYLOAD.size:
+            mm.close()
+            return False
+        self._mm = mm
+        return True
+
+    def read_raw(self):
+        """Konzistentní kopie (seq, payload) nebo None, pokud zatím nic nebylo zapsáno"""
+        if self._mm is None and not self._map():
+            return None
+        mm = self._mm
+        for _ in range(self.retries):
+            seq = SEQ.unpack_from(mm, SEQ_OFFSET)[0]
+            if seq & 1:
+                continue
+            payload = mm[DATA_OFFSET:SIZE]
+            if SEQ.unpack_from(mm, SEQ_OFFSET)[0] == seq:
+                return (seq, payload) if seq else None
+        return None
+
+    def read(self):
+        """Poslední vzorek jako dict s názvy mpp-solar, nebo None
+
+        Obsahuje 'age' (stáří QPIGS v sekundách), 'device_status' jako
+        řetězec bitů s příznaky is_* a 'warnings' s aktivními příznaky QPIWS.
+        """
+        raw = self.read_raw()
+        if raw is None:
+            return None
+        seq, payload = raw
+        values = PAYLOAD.unpack(payload)
+        sample = dict(zip(FIELD_NAMES, values))
+        sample['device_status'] = format(sample['device_status'], '08b')
+        for flag, bit in zip(STATUS_FLAGS, sample['device_status']):
+            sample[flag] = int(bit)
+        sample['age'] = time.time() - sample['timestamp']
+        sample['seq'] = seq
+
+        warnings_time, bits = values[len(FIELD_NAMES):]
+        sample['warnings_timestamp'] = warnings_time
+        sample['warnings'] = [name for i, name in enumerate(QPIWS_FLAGS) if name and bits >> i & 1]
+        return sample
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+def benchmark(path='/dev/shm/mpp_bench', reads=100000):
+    writer = SharedSample(path)
+    writer.write({'battery_voltage': 53.0, 'pv_input_power': 711}, {'line_fail_warning': 1})
+    reader = SharedSampleReader(path)
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        reader.read()
+    elapsed = time.perf_counter() - started
+    print(f"Čtení: {elapsed / reads * 1e6:.2f} µs/vzorek")
+
+    started = time.perf_counter()
+    for _ in range(reads):
+        writer.write({'battery_voltage': 53.0})
+    elapsed = time.perf_counter() - started
+    print(f"Zápis: {elapsed / reads * 1e6:.2f} µs/vzorek")
+    writer.close()
+    reader.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        benchmark()
+    else:
+        reader = SharedSampleReader(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH)
+        sample = reader.read()
+        if sample is None:
+            print("Sdílený vzorek zatím neexistuje (běží poller?)")
+            sys.exit(1)
+        for key, value in sample.items():
+            print(f"{key:<32} {value}")
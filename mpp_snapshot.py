@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Lokální API s posledními vzorky
+Čtenáři dostávají data z paměti polleru místo nového dotazu na měnič
+
+Endpointy (HTTP na localhost nebo Unix socket):
+    GET /snapshot             všechny příkazy
+    GET /snapshot/QPIGS       poslední výsledek (ETag, If-None-Match -> 304)
+    GET /wait/QPIGS?after=N   čeká na vzorek novější než N (long-poll, timeout -> 304)
+
+Server je v mpp_snapshot_server - klient a cache se obejdou bez http.server
+i http.client, aby krátce běžící čtenáři startovali rychle.
+"""
+
+import json
+import socket
+import threading
+import time
+
+DEFAULT_PORT = 8765
+
+
+class SnapshotCache:
+    """Poslední dekódovaný výsledek každého příkazu s pořadovým číslem"""
+
+    def __init__(self):
+        self._entries = {}
+        self._seq = 0
+        self._changed = threading.Condition()
+
+    def update(self, command, data, timestamp=None):
+        with self._changed:
+            self._seq += 1
+            self._entries[command.upper()] = {
+                'command': command.upper(),
+                'seq': self._seq,
+                'timestamp': timestamp if timestamp is not None else time.time(),
+                'data': data,
+            }
+            self._changed.notify_all()
+
+    def get(self, command):
+        """Záznam příkazu s aktuálním stářím (s) nebo None"""
+        with self._changed:
+            entry = self._entries.get(command.upper())
+        return _with_age(entry) if entry else None
+
+    def all(self):
+        with self._changed:
+            entries = list(self._entries.values())
+        return {entry['command']: _with_age(entry) for entry in entries}
+
+    def wait(self, command, after, timeout):
+        """Počká na záznam s seq > after; při timeoutu vrátí None"""
+        command = command.upper()
+        with self._changed:
+            ready = self._changed.wait_for(
+                lambda: self._entries.get(command, {}).get('seq', 0) > after, timeout)
+            entry = self._entries.get(command) if ready else None
+        return _with_age(entry) if entry else None
+
+
+def _with_age(entry):
+    return {**entry, 'age': round(time.time() - entry['timestamp'], 3)}
+
+
+def start_server(cache, port=DEFAULT_PORT, host='127.0.0.1', unix_path=None):
+    """Spustí API na pozadí (viz mpp_snapshot_server.start_server)"""
+    from mpp_snapshot_server import start_server
+    return start_server(cache, port, host, unix_path)
+
+
+def stop_server(servers):
+    if servers:
+        from mpp_snapshot_server import stop_server
+        stop_server(servers)
+
+
+def _http_get(path, port, unix_path, timeout):
+    """Minimální HTTP/1.0 GET - server po odpovědi spojení zavře"""
+    if unix_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        address = unix_path
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        address = ('127.0.0.1', port)
+    with sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.sendall(f"GET {path} HTTP/1.0\r\nHost: localhost\r\n\r\n".encode())
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1]) if head.startswith(b'HTTP/') else 0
+    return status, body
+
+
+def fetch_snapshot(command, port=DEFAULT_PORT, unix_path=None, max_age=None, timeout=1.0):
+    """Data příkazu z běžícího polleru, nebo None (API neběží / data jsou stará)"""
+    try:
+        status, body = _http_get(f'/snapshot/{command}', port, unix_path, timeout)
+        if status != 200:
+            return None
+        # Useknutá nebo jiná než JSON odpověď = API není k dispozici
+        entry = json.loads(body)
+        if max_age is not None and entry['age'] > max_age:
+            return None
+        return entry['data']
+    except (OSError, ValueError, IndexError, KeyError, TypeError):
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'QPIGS'
+    data = fetch_snapshot(command)
+    if data is None:
+        print(f"Snapshot API na portu {DEFAULT_PORT} nevrací data pro {command}")
+        sys.exit(1)
+    print(json.dumps(data, indent=2, ensure_ascii=False))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+HTTP server lokálního API s posledními vzorky (viz mpp_snapshot)
+Oddělený modul - čtenáři API nemusí načítat http.server
+"""
+
+import json
+import math
+import os
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from mpp_snapshot import DEFAULT_PORT
+
+MAX_WAIT = 60  # Nejdelší long-poll (s) - klient nesmí držet vlákno serveru libovolně dlouho
+
+
+def _etag(entry):
+    # Slabý ETag - tělo obsahuje i stáří, které se mění s časem
+    return f'W/"{entry["command"]}-{entry["seq"]}"'
+
+
+def _seq_from_etag(value):
+    try:
+        return int(value.strip().rsplit('-', 1)[1].rstrip('"'))
+    except (IndexError, ValueError):
+        return 0
+
+
+class SnapshotHandler(BaseHTTPRequestHandler):
+    cache = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+
+        if parts == ['snapshot']:
+            return self._send(200, self.cache.all())
+        if len(parts) != 2 or parts[0] not in ('snapshot', 'wait'):
+            return self._send(404, {'error': 'Neznámý endpoint'})
+
+        command = parts[1]
+        if_none_match = self.headers.get('If-None-Match')
+
+        if parts[0] == 'wait':
+            query = parse_qs(url.query)
+            try:
+                after = int(query['after'][0]) if 'after' in query else _seq_from_etag(if_none_match or '')
+                timeout = float(query.get('timeout', [30])[0])
+            except ValueError:
+                return self._send(400, {'error': 'after musí být celé číslo, timeout číslo v sekundách'})
+            if not math.isfinite(timeout) or timeout < 0:
+                return self._send(400, {'error': f'timeout musí být 0 až {MAX_WAIT} s'})
+            timeout = min(timeout, MAX_WAIT)
+            entry = self.cache.wait(command, after, timeout)
+            if entry is None:
+                return self._send(304, None)
+            return self._send(200, entry, _etag(entry))
+
+        entry = self.cache.get(command)
+        if entry is None:
+            return self._send(404, {'error': f'Žádná data pro {command.upper()}'})
+        etag = _etag(entry)
+        if if_none_match == etag:
+            return self._send(304, None, etag)
+        return self._send(200, entry, etag)
+
+    def _send(self, status, body, etag=None):
+        payload = json.dumps(body, separators=(',', ':')).encode() if body is not None else b''
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        if payload:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+    def address_string(self):
+        # Unix socket nemá adresu klienta
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+        os.chmod(self.server_address, 0o660)
+
+
+def start_server(cache, port=DEFAULT_PORT, host='127.0.0.1', unix_path=None):
+    """Spustí API na pozadí (TCP a/nebo Unix socket), vrací seznam serverů"""
+    handler = type('Handler', (SnapshotHandler,), {'cache': cache})
+    servers = []
+    if port:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        servers.append(server)
+    if unix_path:
+        servers.append(UnixHTTPServer(unix_path, handler))
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return servers
+
+
+def stop_server(servers):
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+        if isinstance(server, UnixHTTPServer) and os.path.exists(server.server_address):
+            os.remove(server.server_address)
@@ -11,13 +11,24 @@ import os
 from datetime import datetime
 from pathlib import Path
 
+from mpp_archive import SampleArchive
+from mpp_rollup import RollupEngine
+from mpp_sqlite import SQLiteHistorian
+
 # Přidáme mpp-solar do PATH
 os.environ['PATH'] = f"{os.environ.get('PATH', '')}:/home/dell/.local/bin"
 
 class MPPSolarMonitor:
-    def __init__(self, device_path='/dev/hidraw2'):
+    def __init__(self, device_path='/dev/hidraw2', archive_dir='mpp_archive',
+                 history_db='mpp_history.db'):
         self.device_path = device_path
         self.last_data = {}
+        # Archiv, agregace a historie se otevírají až v continuous_monitoring
+        self.archive_dir = archive_dir
+        self.history_db = history_db
+        self.archive = None
+        self.rollups = None
+        self.historian = None
         
     def get_device_info(self):
         """Získá základní informace o zařízení"""
@@ -222,6 +233,11 @@ class MPPSolarMonitor:
         print("Stiskněte Ctrl+C pro ukončení\n")
         
         last_save = 0
+        if self.archive_dir:
+            self.archive = SampleArchive(self.archive_dir)
+            self.rollups = RollupEngine(self.archive_dir)
+        if self.history_db:
+            self.historian = SQLiteHistorian(self.history_db)
         
         try:
             while True:
@@ -229,6 +245,17 @@ class MPPSolarMonitor:
                 data = self.get_all_data()
                 self.print_status(data)
                 
+                # Kompaktní historie QPIGS (~60 B na vzorek) a agregace 1 min / 1 h / 1 den
+                if self.archive and data['status']:
+                    now = time.time()
+                    self.archive.append(data['status'], now)
+                    self.rollups.add(data['status'], now)
+                
+                # Historie v SQLite (QPIGS, QPIRI, QPIWS)
+                if self.historian:
+                    for command, key in (('QPIGS', 'status'), ('QPIRI', 'settings'), ('QPIWS', 'warnings')):
+                        self.historian.add(command, data[key])
+                
                 # Periodické ukládání
                 current_time = time.time()
                 if current_time - last_save >= save_interval:
@@ -244,6 +271,14 @@ class MPPSolarMonitor:
             # Poslední uložení
             final_data = self.get_all_data()
             self.save_to_json("mpp_final.json", final_data)
+        finally:
+            # Menu může monitoring spustit znovu - příště se otevřou nové
+            if self.archive:
+                self.archive.close()
+                self.rollups.close()
+            if self.historian:
+                self.historian.close()
+            self.archive = self.rollups = self.historian = None
     
     def generate_home_assistant_config(self):
         """Generuje konfiguraci pro Home Assistant"""
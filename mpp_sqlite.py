@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Lokální historie v SQLite
+WAL režim, dávkové transakce, časový index a mazání starých dat
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from mpp_archive import QPIGS_FIELDS, STATUS_FLAGS, normalize_sample, status_bits
+
+_SQL_TYPES = {'d': 'REAL', 'f': 'REAL', 'h': 'INTEGER', 'H': 'INTEGER'}
+
+# Typované sloupce známých příkazů (názvy podle mpp-solar)
+SCHEMAS = {
+    'qpigs': [(name, _SQL_TYPES[fmt]) for name, fmt in QPIGS_FIELDS if name != 'timestamp'] + [
+        ('pv_power_calculated', 'REAL'),
+        ('battery_power', 'REAL'),
+        ('efficiency', 'REAL'),
+    ],
+    'qpiri': [
+        ('ac_input_voltage', 'REAL'),
+        ('ac_input_current', 'REAL'),
+        ('ac_output_voltage', 'REAL'),
+        ('ac_output_frequency', 'REAL'),
+        ('ac_output_current', 'REAL'),
+        ('ac_output_apparent_power', 'INTEGER'),
+        ('ac_output_active_power', 'INTEGER'),
+        ('battery_voltage', 'REAL'),
+        ('battery_recharge_voltage', 'REAL'),
+        ('battery_under_voltage', 'REAL'),
+        ('battery_bulk_charge_voltage', 'REAL'),
+        ('battery_float_charge_voltage', 'REAL'),
+        ('battery_type', 'TEXT'),
+        ('max_ac_charging_current', 'INTEGER'),
+        ('max_charging_current', 'INTEGER'),
+        ('input_voltage_range', 'TEXT'),
+        ('output_source_priority', 'TEXT'),
+        ('charger_source_priority', 'TEXT'),
+        ('max_parallel_units', 'INTEGER'),
+        ('machine_type', 'TEXT'),
+        ('topology', 'TEXT'),
+        ('output_mode', 'TEXT'),
+        ('battery_redischarge_voltage', 'REAL'),
+        ('pv_ok_condition', 'TEXT'),
+        ('pv_power_balance', 'TEXT'),
+    ],
+    # QPIWS má desítky příznaků - ukládáme seznam aktivních varování
+    'qpiws': [
+        ('active_warnings', 'TEXT'),
+        ('warning_count', 'INTEGER'),
+    ],
+}
+
+
+def _convert(value, sql_type):
+    if value is None:
+        return None
+    if sql_type == 'TEXT':
+        return str(value)
+    if isinstance(value, str):
+        value = value.replace('!', '')
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    return int(round(value)) if sql_type == 'INTEGER' else float(value)
+
+
+class SQLiteHistorian:
+    """Zapisuje vzorky do SQLite v dávkách
+
+    Řádky se drží v paměti a zapisují se jednou transakcí po batch_size
+    vzorcích (nebo při flush/close). Nezapsané vzorky při pádu procesu
+    se ztratí - za to SD karta nedostává zápis po každém vzorku.
+    """
+
+    def __init__(self, path, batch_size=20, retention_days=90):
+        self.path = path
+        self.batch_size = batch_size
+        self.retention_days = retention_days
+        self._pending = {table: [] for table in SCHEMAS}
+        self._pending_count = 0
+        self._last_prune = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        for table, columns in SCHEMAS.items():
+            column_sql = ', '.join(f"{name} {sql_type}" for name, sql_type in columns)
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (ts REAL NOT NULL, {column_sql}, extra TEXT)")
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)")
+        self.conn.commit()
+
+    def add(self, command, data, timestamp=None):
+        """Přidá výsledek příkazu (QPIGS, QPIRI, QPIWS) do dávky"""
+        table = command.lower()
+        if table not in SCHEMAS or not data:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+
+        if table == 'qpigs':
+            data = normalize_sample(data)
+            data['device_status'] = status_bits(data)
+        elif table == 'qpiws':
+            active = sorted(k for k, v in data.items()
+                            if v not in (0, '0', False, None, '') and not isinstance(v, (dict, list)))
+            data = {'active_warnings': ','.join(active), 'warning_count': len(active), **data}
+
+        known = {name for name, _ in SCHEMAS[table]} | set(STATUS_FLAGS)
+        row = [timestamp] + [_convert(data.get(name), sql_type) for name, sql_type in SCHEMAS[table]]
+        extra = {k: v for k, v in data.items() if k not in known and k != 'timestamp'}
+        row.append(json.dumps(extra, default=str) if extra and table != 'qpiws' else None)
+
+        self._pending[table].append(row)
+        self._pending_count += 1
+        if self._pending_count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Zapíše dávku jednou transakcí a případně promaže stará data"""
+        if self._pending_count:
+            with self.conn:
+                for table, rows in self._pending.items():
+                    if rows:
+                        placeholders = ', '.join('?' * (len(SCHEMAS[table]) + 2))
+                        self.conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+                        rows.clear()
+            self._pending_count = 0
+
+        if self.retention_days and time.time() - self._last_prune > 3600:
+            self.prune()
+
+    def prune(self, older_than_days=None):
+        """Smaže záznamy starší než retention_days"""
+        days = older_than_days or self.retention_days
+        cutoff = time.time() - days * 86400
+        with self.conn:
+            for table in SCHEMAS:
+                self.conn.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,))
+        self._last_prune = time.time()
+
+    def query(self, command, start, end, fields):
+        """Řádky (ts, pole...) v rozsahu [start, end)"""
+        table = command.lower()
+        known = {name for name, _ in SCHEMAS[table]}
+        columns = [f for f in fields if f in known]
+        column_sql = ', '.join(['ts'] + columns)
+        return self.conn.execute(
+            f"SELECT {column_sql} FROM {table} WHERE ts >= ? AND ts < ? ORDER BY ts", (start, end)
+        ).fetchall()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+def benchmark(path, samples=17280):
+    """Propustnost zápisu (různé velikosti dávky) a latence dotazu"""
+    sample = {
+        'ac_input_voltage': 230.1, 'ac_input_frequency': 50.0, 'ac_output_voltage': 229.9,
+        'ac_output_frequency': 50.0, 'ac_output_apparent_power': 345, 'ac_output_active_power': 327,
+        'ac_output_load': 6, 'bus_voltage': 391, 'battery_voltage': 53.0, 'battery_charging_current': 3,
+        'battery_capacity': 58, 'inverter_heat_sink_temperature': 47, 'pv_input_current_for_battery': 3.0,
+        'pv_input_voltage': 237.2, 'battery_voltage_from_scc': 53.1, 'battery_discharge_current': 0,
+        'pv_input_power': 711, 'is_load_on': 1, 'is_scc_charging_on': 1,
+    }
+    start_ts = time.time() - samples * 5
+
+    for batch_size in (1, 20, 200):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        count = samples if batch_size > 1 else min(samples, 2000)
+        historian = SQLiteHistorian(path, batch_size=batch_size, retention_days=None)
+        started = time.perf_counter()
+        for i in range(count):
+            historian.add('QPIGS', sample, start_ts + i * 5)
+        historian.flush()
+        elapsed = time.perf_counter() - started
+        print(f"Dávka {batch_size:>4}: {count / elapsed:>9.0f} vzorků/s  ({elapsed / count * 1e6:.0f} µs/vzorek)")
+        historian.close()
+
+    historian = SQLiteHistorian(path, retention_days=None)
+    end_ts = start_ts + samples * 5
+    for label, span in (('1 hodina', 3600), ('1 den', 86400)):
+        started = time.perf_counter()
+        rows = historian.query('QPIGS', end_ts - span, end_ts, ['battery_voltage', 'pv_input_power'])
+        elapsed = time.perf_counter() - started
+        print(f"Dotaz {label:<9} {len(rows):>6} řádků za {elapsed * 1000:.1f} ms")
+    historian.close()
+    print(f"Velikost databáze: {os.path.getsize(path)} B")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--bench':
+        benchmark(sys.argv[2] if len(sys.argv) > 2 else '/tmp/mpp_bench.db')
+    else:
+        print("Použití: python3 mpp_sqlite.py --bench [soubor.db]")
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Přímá komunikace PI30 bez spouštění mpp-solar
+Port (hidraw nebo sériový) zůstává otevřený mezi příkazy
+"""
+
+import os
+import select
+import struct
+import threading
+import time
+
+from mpp_archive import QPIGS_FIELDS, STATUS_FLAGS
+
+# QPIGS v pořadí odpovědi (bez timestamp a pv_input_power, které jsou jinde)
+QPIGS_VALUES = [(name, fmt) for name, fmt in QPIGS_FIELDS
+                if name not in ('timestamp', 'pv_input_power', 'device_status')]
+
+# Bity QPIWS a0..a31 (názvy podle mpp-solar, bez rezervovaných)
+QPIWS_FLAGS = [
+    None, 'inverter_fault', 'bus_over_fault', 'bus_under_fault',
+    'bus_soft_fail_fault', 'line_fail_warning', 'opv_short_warning', 'inverter_voltage_too_low_fault',
+    'inverter_voltage_too_high_fault', 'over_temperature_fault', 'fan_locked_fault', 'battery_voltage_to_high_fault',
+    'battery_low_alarm_warning', None, 'battery_under_shutdown_warning', None,
+    'overload_fault', 'eeprom_fault', 'inverter_over_current_fault', 'inverter_soft_fail_fault',
+    'self_test_fail_fault', 'op_dc_voltage_over_fault', 'battery_open_fault', 'current_sensor_fail_fault',
+    'battery_short_fault', 'power_limit_warning', 'pv_voltage_high_warning', 'mppt_overload_fault',
+    'mppt_overload_warning', 'battery_too_low_to_charge_warning', None, None,
+]
+
+# QPIRI: (název, typ nebo seznam voleb) v pořadí odpovědi
+QPIRI_FIELDS = [
+    ('ac_input_voltage', float),
+    ('ac_input_current', float),
+    ('ac_output_voltage', float),
+    ('ac_output_frequency', float),
+    ('ac_output_current', float),
+    ('ac_output_apparent_power', int),
+    ('ac_output_active_power', int),
+    ('battery_voltage', float),
+    ('battery_recharge_voltage', float),
+    ('battery_under_voltage', float),
+    ('battery_bulk_charge_voltage', float),
+    ('battery_float_charge_voltage', float),
+    ('battery_type', ['AGM', 'Flooded', 'User', 'Pylontech', 'Shinheung', 'WECO', 'Soltaro', 'LIb', 'Lic']),
+    ('max_ac_charging_current', int),
+    ('max_charging_current', int),
+    ('input_voltage_range', ['Appliance', 'UPS']),
+    ('output_source_priority', ['Utility first', 'Solar first', 'SBU first']),
+    ('charger_source_priority', ['Utility first', 'Solar first', 'Solar + Utility',
+                                 'Only solar charging permitted']),
+    ('max_parallel_units', int),
+    ('machine_type', {'00': 'Grid tie', '01': 'Off Grid', '10': 'Hybrid'}),
+    ('topology', ['transformerless', 'transformer']),
+    ('output_mode', ['single machine output', 'parallel output', 'Phase 1 of 3 Phase output',
+                     'Phase 2 of 3 Phase output', 'Phase 3 of 3 Phase output']),
+    ('battery_redischarge_voltage', float),
+    ('pv_ok_condition', ['As long as one unit of inverters has connect PV, parallel system will consider PV OK',
+                         'Only All of inverters have connect PV, parallel system will consider PV OK']),
+    ('pv_power_balance', ['PV input max current will be the max charged current',
+                          'PV input max power will be the sum of the max charged power and loads power']),
+]
+
+QMOD_MODES = {
+    'P': 'Power On', 'S': 'Standby', 'L': 'Line', 'B': 'Battery',
+    'F': 'Fault', 'H': 'Power saving', 'D': 'Shutdown',
+}
+
+# Délka odpovědi včetně CRC a CR (B) pro odhad doby přenosu; jiné příkazy DEFAULT_RESPONSE_BYTES
+RESPONSE_BYTES = {'QPI': 8, 'QMOD': 5, 'QPIWS': 36, 'QPIRI': 102, 'QPIGS': 110}
+DEFAULT_RESPONSE_BYTES = 64
+TURNAROUND = 0.5      # Rezerva na zpracování v měniči (s)
+BUDGET_FACTOR = 1.5   # Rozpočet příkazu = BUDGET_FACTOR x očekávaná doba
+
+
+class TransportError(Exception):
+    """Chyba komunikace se střídačem (timeout, CRC, NAK)"""
+    kind = 'error'  # Druh chyby pro statistiky linky (mpp_linkhealth)
+
+
+class ResponseTimeout(TransportError):
+    """Odpověď nepřišla celá do timeoutu"""
+    kind = 'timeout'
+
+
+class ShortResponse(TransportError):
+    """Odpověď kratší než rámec s CRC"""
+    kind = 'short'
+
+
+class CRCError(TransportError):
+    """CRC odpovědi nesouhlasí"""
+    kind = 'crc'
+
+
+class NAKError(TransportError):
+    """Střídač příkaz odmítl (NAK)"""
+    kind = 'nak'
+
+
+class DecodeError(TransportError):
+    """Odpověď s platným CRC, ale nečekaného tvaru"""
+    kind = 'decode'
+
+
+def crc16_xmodem(data):
+    """CRC16 XMODEM používané protokolem PI30"""
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = (crc << 1) ^ 0x1021
+            else:
+                crc <<= 1
+            crc &= 0xFFFF
+    return crc
+
+
+def _crc_bytes(payload):
+    # PI30 nepoužívá bajty 0x28 '(', 0x0d CR a 0x0a LF v CRC - zvýší se o 1
+    crc = bytearray(struct.pack('>H', crc16_xmodem(payload)))
+    for i, byte in enumerate(crc):
+        if byte in (0x0a, 0x0d, 0x28):
+            crc[i] = byte + 1
+    return bytes(crc)
+
+
+def build_command(command):
+    """Příkaz s CRC a ukončovacím CR"""
+    payload = command.encode('ascii')
+    return payload + _crc_bytes(payload) + b'\r'
+
+
+def parse_response(response):
+    """Ověří CRC a vrátí text odpovědi bez '(' (TransportError při chybě)"""
+    end = response.find(b'\r')
+    if end < 3:
+        raise ShortResponse(f"Neúplná odpověď ({len(response)} B)")
+    frame = response[:end]
+    payload, crc = frame[:-2], frame[-2:]
+    if crc != _crc_bytes(payload):
+        raise CRCError(f"Chybné CRC odpovědi: {frame!r}")
+
+    text = payload.decode('ascii', errors='replace')
+    if text.startswith('(NAK'):
+        raise NAKError("Střídač příkaz odmítl (NAK)")
+    return text[1:] if text.startswith('(') else text
+
+
+def _number(value, fmt):
+    value = value.replace('!', '')
+    return float(value) if fmt in ('f', 'd') else int(float(value))
+
+
+def decode_qpigs(text):
+    """QPIGS -> dict s názvy polí mpp-solar"""
+    values = text.split()
+    if len(values) < 17:
+        raise DecodeError(f"QPIGS: {len(values)} hodnot, očekáváno aspoň 17")
+
+    try:
+        data = {name: _number(value, fmt) for (name, fmt), value in zip(QPIGS_VALUES, values)}
+        status = values[16]
+        for flag, bit in zip(STATUS_FLAGS, status):
+            data[flag] = int(bit)
+        data['device_status'] = status
+        if len(values) > 19:
+            data['pv_input_power'] = int(values[19])
+    except (ValueError, IndexError) as e:
+        # Poškozená hodnota s platným CRC - musí projít přes except TransportError
+        raise DecodeError(f"QPIGS: neplatná hodnota ({e})") from e
+    return data
+
+
+def decode_qpiws(text):
+    """QPIWS -> dict příznaků (0/1)"""
+    bits = text.strip()
+    return {name: int(bit) for name, bit in zip(QPIWS_FLAGS, bits) if name and bit in '01'}
+
+
+def decode_qpiri(text):
+    """QPIRI -> dict s názvy polí mpp-solar (volby jako text)"""
+    data = {}
+    for (name, kind), value in zip(QPIRI_FIELDS, text.split()):
+        if kind in (int, float):
+            try:
+                data[name] = _number(value, 'f' if kind is float else 'h')
+            except ValueError as e:
+                raise DecodeError(f"QPIRI: neplatná hodnota {name} ({e})") from e
+        elif isinstance(kind, dict):
+            data[name] = kind.get(value, value)
+        else:
+            index = int(value) if value.isdigit() else -1
+            data[name] = kind[index] if 0 <= index < len(kind) else value
+    return data
+
+
+def decode_qpi(text):
+    return {'protocol_id': text.strip()}
+
+
+def decode_qmod(text):
+    code = text.strip()[:1]
+    return {'device_mode': QMOD_MODES.get(code, code)}
+
+
+DECODERS = {
+    'QPI': decode_qpi,
+    'QPIGS': decode_qpigs,
+    'QPIRI': decode_qpiri,
+    'QPIWS': decode_qpiws,
+    'QMOD': decode_qmod,
+}
+
+
+def decode(command, text):
+    """Dekóduje odpověď; neznámé příkazy vrací jako {'response': text}"""
+    decoder = DECODERS.get(command.upper())
+    return decoder(text) if decoder else {'response': text}
+
+
+def line_time(command, baud=2400):
+    """Doba dotazu a odpovědi na lince (10 bitů na bajt) bez prodlevy měniče"""
+    frame_bytes = len(command) + 3 + RESPONSE_BYTES.get(command.upper(), DEFAULT_RESPONSE_BYTES)
+    return frame_bytes * 10 / baud
+
+
+def expected_time(command, baud=2400):
+    """Očekávaná doba jednoho pokusu včetně rezervy TURNAROUND"""
+    return line_time(command, baud) + TURNAROUND
+
+
+class Budget:
+    """Časový rozpočet jednoho příkazu včetně všech opakování"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+
+    def remaining(self):
+        return max(0.0, self.deadline - time.monotonic())
+
+    def spent(self):
+        return time.monotonic() - self.started
+
+
+class PI30Port:
+    """Otevřený port střídače - hidraw (USB HID) nebo sériový (USB-RS232)
+
+    Port se otevře při prvním příkazu a drží se otevřený. Při chybě portu
+    (OSError) nebo timeoutu se zavře a další příkaz ho otevře znovu; nové
+    otevření po chybě portu se počítá jako reconnect. CRC, NAK a neúplná
+    odpověď port nechávají otevřený.
+    capture (mpp_capture.CaptureWriter) zaznamená každý dotaz a odpověď,
+    profiler (mpp_profile.StageProfiler) doby jednotlivých fází,
+    health (mpp_linkhealth.LinkHealth) chyby, odezvu a nová otevření portu.
+    """
+
+    def __init__(self, path, baud=2400, timeout=3.0, capture=None, profiler=None, health=None,
+                 retries=2, budget_factor=BUDGET_FACTOR):
+        self.path = path
+        self.baud = baud
+        self.timeout = timeout
+        self.retries = retries
+        self.budget_factor = budget_factor
+        self.last_budget = None
+        self.capture = capture
+        self.profiler = profiler
+        self.health = health
+        self._reconnect = False
+        self.is_hid = 'hidraw' in path
+        self._fd = None
+        self._serial = None
+        self._lock = threading.Lock()
+        self._written_ns = self._first_byte_ns = 0
+
+    def open(self):
+        if self.is_hid:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_NONBLOCK)
+        elif self._serial is None:
+            import serial  # pyserial potřebujeme jen pro sériové porty
+            self._serial = serial.Serial(self.path, self.baud, timeout=self.timeout)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if self._serial is not None:
+            self._serial.close()
+            self._serial = None
+
+    def set_path(self, path):
+        """Přepne na novou cestu (po přepojení USB), otevře se při dalším příkazu"""
+        with self._lock:
+            self.close()
+            self.path = path
+            self.is_hid = 'hidraw' in path
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def exchange(self, frame, timeout=None):
+        """Pošle rámec a vrátí surovou odpověď do CR včetně (timeout zkrátí self.timeout)"""
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        with self._lock:
+            opening = self._fd is None and self._serial is None
+            begin_ns = time.perf_counter_ns()
+            self.open()
+            if opening and self._reconnect:
+                self._reconnect = False
+                if self.health is not None:
+                    self.health.record_reconnect(self.path)
+            opened_ns = time.perf_counter_ns()
+            started = time.monotonic_ns()
+            response = b''
+            try:
+                if self.is_hid:
+                    response = self._exchange_hid(frame, timeout)
+                else:
+                    response = self._exchange_serial(frame, timeout)
+                if self.profiler is not None:
+                    self._profile(frame[:-3].decode('ascii', errors='replace'),
+                                  begin_ns if opening else None, opened_ns, time.perf_counter_ns())
+                return response
+            except OSError:
+                self.close()
+                self._reconnect = True
+                raise
+            except ResponseTimeout:
+                # Pozdní zbytek odpovědi by se přimíchal do další - port se otevře znovu
+                self.close()
+                raise
+            finally:
+                if self.capture is not None:
+                    self.capture.record(frame, response, started, time.monotonic_ns() - started)
+
+    def _profile(self, command, begin_ns, opened_ns, end_ns):
+        record = self.profiler.record
+        if begin_ns is not None:
+            record(command, 'open', opened_ns - begin_ns)
+        record(command, 'write', self._written_ns - opened_ns)
+        record(command, 'first_byte', self._first_byte_ns - self._written_ns)
+        record(command, 'last_byte', end_ns - self._first_byte_ns)
+
+    def _exchange_hid(self, frame, timeout):
+        # HID reporty mají 8 bajtů - příkaz se posílá po částech
+        for i in range(0, len(frame), 8):
+            os.write(self._fd, frame[i:i + 8].ljust(8, b'\0'))
+        self._written_ns = time.perf_counter_ns()
+
+        response = b''
+        deadline = time.monotonic() + timeout
+        while b'\r' not in response:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ResponseTimeout(f"Timeout po {timeout:.2f} s ({len(response)} B)")
+            if select.select([self._fd], [], [], remaining)[0]:
+                if not response:
+                    self._first_byte_ns = time.perf_counter_ns()
+                response += os.read(self._fd, 8).rstrip(b'\0')
+        return response
+
+    def _exchange_serial(self, frame, timeout):
+        deadline = time.monotonic() + timeout
+        if self._serial.timeout != timeout:
+            self._serial.timeout = timeout
+        self._serial.reset_input_buffer()
+        self._serial.write(frame)
+        self._written_ns = time.perf_counter_ns()
+        if self.profiler is None:
+            response = self._serial.read_until(b'\r')
+        else:
+            # Zvlášť první bajt kvůli měření odezvy; zbytek dostane jen zbývající čas
+            response = self._serial.read(1)
+            self._first_byte_ns = time.perf_counter_ns()
+            remaining = deadline - time.monotonic()
+            if response and response != b'\r' and remaining > 0:
+                self._serial.timeout = remaining
+                response += self._serial.read_until(b'\r')
+        if not response.endswith(b'\r'):
+            raise ResponseTimeout(f"Timeout po {timeout:.2f} s ({len(response)} B)")
+        return response
+
+    def query(self, command, budget=None):
+        """Pošle příkaz a vrátí dekódovaný výsledek
+
+        Celý příkaz včetně opakování má rozpočet (Budget, výchozí budget_factor
+        x expected_time) a žádný pokus ho nepřekročí. Chyba linky (timeout, CRC,
+        neúplná odpověď, port) se opakuje nejvýš retries krát a jen když ve
+        zbytku rozpočtu stihne linka přenést dotaz i odpověď; NAK a chyba
+        dekódování se neopakují. Spotřeba rozpočtu je v last_budget.
+        """
+        budget = budget or Budget(self.budget_factor * expected_time(command, self.baud))
+        attempt_time = line_time(command, self.baud)
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                data = self._query(command, budget)
+                break
+            except (OSError, TransportError) as e:
+                if (attempts > self.retries or getattr(e, 'kind', None) in ('nak', 'decode')
+                        or budget.remaining() < attempt_time):
+                    self._account(command, budget, attempts, e)
+                    raise
+                if self.health is not None:
+                    self.health.record_retry(self.path, command)
+        self._account(command, budget, attempts)
+        return data
+
+    def _account(self, command, budget, attempts, error=None):
+        spent = budget.spent()
+        self.last_budget = {'command': command, 'budget': round(budget.seconds, 3),
+                            'spent': round(spent, 3), 'attempts': attempts}
+        if self.health is not None:
+            self.health.record(self.path, command, spent, error, budget=budget.seconds)
+
+    def _query(self, command, budget):
+        if budget.remaining() <= 0:
+            raise ResponseTimeout(f"Vyčerpaný rozpočet {budget.seconds:.2f} s")
+        response = self.exchange(build_command(command), budget.remaining())
+        if self.profiler is None:
+            return decode(command, parse_response(response))
+
+        started = time.perf_counter_ns()
+        text = parse_response(response)
+        checked = time.perf_counter_ns()
+        data = decode(command, text)
+        self.profiler.record(command, 'crc', checked - started)
+        self.profiler.record(command, 'decode', time.perf_counter_ns() - checked)
+        return data
+
+
+_ports = {}
+_capture = None
+_profiler = None
+_health = None
+
+
+def set_capture(capture):
+    """Záznam rámců (CaptureWriter nebo None) pro sdílené porty z get_port"""
+    global _capture
+    _capture = capture
+    for device in _ports.values():
+        device.capture = capture
+
+
+def set_profiler(profiler):
+    """Měření fází (StageProfiler nebo None) pro sdílené porty z get_port"""
+    global _profiler
+    _profiler = profiler
+    for device in _ports.values():
+        device.profiler = profiler
+
+
+def set_health(health):
+    """Stav linky (LinkHealth nebo None) pro sdílené porty z get_port"""
+    global _health
+    _health = health
+    for device in _ports.values():
+        device.health = health
+
+
+def get_port(port):
+    """Sdílený otevřený port (jeden na cestu)"""
+    if port not in _ports:
+        _ports[port] = PI30Port(port, capture=_capture, profiler=_profiler, health=_health)
+    return _ports[port]
+
+
+def close_port(port):
+    """Zavře a zapomene sdílený port (zařízení zmizelo)"""
+    device = _ports.pop(port, None)
+    if device is not None:
+        device.close()
+
+
+def transport_runner(port, command):
+    """Runner pro CommandQueue - stejné rozhraní jako mpp_solar_runner"""
+    return get_port(port).query(command)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else '/dev/hidraw2'
+    command = sys.argv[2] if len(sys.argv) > 2 else 'QPIGS'
+    with PI30Port(path) as device:
+        print(json.dumps(device.query(command), indent=2, ensure_ascii=False))
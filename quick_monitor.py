@@ -3,17 +3,36 @@
 Rychly kontinualni monitor pro MPP Solar - zobrazuje jen klicove hodnoty
 """
 
-import subprocess
 import json
 import os
 import time
 from datetime import datetime
 
+from mpp_snapshot import fetch_snapshot
+from mpp_shm import SharedSampleReader
+
+shared = SharedSampleReader('/dev/shm/mpp_solar')
+
+# Publisher vzorkuje po INTERVAL (30 s), v noci az po IDLE_INTERVAL (60 s) - mladsi
+# vzorek znamena, ze poller bezi a port drzi on; teprve starsi vzorek = poller nebezi
+POLLER_MAX_AGE = 120
+
 # Pridame mpp-solar do PATH
 os.environ['PATH'] = f"{os.environ.get('PATH', '')}:/home/dell/.local/bin"
 
 def get_quick_data():
     """Ziska rychle jen zakladni data"""
+    # Bezi-li MQTT publisher, vezmeme posledni vzorek ze sdilene pameti nebo z jeho API
+    data = shared.read()
+    if data and data['age'] <= POLLER_MAX_AGE:
+        return data
+    data = fetch_snapshot('QPIGS', max_age=POLLER_MAX_AGE)
+    if data:
+        return data
+    
+    # Poller nebezi - az ted se ptame primo zarizeni
+    # subprocess nacitame az tady - se sdilenou pameti ho monitor nepotrebuje
+    import subprocess
     try:
         cmd = ['mpp-solar', '-p', '/dev/hidraw2', '-c', 'QPIGS', '-o', 'json']
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
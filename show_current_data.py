@@ -3,16 +3,23 @@
 Jednoduchy skript pro zobrazeni vsech aktualnich dat z MPP Solar menice
 """
 
-import subprocess
 import json
 import os
 from datetime import datetime
 
+from mpp_snapshot import fetch_snapshot
+
 # Pridame mpp-solar do PATH
 os.environ['PATH'] = f"{os.environ.get('PATH', '')}:/home/dell/.local/bin"
 
 def get_mpp_data(command):
     """Ziska data z MPP Solar"""
+    # Posledni vysledek z beziciho publisheru (QPIGS, QPIRI, QPIWS...)
+    data = fetch_snapshot(command, max_age=300)
+    if data:
+        return data
+    
+    import subprocess  # jen pro dotaz primo na menic
     try:
         cmd = ['mpp-solar', '-p', '/dev/hidraw2', '-c', command, '-o', 'json']
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
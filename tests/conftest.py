@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Moduly mpp_* leží v kořeni repozitáře, ne v balíčku
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
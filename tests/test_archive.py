@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+import mpp_archive
+from mpp_archive import (HEADER, RECORD, SampleArchive, Segment, list_segments, pack_sample,
+                         segment_name, status_bits)
+
+T0 = 1748736000  # 2025-06-01 00:00 UTC
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def reader(request, monkeypatch):
+    """Čtení přes numpy i bez něj (čistý Python nad mmap)"""
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(mpp_archive, '_np', None)
+    return request.param
+
+
+def write(directory, start, count, step=5):
+    with SampleArchive(directory) as archive:
+        for i in range(count):
+            archive.append({'battery_voltage': 50.0 + i % 4, 'pv_input_power': i,
+                            'device_status': '00010110'}, start + i * step)
+
+
+def test_round_trip_and_aliases(tmp_path, reader):
+    with SampleArchive(str(tmp_path)) as archive:
+        archive.append({'battery_voltage': 52.5, 'battery_discharge_current': 3,
+                        'battery_scc_voltage': 52.4, 'pv_charging_power': 711,
+                        'is_load_on': 1, 'is_scc_charging_on': 1}, T0)
+
+    (path,) = list_segments(str(tmp_path))
+    with Segment(path) as segment:
+        assert len(segment) == 1
+        row = segment.row(0)
+    assert row['timestamp'] == T0
+    assert row['battery_voltage'] == 52.5
+    assert row['battery_voltage_from_scc'] == pytest.approx(52.4)
+    assert row['pv_input_power'] == 711
+    assert row['device_status'] == 0b00010010
+
+
+def test_status_bits_from_string_flags_and_int():
+    assert status_bits({'device_status': '00010110'}) == 0b00010110
+    assert status_bits({'device_status': 5}) == 5
+    assert status_bits({'is_load_on': 1, 'is_ac_charging_on': 1}) == 0b00010001
+
+
+def test_out_of_range_values_are_clamped():
+    record = RECORD.unpack(pack_sample({'ac_output_active_power': 99999, 'bus_voltage': -99999}, T0))
+    values = dict(zip(mpp_archive.FIELD_NAMES, record))
+    assert values['ac_output_active_power'] == 32767
+    assert values['bus_voltage'] == -32768
+
+
+def test_search_selects_half_open_range(tmp_path, reader):
+    write(str(tmp_path), T0, 100)
+    (path,) = list_segments(str(tmp_path))
+    with Segment(path) as segment:
+        assert segment.search(T0 + 50, T0 + 100) == (10, 20)
+        assert segment.search(T0 + 52, T0 + 103) == (11, 21)
+        assert segment.search(None, None) == (0, 100)
+        assert segment.search(T0 + 1000, T0 + 2000) == (100, 100)
+        voltages = list(segment.column('battery_voltage', 10, 14))
+    assert voltages == [52.0, 53.0, 50.0, 51.0]
+
+
+def test_aggregate_matches_column(tmp_path, reader):
+    write(str(tmp_path), T0, 50)
+    (path,) = list_segments(str(tmp_path))
+    with Segment(path) as segment:
+        result = segment.aggregate('pv_input_power', 5, 15)
+        assert segment.aggregate('pv_input_power', 5, 5)['count'] == 0
+    assert result == {'count': 10, 'min': 5, 'max': 14, 'sum': sum(range(5, 15)), 'last': 14}
+
+
+def test_daily_segments_and_listing(tmp_path):
+    write(str(tmp_path), T0 - 10, 4)  # dva vzorky před půlnocí UTC, dva po ní
+    names = [os.path.basename(p) for p in list_segments(str(tmp_path))]
+    assert names == [segment_name(T0 - 10), segment_name(T0)] == ['qpigs_20250531.bin', 'qpigs_20250601.bin']
+    assert [os.path.basename(p) for p in list_segments(str(tmp_path), T0, T0 + 60)] == ['qpigs_20250601.bin']
+    assert list_segments(str(tmp_path / 'neni')) == []
+
+
+def test_partial_last_record_is_ignored(tmp_path, reader):
+    write(str(tmp_path), T0, 3)
+    (path,) = list_segments(str(tmp_path))
+    with open(path, 'ab') as f:
+        f.write(b'\0' * (RECORD.size // 2))
+    with Segment(path) as segment:
+        assert len(segment) == 3
+
+
+def test_foreign_file_is_rejected(tmp_path):
+    path = tmp_path / segment_name(T0)
+    path.write_bytes(b'XXXX' + b'\0' * (HEADER.size + 10))
+    with pytest.raises(ValueError):
+        Segment(str(path))
@@ -0,0 +1,106 @@
+import pytest
+
+from mpp_breaker import CLOSED, HALF_OPEN, OPEN, BreakerOpen, CircuitBreaker, get_breaker, guarded
+from mpp_linkhealth import LinkHealth
+from mpp_transport import CRCError, DecodeError, NAKError, ResponseTimeout
+
+
+class Runner:
+    """Runner s odpověďmi po řadě; výjimka v seznamu se vyhodí"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def __call__(self, port, command):
+        self.calls.append(command)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def tripped(threshold=3, **kwargs):
+    breaker = CircuitBreaker('/dev/test', threshold=threshold, **kwargs)
+    for _ in range(threshold):
+        with pytest.raises(ResponseTimeout):
+            breaker.call(Runner(ResponseTimeout('timeout')), '/dev/test', 'QPIGS')
+    return breaker
+
+
+def probe_due(breaker):
+    breaker.next_probe = 0.0
+
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker('/dev/test', threshold=3)
+    for _ in range(2):
+        breaker.failure(ResponseTimeout('timeout'))
+    assert breaker.state == CLOSED
+
+    breaker.failure(CRCError('crc'))
+    assert breaker.state == OPEN
+    assert breaker.counts['trips'] == 1
+    assert breaker.retry_in() > 0
+
+
+def test_nak_and_decode_errors_keep_the_breaker_closed():
+    breaker = CircuitBreaker('/dev/test', threshold=1)
+    breaker.failure(NAKError('nak'))
+    breaker.failure(DecodeError('decode'))
+    assert breaker.state == CLOSED and breaker.failures == 0
+
+
+def test_open_breaker_skips_commands_without_calling_runner():
+    breaker = tripped()
+    runner = Runner({'ok': 1})
+    with pytest.raises(BreakerOpen):
+        breaker.call(runner, '/dev/test', 'QPIGS')
+    assert runner.calls == []
+    assert breaker.counts['skipped'] == 1
+
+
+def test_successful_probe_closes_and_runs_command():
+    breaker = tripped()
+    probe_due(breaker)
+    runner = Runner({'protocol_id': 'PI30'}, {'battery_voltage': 52.0})
+    assert breaker.call(runner, '/dev/test', 'QPIGS') == {'battery_voltage': 52.0}
+    assert runner.calls == ['QPI', 'QPIGS']
+    assert breaker.state == CLOSED
+    assert breaker.delay == breaker.base_delay
+
+
+def test_failed_probe_raises_real_error_and_doubles_delay():
+    breaker = tripped(base_delay=5, max_delay=12)
+    probe_due(breaker)
+    error = ResponseTimeout('probe timeout')
+    with pytest.raises(ResponseTimeout) as raised:
+        breaker.call(Runner(error), '/dev/test', 'QPIGS')
+    assert raised.value is error
+    assert breaker.state == OPEN and breaker.delay == 10
+
+    probe_due(breaker)
+    with pytest.raises(ResponseTimeout):
+        breaker.call(Runner(ResponseTimeout('timeout')), '/dev/test', 'QPIGS')
+    assert breaker.delay == 12  # max_delay
+
+
+def test_state_changes_are_reported():
+    changes = []
+    breaker = tripped(on_change=lambda b, old, new: changes.append((old, new)))
+    probe_due(breaker)
+    breaker.call(Runner({}, {}), '/dev/test', 'QPIGS')
+    assert changes == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+def test_skipped_command_is_counted_as_open_in_link_health():
+    health = LinkHealth()
+    health.record('/dev/test', 'QPIGS', 0.0, BreakerOpen('skip'))
+    assert health.summary()['/dev/test']['commands']['QPIGS']['open'] == 1
+
+
+def test_guarded_runner_uses_shared_breaker_per_port():
+    runner = guarded(Runner({'ok': 1}))
+    assert runner('/dev/guarded', 'QPIGS') == {'ok': 1}
+    assert get_breaker('/dev/guarded') is get_breaker('/dev/guarded')
+    assert get_breaker('/dev/guarded').state == CLOSED
@@ -0,0 +1,72 @@
+import pytest
+
+from mpp_energy import EnergyIntegrator, powers_from_sample, split_trapezoid
+
+
+def test_split_trapezoid_without_sign_change():
+    assert split_trapezoid(100, 300, 10) == (2000, 0.0)
+    assert split_trapezoid(-100, -300, 10) == (0.0, 2000)
+
+
+def test_split_trapezoid_through_zero():
+    positive, negative = split_trapezoid(100, -100, 10)
+    assert positive == pytest.approx(250)
+    assert negative == pytest.approx(250)
+
+
+def test_powers_from_easun_and_mpp_solar_samples():
+    easun = {'pv_input_power': 700, 'battery_voltage': 50.0, 'battery_discharge_current': 10,
+             'battery_charging_current': 0, 'ac_output_active_power': 400}
+    assert powers_from_sample(easun) == {'pv': 700.0, 'battery': 500.0, 'ac': 400.0}
+
+    mpp = {'pv_input_voltage': 100.0, 'pv_input_current_for_battery': 5.0, 'battery_voltage': 50.0,
+           'battery_charging_current': 4, 'battery_discharge_current': 0}
+    assert powers_from_sample(mpp) == {'pv': 500.0, 'battery': -200.0, 'ac': 0.0}
+
+
+def test_counters_integrate_one_hour(tmp_path):
+    energy = EnergyIntegrator(str(tmp_path / 'energy.json'), save_every=1000)
+    for i in range(13):  # 12 úseků po 300 s = 1 h
+        energy.update({'pv_input_power': 1000, 'battery_power': -500, 'ac_output_active_power': 200},
+                      i * 300)
+    assert energy.counters['pv_yield'] == pytest.approx(1000)
+    assert energy.counters['battery_charge'] == pytest.approx(500)
+    assert energy.counters['battery_discharge'] == 0
+    assert energy.counters['ac_output'] == pytest.approx(200)
+    assert energy.sensor_values()['energy_pv_yield'] == 1.0
+
+
+def test_gap_is_not_integrated(tmp_path):
+    energy = EnergyIntegrator(str(tmp_path / 'energy.json'), max_gap=300)
+    energy.update({'pv_input_power': 1000}, 0)
+    energy.update({'pv_input_power': 1000}, 3600)
+    assert energy.counters['pv_yield'] == 0
+    assert energy.gaps == 1
+
+
+def test_out_of_order_sample_is_ignored(tmp_path):
+    energy = EnergyIntegrator(str(tmp_path / 'energy.json'))
+    energy.update({'pv_input_power': 3600}, 100)
+    energy.update({'pv_input_power': 3600}, 50)
+    assert energy.counters['pv_yield'] == 0
+    assert energy.last_time == 100
+
+
+def test_state_survives_restart(tmp_path):
+    path = str(tmp_path / 'energy.json')
+    energy = EnergyIntegrator(path)
+    energy.update({'pv_input_power': 3600}, 0)
+    energy.update({'pv_input_power': 3600}, 10)
+    energy.save()
+
+    restored = EnergyIntegrator(path)
+    assert restored.counters['pv_yield'] == pytest.approx(10)
+    restored.update({'pv_input_power': 3600}, 20)
+    assert restored.counters['pv_yield'] == pytest.approx(20)
+
+
+def test_corrupt_state_starts_from_zero(tmp_path):
+    path = tmp_path / 'energy.json'
+    path.write_text('{nedopsáno', encoding='utf-8')
+    energy = EnergyIntegrator(str(path))
+    assert energy.counters['pv_yield'] == 0 and energy.last_time is None
@@ -0,0 +1,41 @@
+import io
+import json
+
+from mpp_follow import follow
+from mpp_transport import ResponseTimeout, decode
+
+# QPIGS s platným CRC, ale poškozenou hodnotou (0X05 místo čísla)
+GARBLED_QPIGS = ('230.0 50.0 230.0 50.0 0230 0207 005 385 54.00 000 100 0035 0004 116.9 '
+                 '54.01 00000 00010110 00 00 0X05 010')
+QPIGS = GARBLED_QPIGS.replace('0X05', '00005')
+
+
+class FakeDevice:
+    """Vrací odpovědi po řadě; výjimka v seznamu se vyhodí"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+
+    def query(self, command):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return decode(command, response)
+
+
+def run(responses, count):
+    out = io.StringIO()
+    follow(FakeDevice(responses), ['QPIGS'], 0.001, count=count, out=out)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_corrupt_frame_is_reported_and_loop_continues():
+    records = run([GARBLED_QPIGS, QPIGS], count=2)
+    assert 'error' in records[0] and 'QPIGS' in records[0]['error']
+    assert records[1]['pv_input_power'] == 5
+
+
+def test_timeout_is_reported_and_loop_continues():
+    records = run([ResponseTimeout('Timeout'), QPIGS], count=2)
+    assert records[0]['error'] == 'Timeout'
+    assert records[1]['battery_voltage'] == 54.0
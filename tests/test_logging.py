@@ -0,0 +1,92 @@
+import logging
+
+import pytest
+
+import mpp_logging
+from mpp_logging import BatchedFileHandler, Formatter, RateLimitFilter, RingBufferHandler
+
+
+def record(msg, level=logging.WARNING, **extra):
+    return logging.makeLogRecord({'name': 'test', 'levelno': level, 'levelname': logging.getLevelName(level),
+                                  'msg': msg, **extra})
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mpp_logging.time, 'monotonic', clock)
+    return clock
+
+
+def test_rate_limit_passes_burst_then_reports_suppressed(clock):
+    limiter = RateLimitFilter(burst=2, period=60)
+    results = [limiter.filter(record("Chyba čtení %s")) for _ in range(5)]
+    assert results == [True, True, False, False, False]
+
+    clock.now += 60
+    next_record = record("Chyba čtení %s")
+    assert limiter.filter(next_record)
+    assert next_record.suppressed == 3
+    assert Formatter('%(message)s').format(next_record) == "Chyba čtení %s (+3× potlačeno)"
+
+
+def test_rate_limit_keys_by_template_or_explicit_key(clock):
+    limiter = RateLimitFilter(burst=1, period=60)
+    assert limiter.filter(record("PV %s W"))
+    assert limiter.filter(record("Baterie %s V"))
+    assert not limiter.filter(record("PV %s W"))
+    assert limiter.filter(record("PV %s W", key='pv-2'))
+
+
+def test_batched_file_handler_writes_in_batches(tmp_path, clock):
+    handler = BatchedFileHandler(str(tmp_path / 'test.log'), flush_records=3, flush_interval=30)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    for i in range(2):
+        handler.emit(record(f"zpráva {i}"))
+    assert handler.writes == 0
+    handler.emit(record("zpráva 2"))
+    assert handler.writes == 1
+
+    handler.emit(record("chyba", logging.ERROR))
+    assert handler.writes == 2
+    handler.close()
+    assert (tmp_path / 'test.log').read_text(encoding='utf-8').splitlines() == [
+        'zpráva 0', 'zpráva 1', 'zpráva 2', 'chyba']
+
+
+class Target(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_ring_dump_replays_context_but_not_the_error(clock):
+    target = Target()
+    ring = RingBufferHandler(10, target)
+    ring.emit(record("kontext 1", logging.INFO))
+    ring.emit(record("kontext 2", logging.INFO))
+    ring.emit(record("chyba", logging.ERROR))
+    assert target.messages[1:-1] == ['kontext 1', 'kontext 2']
+    assert 'chyba' not in target.messages
+    assert len(ring.records) == 0
+
+
+def test_ring_without_dump_level_dumps_only_on_request(clock):
+    target = Target()
+    ring = RingBufferHandler(10, target, dump_level=None)
+    ring.emit(record("kontext", logging.INFO))
+    ring.emit(record("chyba", logging.ERROR))
+    assert target.messages == []
+    ring.dump('SIGUSR1')
+    assert target.messages[1:-1] == ['kontext', 'chyba']
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+
+import mpp_archive
+from mpp_archive import SampleArchive
+from mpp_query import aggregate, daily_windows, select
+
+T0 = 1748736000  # 2025-06-01 00:00 UTC
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(mpp_archive, '_np', None)
+    with SampleArchive(str(tmp_path)) as archive:
+        # Přes půlnoc UTC - rozsah čte dva denní segmenty
+        for i in range(120):
+            archive.append({'battery_voltage': 48.0 + i / 10, 'pv_input_power': i}, T0 - 300 + i * 5)
+    return str(tmp_path)
+
+
+def test_select_spans_segments(archive_dir):
+    columns = select(archive_dir, T0 - 20, T0 + 20, ['pv_input_power'])
+    assert columns['timestamp'] == [T0 - 20 + i * 5 for i in range(8)]
+    assert columns['pv_input_power'] == list(range(56, 64))
+
+
+def test_raw_aggregate_spans_segments(archive_dir):
+    result = aggregate(archive_dir, T0 - 20, T0 + 20, ['pv_input_power'], resolution='raw')
+    assert result['pv_input_power'] == {'count': 8, 'min': 56, 'max': 63,
+                                        'mean': sum(range(56, 64)) / 8, 'last': 63}
+
+
+def test_empty_range(archive_dir):
+    assert select(archive_dir, T0 + 3600, T0 + 7200, ['pv_input_power'])['timestamp'] == []
+    result = aggregate(archive_dir, T0 + 3600, T0 + 7200, ['pv_input_power'], resolution='raw')
+    assert result['pv_input_power']['count'] == 0 and result['pv_input_power']['mean'] is None
+
+
+def test_daily_windows_in_local_time():
+    start = datetime(2025, 6, 1, 12, 0).timestamp()
+    end = datetime(2025, 6, 3, 12, 0).timestamp()
+    windows = [(datetime.fromtimestamp(a), datetime.fromtimestamp(b))
+               for a, b in daily_windows(start, end, '22:00-02:00')]
+    assert windows == [
+        (datetime(2025, 6, 1, 22, 0), datetime(2025, 6, 2, 2, 0)),
+        (datetime(2025, 6, 2, 22, 0), datetime(2025, 6, 3, 2, 0)),
+    ]
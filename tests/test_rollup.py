@@ -0,0 +1,113 @@
+import json
+import os
+
+from mpp_archive import SampleArchive
+from mpp_query import aggregate
+from mpp_rollup import STATE_FILE, RollupEngine, WindowAggregator, read_rollups, rollup_path
+
+T0 = 1748736000  # 2025-06-01 00:00 UTC
+
+
+def feed(engine, start, count, step=30, archive=None, value=50.0):
+    for i in range(count):
+        sample = {'battery_voltage': value + i % 3, 'pv_input_power': 100 * (i % 5)}
+        if archive:
+            archive.append(sample, start + i * step)
+        engine.add(sample, start + i * step)
+    return start + count * step
+
+
+def test_closed_buckets_are_persisted(tmp_path):
+    engine = RollupEngine(str(tmp_path))
+    feed(engine, T0, 240)  # 2 h po 30 s
+    engine.add({'battery_voltage': 50.0}, T0 + 2 * 3600)
+
+    hours = list(read_rollups(str(tmp_path), '1h', T0, T0 + 86400))
+    assert [b['start'] for b in hours] == [T0, T0 + 3600]
+    stats = hours[0]['fields']['battery_voltage']
+    assert stats['count'] == 120
+    assert (stats['min'], stats['max']) == (50.0, 52.0)
+    assert len(list(read_rollups(str(tmp_path), '1m', T0, T0 + 86400))) == 120
+    assert engine.current('1h')['start'] == T0 + 2 * 3600
+
+
+def test_open_buckets_survive_restart(tmp_path):
+    engine = RollupEngine(str(tmp_path))
+    t = feed(engine, T0, 60)
+    engine.close()
+
+    engine = RollupEngine(str(tmp_path))
+    assert engine.current('1h')['fields']['battery_voltage']['count'] == 60
+    feed(engine, t, 60)
+    assert engine.current('1h')['fields']['battery_voltage']['count'] == 120
+
+
+def test_crash_after_restart_does_not_duplicate_buckets(tmp_path):
+    directory = str(tmp_path)
+    archive = SampleArchive(directory)
+    engine = RollupEngine(directory)
+    t = feed(engine, T0, 100, archive=archive)  # 50 min rozpracované hodiny
+    engine.close()
+
+    # Restart pokračuje v rozpracované hodině, uzavře ji a pak spadne bez close()
+    engine = RollupEngine(directory)
+    assert not os.path.exists(os.path.join(directory, STATE_FILE))
+    t = feed(engine, t, 40, archive=archive)
+
+    # Další start už stejnou hodinu znovu nenačte a neuloží podruhé
+    engine = RollupEngine(directory)
+    feed(engine, t, 1, archive=archive)
+    engine.add({'battery_voltage': 50.0}, T0 + 86400)
+    archive.close()
+
+    starts = [b['start'] for b in read_rollups(directory, '1h', T0, T0 + 86400)]
+    assert starts == sorted(set(starts))
+    rolled = aggregate(directory, T0, T0 + 3600, ['battery_voltage'], resolution='1h')
+    raw = aggregate(directory, T0, T0 + 3600, ['battery_voltage'], resolution='raw')
+    assert rolled['battery_voltage']['count'] == raw['battery_voltage']['count'] == 120
+
+
+def test_duplicate_buckets_on_disk_are_read_once(tmp_path):
+    directory = str(tmp_path)
+    bucket = {'start': T0, 'fields': {'battery_voltage': {
+        'count': 10, 'min': 50.0, 'max': 51.0, 'mean': 50.5, 'last': 51.0}}}
+    with open(rollup_path(directory, '1h', T0), 'w', encoding='utf-8') as f:
+        f.write(json.dumps(bucket) + '\n' + json.dumps(bucket) + '\n')
+
+    assert len(list(read_rollups(directory, '1h', T0, T0 + 3600))) == 1
+    result = aggregate(directory, T0, T0 + 3600, ['battery_voltage'], resolution='1h')
+    assert result['battery_voltage']['count'] == 10
+
+
+def test_auto_aggregation_matches_raw(tmp_path):
+    directory = str(tmp_path)
+    archive = SampleArchive(directory)
+    engine = RollupEngine(directory)
+    # Agregace zapnuté až od 00:20 - první hodina je v nich neúplná
+    feed(RollupEngine(os.path.join(directory, 'jinde')), T0, 40, archive=archive)
+    feed(engine, T0 + 1200, 600, archive=archive)
+    archive.close()
+
+    fields = ['battery_voltage', 'pv_input_power']
+    start, end = T0 + 600, T0 + 4 * 3600 + 900
+    auto = aggregate(directory, start, end, fields)
+    raw = aggregate(directory, start, end, fields, resolution='raw')
+    for field in fields:
+        assert auto[field]['count'] == raw[field]['count']
+        assert abs(auto[field]['mean'] - raw[field]['mean']) < 1e-3
+        assert (auto[field]['min'], auto[field]['max']) == (raw[field]['min'], raw[field]['max'])
+
+
+def test_window_aggregator_closes_windows_and_flushes_on_close():
+    aggregator = WindowAggregator(60)
+    assert aggregator.add({'pv_input_power': 100, 'is_load_on': 1}, T0) is None
+    assert aggregator.add({'pv_input_power': 300, 'is_load_on': 0}, T0 + 30) is None
+
+    window = aggregator.add({'pv_input_power': 500, 'is_load_on': 1}, T0 + 60)
+    assert window['start'] == T0 and window['count'] == 2
+    assert window['values'] == {'pv_input_power': 200, 'is_load_on': 0}
+    assert (window['min']['pv_input_power'], window['max']['pv_input_power']) == (100, 300)
+
+    last = aggregator.close()
+    assert last['start'] == T0 + 60 and last['values']['pv_input_power'] == 500
+    assert aggregator.close() is None
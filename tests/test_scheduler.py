@@ -0,0 +1,72 @@
+import pytest
+
+from mpp_scheduler import IntervalScheduler
+
+
+class Clock:
+    """Ručně posouvaný monotónní čas"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def scheduler_with(interval, work):
+    clock = Clock()
+    scheduler = IntervalScheduler(clock=clock)
+
+    def callback():
+        clock.now += work
+
+    section = scheduler.add_section('qpigs', interval, callback)
+    section.deadline = clock.now
+    return scheduler, section, clock
+
+
+def test_deadlines_do_not_drift_with_work_time():
+    scheduler, section, clock = scheduler_with(5, work=1.5)
+    for _ in range(3):
+        clock.now = section.deadline
+        scheduler.run_section(section)
+    assert section.deadline == 115.0
+    assert section.overruns == 0 and section.runs == 3
+
+
+def test_overrun_skips_missed_deadlines():
+    scheduler, section, clock = scheduler_with(5, work=12)
+    scheduler.run_section(section)
+    # Běh skončil v 112 - termíny 105 a 110 se přeskočí, další zůstává v mřížce
+    assert section.deadline == 115.0
+    assert (section.overruns, section.skipped) == (1, 2)
+
+
+def test_jitter_is_measured_from_deadline():
+    scheduler, section, clock = scheduler_with(5, work=0)
+    clock.now += 0.25
+    scheduler.run_section(section)
+    assert section.stats()['jitter_last'] == 0.25
+
+
+def test_callback_error_is_counted_and_schedule_continues():
+    clock = Clock()
+    scheduler = IntervalScheduler(clock=clock)
+    section = scheduler.add_section('qpiws', 10, lambda: 1 / 0)
+    section.deadline = clock.now
+    scheduler.run_section(section)
+    assert section.errors == 1 and section.deadline == 110.0
+
+
+def test_set_interval_reschedules_pending_deadline():
+    scheduler, section, clock = scheduler_with(60, work=0)
+    scheduler.run_section(section)
+    assert section.deadline == 160.0
+    scheduler.set_interval('qpigs', 5)
+    assert section.deadline == 105.0
+
+
+def test_non_positive_interval_is_rejected():
+    scheduler = IntervalScheduler()
+    with pytest.raises(ValueError):
+        scheduler.add_section('qpigs', 0, lambda: None)